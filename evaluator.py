@@ -0,0 +1,47 @@
+import os
+import sys
+import asyncio
+import signal
+import argparse
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from src.config.settings import config
+from src.services.evaluator import EvaluatorServer
+from src.services.ocaml_factory import create_ocaml_service
+from src.utils.logger import setup_logger, get_logger
+
+load_dotenv()
+
+logger = get_logger(__name__)
+
+async def main(socket_path: str):
+    """Lance le service d'évaluation partagé jusqu'à SIGINT ou SIGTERM."""
+    service = create_ocaml_service()
+    service.start()
+    server = EvaluatorServer(service, socket_path, max_pending=config.OCAML_EVALUATOR_MAX_PENDING)
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await server.start()
+        await stop.wait()
+    except Exception as e:
+        logger.error("Erreur critique du service d'évaluation: %s", e, exc_info=True)
+    finally:
+        await server.stop()
+        await service.close()
+        logger.info("Service d'évaluation arrêté")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Service d'évaluation OCaml partagé entre plusieurs instances d'OCaBot")
+    parser.add_argument("--socket", default=config.OCAML_EVALUATOR_SOCKET or "data/evaluator.sock",
+                        help="Chemin de la socket Unix (défaut : OCAML_EVALUATOR_SOCKET)")
+    args = parser.parse_args()
+
+    setup_logger(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_RATE)
+    asyncio.run(main(args.socket))
@@ -1,6 +1,8 @@
 import os
 import sys
+import json
 import asyncio
+import hashlib
 import nextcord
 from nextcord.ext import commands
 from dotenv import load_dotenv
@@ -10,12 +12,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from src.config.settings import config
 from src.config.messages import Messages
 from src.services.mistral_service import MistralService
+from src.services.model_router import ModelRouter
+from src.services.ocaml_service import OCamlService
+from src.services.ocaml_factory import create_ocaml_service
+from src.services.evaluator import EvaluatorClient
+from src.services.explanation_cache import ExplanationCache
+from src.services.evaluation_scheduler import EvaluationScheduler
+from src.services.conversation_store import ConversationStore
+from src.services.context_builder import ContextBuilder
+from src.utils.delivery import MessageDelivery
+from src.utils.prompt_compactor import PromptCompactor
+from src.utils.metrics import EventLoopLagMonitor, MetricsServer, metrics
 from src.utils.logger import setup_logger, get_logger
 from src.utils.error_handler import ErrorHandler
 
 load_dotenv()
 
-setup_logger(config.LOG_LEVEL)
+setup_logger(config.LOG_LEVEL, config.LOG_FORMAT, config.LOG_SAMPLE_RATE)
 logger = get_logger(__name__)
 
 class OCaBot(commands.Bot):
@@ -34,24 +47,182 @@ class OCaBot(commands.Bot):
             help_command=None
         )
         
-        self.mistral_service = MistralService(config.MISTRAL_API_KEY)
+        self.prompt_compactor = PromptCompactor(
+            budgets={"code": config.PROMPT_CODE_TOKENS, "output": config.PROMPT_OUTPUT_TOKENS},
+            max_line_chars=config.PROMPT_MAX_LINE_CHARS
+        )
+        self.mistral_service = MistralService(
+            config.MISTRAL_API_KEY,
+            server_url=config.MISTRAL_SERVER_URL,
+            timeout=config.MISTRAL_TIMEOUT,
+            max_concurrent=config.MISTRAL_MAX_CONCURRENT,
+            max_retries=config.MISTRAL_MAX_RETRIES,
+            router=ModelRouter(
+                config.MISTRAL_MODEL,
+                small_model=config.MISTRAL_SMALL_MODEL or None,
+                small_input_chars=config.MISTRAL_SMALL_INPUT_CHARS,
+                default_slo=config.MISTRAL_SLO,
+                slos=config.MISTRAL_TASK_SLOS,
+                hedge=config.MISTRAL_HEDGE,
+                min_samples=config.MISTRAL_HEDGE_MIN_SAMPLES
+            ),
+            compactor=self.prompt_compactor
+        )
+        self.explanation_cache = None
+        if config.EXPLANATION_CACHE_SIZE > 0:
+            self.explanation_cache = ExplanationCache(
+                max_size=config.EXPLANATION_CACHE_SIZE,
+                disk_path=config.EXPLANATION_CACHE_PATH or None,
+                rename_identifiers=config.EXPLANATION_CACHE_RENAME
+            )
+        
+        self.conversations = ConversationStore(
+            max_threads=config.CONVERSATION_MAX_THREADS,
+            max_messages=config.CONVERSATION_MAX_MESSAGES,
+            origins_path=config.CONVERSATION_ORIGINS_PATH or None
+        )
+        self.context_builder = ContextBuilder(
+            self.mistral_service,
+            token_budget=config.CONTEXT_TOKEN_BUDGET,
+            summary_tokens=config.CONTEXT_SUMMARY_TOKENS,
+            recent_messages=config.CONTEXT_RECENT_MESSAGES,
+            compactor=self.prompt_compactor
+        )
+        self.delivery = MessageDelivery(
+            rate=config.DISCORD_CHANNEL_RATE,
+            per=config.DISCORD_CHANNEL_RATE_PERIOD
+        )
+        
+        if config.OCAML_EVALUATOR_SOCKET:
+            self.ocaml_service = OCamlService(
+                timeout=config.OCAML_TIMEOUT,
+                max_output_bytes=config.OCAML_MAX_OUTPUT_BYTES,
+                evaluator=EvaluatorClient(
+                    config.OCAML_EVALUATOR_SOCKET,
+                    timeout=config.OCAML_EVALUATOR_TIMEOUT
+                )
+            )
+        else:
+            self.ocaml_service = create_ocaml_service(repl_sessions=True)
+        self.ocaml_service.start()
+        
+        self.scheduler = EvaluationScheduler(
+            slots=config.OCAML_MAX_CONCURRENT,
+            max_queue_depth=config.EVALUATE_MAX_QUEUE_DEPTH,
+            user_rate=config.EVALUATE_USER_RATE_PER_MINUTE / 60,
+            user_burst=config.EVALUATE_USER_BURST,
+            guild_rate=config.EVALUATE_GUILD_RATE_PER_MINUTE / 60,
+            guild_burst=config.EVALUATE_GUILD_BURST,
+            guild_weights=config.EVALUATE_GUILD_WEIGHTS
+        )
+        
+        self.metrics_server = None
+        if config.METRICS_PORT > 0:
+            self.metrics_server = MetricsServer(metrics, host=config.METRICS_HOST, port=config.METRICS_PORT)
+        self.loop_monitor = EventLoopLagMonitor()
+        
+        self._setup_done = False
+        self._cogs_loaded = False
+        self._synced_command_hash = None
+        self._warm_up_task = None
         
         logger.info("OCaBot initialisé")
     
+    async def setup(self):
+        """
+        Prépare le bot une seule fois, avant la connexion à Discord.
+        
+        Les cogs, le cache d'explications et les métriques ne sont pas rechargés
+        lors des reconnexions à la gateway.
+        """
+        if self._setup_done:
+            return
+        self._setup_done = True
+        
+        self._warm_up_task = asyncio.create_task(self.mistral_service.warm_up())
+        await self.load_cogs()
+        if self.explanation_cache:
+            await self.explanation_cache.load()
+        await self.start_metrics()
+    
     async def on_ready(self):
-        """Événement déclenché quand le bot est prêt."""
+        """Événement déclenché quand le bot est prêt (après chaque reconnexion complète)."""
         logger.info(Messages.BOT_ONLINE.format(bot_user=self.user))
+    
+    async def on_connect(self):
+        """
+        Enregistre les commandes slash et ne les synchronise avec Discord que si leur schéma a changé.
         
-        await self.load_cogs()
+        L'empreinte du schéma déjà envoyé est conservée dans COMMAND_SYNC_HASH_PATH : un redémarrage
+        sans modification des commandes n'appelle pas l'API. Les identifiants des commandes sont
+        alors associés par nextcord à la première interaction reçue.
+        """
+        self.add_all_application_commands()
+        
+        command_hash = self._command_schema_hash()
+        if command_hash in (self._synced_command_hash, self._read_command_hash()):
+            self._synced_command_hash = command_hash
+            logger.info("Commandes slash inchangées, synchronisation ignorée")
+            return
         
         try:
             await self.sync_all_application_commands()
+            self._synced_command_hash = command_hash
+            self._write_command_hash(command_hash)
             logger.info("Commandes slash synchronisées")
         except Exception as e:
             logger.error(f"Erreur lors de la synchronisation des commandes: {e}")
     
+    def _command_schema_hash(self) -> str:
+        """
+        Calcule l'empreinte des commandes slash telles qu'elles seraient envoyées à Discord.
+        
+        Returns:
+            Empreinte SHA-256 hexadécimale
+        """
+        payloads = []
+        for command in self.get_all_application_commands():
+            for guild_id in sorted(command.guild_ids_to_rollout) or [None]:
+                payloads.append(json.dumps(
+                    {"guild_id": guild_id, "command": command.get_payload(guild_id)},
+                    sort_keys=True,
+                    default=str
+                ))
+        
+        digest = hashlib.sha256(str(self.application_id).encode("utf-8"))
+        for payload in sorted(payloads):
+            digest.update(payload.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def _read_command_hash(self):
+        """Lit l'empreinte des dernières commandes synchronisées (None si absente ou désactivée)."""
+        if not config.COMMAND_SYNC_HASH_PATH:
+            return None
+        try:
+            with open(config.COMMAND_SYNC_HASH_PATH, "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+    
+    def _write_command_hash(self, command_hash: str):
+        """Enregistre l'empreinte des commandes qui viennent d'être synchronisées."""
+        if not config.COMMAND_SYNC_HASH_PATH:
+            return
+        try:
+            directory = os.path.dirname(config.COMMAND_SYNC_HASH_PATH)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(config.COMMAND_SYNC_HASH_PATH, "w", encoding="utf-8") as f:
+                f.write(command_hash)
+        except OSError as e:
+            logger.warning(f"Impossible d'enregistrer l'empreinte des commandes: {e}")
+    
     async def load_cogs(self):
-        """Charge tous les cogs du bot."""
+        """Charge tous les cogs du bot (sans effet s'ils sont déjà chargés)."""
+        if self._cogs_loaded:
+            return
+        self._cogs_loaded = True
+        
         cogs_to_load = [
             'src.cogs.basic',
         ]
@@ -65,11 +236,43 @@ class OCaBot(commands.Bot):
         
         try:
             from src.cogs.ocaml import OCamlCog
-            self.add_cog(OCamlCog(self, self.mistral_service))
+            self.add_cog(OCamlCog(
+                self,
+                self.mistral_service,
+                self.ocaml_service,
+                self.scheduler,
+                self.explanation_cache,
+                self.conversations,
+                self.context_builder,
+                self.delivery
+            ))
             logger.info("OCamlCog chargé avec succès")
         except Exception as e:
             logger.error(f"Erreur lors du chargement d'OCamlCog: {e}")
     
+    async def close(self):
+        """Arrête le bot en tuant les sandboxes et en fermant les connexions Mistral."""
+        self.loop_monitor.stop()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        self.scheduler.close()
+        await self.ocaml_service.close()
+        await self.mistral_service.close()
+        if self.explanation_cache:
+            self.explanation_cache.close()
+        self.conversations.close()
+        await super().close()
+    
+    async def start_metrics(self):
+        """Démarre la mesure du retard de la boucle et le serveur de métriques."""
+        self.loop_monitor.start()
+        if self.metrics_server:
+            try:
+                await self.metrics_server.start()
+            except OSError as e:
+                logger.error(f"Impossible de démarrer le serveur de métriques: {e}")
+                self.metrics_server = None
+    
     async def on_command_error(self, ctx, error):
         """Gère les erreurs de commandes."""
         logger.error(f"Erreur de commande: {error}")
@@ -92,6 +295,7 @@ async def main():
             return
         
         bot = OCaBot()
+        await bot.setup()
         
         logger.info("Démarrage d'OCaBot...")
         await bot.start(config.BOT_TOKEN)
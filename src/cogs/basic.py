@@ -17,7 +17,7 @@ class BasicCog(commands.Cog):
     async def ping(self, interaction: nextcord.Interaction):
         """Commande ping pour vérifier la latence du bot."""
         try:
-            logger.info(f"Commande ping exécutée par {interaction.user}")
+            logger.info("Commande ping exécutée par %s", interaction.user)
             
             latency = self.bot.latency * 1000
             embed = nextcord.Embed(
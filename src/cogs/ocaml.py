@@ -1,19 +1,48 @@
+import asyncio
+import io
+import time
+from typing import List, Optional, Tuple
 import nextcord
 from nextcord.ext import commands
 import logging
 from src.config.messages import Messages
-from src.services.ocaml_service import OCamlService
+from src.config.settings import config
+from src.services.ocaml_service import EvaluationResult, OCamlService
 from src.services.mistral_service import MistralService
+from src.services.explanation_cache import ExplanationCache
+from src.services.evaluation_scheduler import AdmissionError, EvaluationScheduler
+from src.services.conversation_store import ConversationMessage, ConversationOrigin, ConversationStore
+from src.services.context_builder import ContextBuilder
+from src.utils.code_blocks import extract_ocaml_blocks
+from src.utils.delivery import MessageDelivery
 from src.utils.error_handler import ErrorHandler
+from src.utils.logger import request_context
+from src.utils.metrics import CACHE_REQUESTS, STAGE_DURATION
+from src.utils.stream_writer import StreamingMessageWriter
 
 logger = logging.getLogger(__name__)
 
 class EvaluateModal(nextcord.ui.Modal):
     """Modal pour l'évaluation de code OCaml."""
     
-    def __init__(self, mistral_service: MistralService):
+    def __init__(
+        self,
+        mistral_service: MistralService,
+        ocaml_service: OCamlService,
+        scheduler: EvaluationScheduler,
+        explanation_cache: Optional[ExplanationCache] = None,
+        conversations: Optional[ConversationStore] = None,
+        delivery: Optional[MessageDelivery] = None,
+        backend: str = "toplevel"
+    ):
         super().__init__(Messages.EVALUATE_MODAL_TITLE)
         self.mistral_service = mistral_service
+        self.ocaml_service = ocaml_service
+        self.scheduler = scheduler
+        self.explanation_cache = explanation_cache
+        self.conversations = conversations or ConversationStore()
+        self.delivery = delivery or MessageDelivery()
+        self.backend = backend
 
         self.code_input = nextcord.ui.TextInput(
             label=Messages.EVALUATE_CODE_LABEL,
@@ -23,14 +52,45 @@ class EvaluateModal(nextcord.ui.Modal):
         self.add_item(self.code_input)
 
     async def callback(self, interaction: nextcord.Interaction):
-        """Traite la soumission du modal."""
+        """Traite la soumission du modal, sous un identifiant de requête repris par tous ses logs."""
+        with request_context("eval"):
+            await self._evaluate(interaction)
+    
+    async def _evaluate(self, interaction: nextcord.Interaction):
+        """Évalue le code soumis, publie le résultat et ouvre le thread de discussion."""
+        started_at = time.perf_counter()
         try:
             code = self.code_input.value
-            await interaction.response.defer()
+            with STAGE_DURATION.time(stage="interaction_defer"):
+                await interaction.response.defer()
+            
+            logger.info("Évaluation OCaml (%s) demandée par %s", self.backend, interaction.user)
+            
+            position_lock = asyncio.Lock()
+            delivery = {"position_shown": False, "done": False}
+            
+            async def show_position(position: int):
+                async with position_lock:
+                    if delivery["done"]:
+                        return
+                    await interaction.edit_original_message(
+                        content=Messages.EVALUATE_QUEUE_POSITION.format(position=position)
+                    )
+                    delivery["position_shown"] = True
             
-            logger.info(f"Évaluation OCaml demandée par {interaction.user}")
+            try:
+                evaluation, wait_time = await self.scheduler.submit(
+                    interaction.user.id,
+                    interaction.guild_id,
+                    lambda: self.ocaml_service.evaluate_code(code, self.backend),
+                    on_position=show_position
+                )
+            except AdmissionError as admission_error:
+                await interaction.followup.send(str(admission_error), ephemeral=True)
+                return
             
-            success, result = await OCamlService.evaluate_code(code)
+            success, result = evaluation.success, evaluation.output
+            logger.info("Évaluation terminée (attente %.2fs, exécution %.2fs)", wait_time, evaluation.duration)
             
             embed = nextcord.Embed(
                 title=Messages.EVALUATE_RESULT_TITLE,
@@ -42,125 +102,608 @@ class EvaluateModal(nextcord.ui.Modal):
                 icon_url=interaction.client.user.avatar.url if interaction.client.user.avatar else None
             )
             
+            footer = [
+                Messages.REQUESTED_BY.format(user=interaction.user),
+                Messages.EVALUATE_TIMING.format(wait=wait_time, execution=evaluation.duration),
+            ]
+            if self.backend != "toplevel":
+                footer.append(Messages.EVALUATE_BACKEND.format(backend=self.backend))
+            
             embed.set_footer(
-                text=Messages.REQUESTED_BY.format(user=interaction.user), 
+                text=" • ".join(footer),
                 icon_url=interaction.user.avatar.url if interaction.user.avatar else None
             )
             
             embed.timestamp = interaction.created_at
             
-            if success:
-                if len(result) > 4096:
-                    embed.description = Messages.EVALUATE_OUTPUT_TOO_LONG
-                else:
-                    embed.description = f"```ocaml\n{result}\n```"
+            if success and self.backend == "toplevel":
+                embed.description = f"```ocaml\n{result}\n```"
+            elif success:
+                embed.description = f"```\n{result}\n```"
             else:
                 embed.description = f"```\nErreur:\n{result}\n```"
                 embed.color = 0xFF0000 
             
-            await interaction.followup.send(embed=embed)
+            attachment = {}
+            if evaluation.truncated or len(embed.description) > MessageDelivery.EMBED_LIMIT:
+                notices = [Messages.EVALUATE_OUTPUT_ATTACHED]
+                if evaluation.truncated:
+                    notices.insert(0, Messages.EVALUATE_OUTPUT_TRUNCATED.format(limit=self.ocaml_service.max_output_bytes))
+                embed.description = "\n".join(notices)
+                attachment["file"] = nextcord.File(io.BytesIO(result.encode("utf-8")), filename="sortie.txt")
+            
+            async with position_lock:
+                delivery["done"] = True
+                with STAGE_DURATION.time(stage="discord_send"):
+                    if delivery["position_shown"]:
+                        result_message = await interaction.edit_original_message(content=None, embed=embed, **attachment)
+                    else:
+                        result_message = await interaction.followup.send(embed=embed, **attachment)
+            STAGE_DURATION.observe(time.perf_counter() - started_at, stage="evaluate_result")
             
             if interaction.guild and success:
-                await self._create_discussion_thread(interaction, code, result)
+                await self._create_discussion_thread(interaction, result_message, code, result)
                 
         except Exception as e:
-            logger.error(f"Erreur lors de l'évaluation: {str(e)}")
+            logger.error("Erreur lors de l'évaluation: %s", e)
             await ErrorHandler.handle_interaction_error(
                 interaction, e, Messages.ERROR_EVALUATION
             )
     
-    async def _create_discussion_thread(self, interaction: nextcord.Interaction, code: str, output: str):
-        """Crée un thread de discussion avec explication Mistral."""
+    async def _create_discussion_thread(
+        self,
+        interaction: nextcord.Interaction,
+        message: nextcord.Message,
+        code: str,
+        output: str
+    ):
+        """
+        Crée un thread de discussion avec explication Mistral.
+        
+        Le thread est ouvert sur le message de résultat lui-même : après une attente dans la file,
+        le dernier message du salon peut appartenir à un autre utilisateur.
+        """
         try:
-            channel = interaction.channel
-            async for message in channel.history(limit=1):
-                if message.author == interaction.client.user and message.embeds:
-                    # Créer le thread avec un nom temporaire d'abord
-                    thread_name = Messages.EVALUATE_THREAD_NAME.format(
-                        username=interaction.user.display_name
-                    )
-                    thread = await message.create_thread(name=thread_name)
-                    await thread.trigger_typing()
-                    
-                    custom_thread_name = await self.mistral_service.generate_thread_name(code)
-                    
-                    if custom_thread_name:
-                        try:
-                            await thread.edit(name=custom_thread_name)
-                            logger.info(f"Thread renommé: {custom_thread_name}")
-                        except Exception as rename_error:
-                            logger.warning(f"Impossible de renommer le thread: {rename_error}")
-
-                    await thread.trigger_typing()
-                    explanation = await self.mistral_service.explain_ocaml_code(code, output)
-                    
-                    if explanation:
-                        chunks = MistralService.split_message(explanation)
-                        for chunk in chunks:
-                            await thread.send(chunk)
-                    else:
-                        await thread.send(Messages.ERROR_MISTRAL_RESPONSE)
-                    
-                    break
+            # Créer le thread avec un nom temporaire d'abord
+            thread_name = Messages.EVALUATE_THREAD_NAME.format(
+                username=interaction.user.display_name
+            )
+            thread = await message.create_thread(name=thread_name)
+            self.conversations.create(thread.id, origin=(code, output))
+            await self.conversations.save_origin(thread.id, (code, output))
+            await thread.trigger_typing()
+            
+            if await self._send_cached_thread_details(thread, code, output):
+                return
+            
+            if config.MISTRAL_STREAMING:
+                thread_name, explanation = await self._stream_thread_details(thread, code, output)
+            else:
+                thread_name, explanation = await self._send_thread_details(thread, code, output)
+            
+            if self.explanation_cache and explanation:
+                await self.explanation_cache.set(code, output, explanation, thread_name)
                     
         except Exception as e:
             ErrorHandler.log_service_error("Thread Creation", e, f"User: {interaction.user}")
 
+    async def _send_cached_thread_details(self, thread: nextcord.Thread, code: str, output: str) -> bool:
+        """
+        Renomme le thread et envoie l'explication depuis le cache, sans appel à Mistral.
+        
+        Returns:
+            True si une explication était en cache
+        """
+        if not self.explanation_cache:
+            return False
+        
+        cached = await self.explanation_cache.get(code, output)
+        CACHE_REQUESTS.inc(cache="explanation", result="hit" if cached else "miss")
+        if not cached:
+            return False
+        
+        logger.info("Explication servie depuis le cache")
+        await self._apply_thread_name(thread, cached["title"])
+        message = await self.delivery.send(thread, cached["explanation"])
+        self.conversations.append_reply(thread.id, message.id, cached["explanation"])
+        return True
+    
+    async def _send_thread_details(self, thread: nextcord.Thread, code: str, output: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Renomme le thread et envoie l'explication, en une requête Mistral structurée si possible.
+        
+        Returns:
+            Tuple (nom du thread, explication) générés, None pour un élément en échec
+        """
+        details = await self.mistral_service.generate_thread_details(code, output)
+        
+        if details:
+            thread_name, explanation = details["title"], details["explanation"]
+        else:
+            logger.warning("Génération structurée échouée, repli sur deux requêtes concurrentes")
+            thread_name, explanation = await asyncio.gather(
+                self.mistral_service.generate_thread_name(code),
+                self.mistral_service.explain_ocaml_code(code, output)
+            )
+        
+        await self._apply_thread_name(thread, thread_name)
+        
+        message = await self.delivery.send(thread, explanation or Messages.ERROR_MISTRAL_RESPONSE)
+        if explanation:
+            self.conversations.append_reply(thread.id, message.id, explanation)
+        
+        return thread_name, explanation
+    
+    async def _stream_thread_details(self, thread: nextcord.Thread, code: str, output: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Renomme le thread et publie l'explication en streaming, en une requête Mistral structurée si possible.
+        
+        Returns:
+            Tuple (nom du thread, explication) générés, None pour un élément en échec ou incomplet
+        """
+        writer = StreamingMessageWriter(thread.send, queue=self.delivery.queue(thread.id))
+        rename_task = None
+        explanation = None
+        
+        try:
+            async for field, text in self.mistral_service.stream_thread_details(code, output):
+                if field == "title" and rename_task is None:
+                    rename_task = asyncio.ensure_future(self._apply_thread_name(thread, text))
+                elif field == "explanation":
+                    await writer.feed(text)
+            await writer.finish()
+            explanation = writer.text
+            
+        except Exception as e:
+            logger.warning("Génération structurée en streaming échouée: %s", e)
+            if writer.text.strip():
+                await writer.finish()
+            else:
+                if rename_task is None:
+                    rename_task = asyncio.ensure_future(self._rename_thread(thread, code))
+                try:
+                    explanation = await writer.consume(self.mistral_service.stream_explanation(code, output))
+                except Exception as stream_error:
+                    logger.error("Erreur lors du streaming de l'explication: %s", stream_error)
+                    await self.delivery.send(thread, Messages.ERROR_MISTRAL_RESPONSE)
+        
+        if writer.messages:
+            self.conversations.append_reply(thread.id, writer.messages[0].id, writer.text)
+        if rename_task is None:
+            rename_task = asyncio.ensure_future(self._rename_thread(thread, code))
+        thread_name = await rename_task
+        return thread_name, explanation
+    
+    async def _rename_thread(self, thread: nextcord.Thread, code: str) -> Optional[str]:
+        """Renomme le thread avec un nom généré à partir du code."""
+        return await self._apply_thread_name(thread, await self.mistral_service.generate_thread_name(code))
+    
+    async def _apply_thread_name(self, thread: nextcord.Thread, thread_name: Optional[str]) -> Optional[str]:
+        """Applique un nom de thread généré, s'il existe, et le retourne."""
+        if thread_name:
+            try:
+                await thread.edit(name=thread_name)
+                logger.info("Thread renommé: %s", thread_name)
+            except Exception as rename_error:
+                logger.warning("Impossible de renommer le thread: %s", rename_error)
+        return thread_name
+
 class OCamlCog(commands.Cog):
     """Cog pour les fonctionnalités OCaml."""
     
-    def __init__(self, bot, mistral_service: MistralService):
+    def __init__(
+        self,
+        bot,
+        mistral_service: MistralService,
+        ocaml_service: OCamlService,
+        scheduler: EvaluationScheduler,
+        explanation_cache: Optional[ExplanationCache] = None,
+        conversations: Optional[ConversationStore] = None,
+        context_builder: Optional[ContextBuilder] = None,
+        delivery: Optional[MessageDelivery] = None
+    ):
         self.bot = bot
         self.mistral_service = mistral_service
+        self.ocaml_service = ocaml_service
+        self.scheduler = scheduler
+        self.explanation_cache = explanation_cache
+        self.conversations = conversations or ConversationStore()
+        self.context_builder = context_builder or ContextBuilder(mistral_service)
+        self.delivery = delivery or MessageDelivery()
         logger.info("OCamlCog initialisé")
     
     @nextcord.slash_command(name="evaluate", description="Évaluer du code OCaml dans un environnement sécurisé")
-    async def evaluate(self, interaction: nextcord.Interaction):
+    async def evaluate(
+        self,
+        interaction: nextcord.Interaction,
+        backend: str = nextcord.SlashOption(
+            name="mode",
+            description="Mode d'exécution du code",
+            choices={
+                "Toplevel (interprété)": "toplevel",
+                "Bytecode (ocamlc)": "bytecode",
+                "Natif (ocamlopt)": "native",
+            },
+            required=False,
+            default="toplevel"
+        )
+    ):
         """Commande pour évaluer du code OCaml."""
         try:
-            logger.info(f"Commande evaluate ouverte par {interaction.user}")
-            modal = EvaluateModal(self.mistral_service)
+            if backend not in self.ocaml_service.backends:
+                await interaction.response.send_message(Messages.EVALUATE_BACKEND_UNAVAILABLE, ephemeral=True)
+                return
+            
+            logger.info("Commande evaluate (%s) ouverte par %s", backend, interaction.user)
+            modal = EvaluateModal(
+                self.mistral_service,
+                self.ocaml_service,
+                self.scheduler,
+                self.explanation_cache,
+                self.conversations,
+                self.delivery,
+                backend
+            )
             await interaction.response.send_modal(modal)
             
         except Exception as e:
             await ErrorHandler.handle_interaction_error(interaction, e)
     
+    @commands.command(name="batch")
+    async def batch(self, ctx: commands.Context, *, arguments: str = ""):
+        """
+        Commande !batch : évalue en parallèle les fichiers .ml joints et les blocs ```ocaml du message.
+        
+        Un mode d'exécution (toplevel, bytecode, native) peut être donné en premier argument.
+        """
+        with request_context("batch"):
+            await self._evaluate_batch(ctx, arguments)
+    
+    @commands.command(name="session")
+    async def session(self, ctx: commands.Context, state: str = ""):
+        """
+        Commande !session : active ou désactive la session REPL du thread de discussion.
+        
+        Sans argument, l'état courant est inversé ; "on" et "off" le fixent.
+        """
+        with request_context("session"):
+            await self._toggle_session(ctx, state.lower())
+    
+    async def _toggle_session(self, ctx: commands.Context, state: str):
+        """Active ou désactive l'évaluation des blocs ```ocaml du thread dans sa session REPL."""
+        try:
+            channel = ctx.channel
+            if not self._is_ocaml_thread(channel):
+                await ctx.reply(Messages.REPL_SESSION_NOT_THREAD)
+                return
+            if not self.ocaml_service.sessions_enabled:
+                await ctx.reply(Messages.REPL_SESSION_UNAVAILABLE)
+                return
+            if state not in ("", "on", "off"):
+                await ctx.reply(Messages.REPL_SESSION_USAGE)
+                return
+            
+            await self.conversations.get(channel.id, lambda: self._fetch_history(channel))
+            if state:
+                enabled = state == "on"
+            else:
+                enabled = not await self.conversations.repl_session_enabled(channel.id)
+            await self.conversations.set_repl_session(channel.id, enabled)
+            if not enabled:
+                await self.ocaml_service.end_session(channel.id)
+            
+            logger.info("Session REPL du thread %s %s par %s", channel.id, "activée" if enabled else "désactivée", ctx.author)
+            await ctx.reply(Messages.REPL_SESSION_ENABLED if enabled else Messages.REPL_SESSION_DISABLED)
+            
+        except Exception as e:
+            logger.error("Erreur lors du changement de session: %s", e)
+            await ErrorHandler.handle_message_error(ctx.message, e, Messages.ERROR_GENERAL)
+    
+    async def _evaluate_batch(self, ctx: commands.Context, arguments: str):
+        """Évalue un lot d'extraits et publie un résultat agrégé en une seule réponse."""
+        started_at = time.perf_counter()
+        try:
+            words = arguments.split(maxsplit=1)
+            backend = words[0] if words and words[0] in OCamlService.BACKENDS else "toplevel"
+            if backend not in self.ocaml_service.backends:
+                await ctx.reply(Messages.EVALUATE_BACKEND_UNAVAILABLE)
+                return
+            
+            files, skipped = self._batch_files(ctx.message)
+            blocks = extract_ocaml_blocks(ctx.message.content)
+            count = len(files) + len(blocks)
+            if not count:
+                await ctx.reply("\n".join(skipped + [Messages.BATCH_NO_SNIPPETS]))
+                return
+            if count > config.BATCH_MAX_SNIPPETS:
+                await ctx.reply(Messages.BATCH_TOO_MANY.format(count=count, limit=config.BATCH_MAX_SNIPPETS))
+                return
+            
+            snippets = await self._collect_snippets(files, blocks)
+            
+            logger.info("Évaluation groupée (%s, %s extraits) demandée par %s", backend, len(snippets), ctx.author)
+            
+            try:
+                async with ctx.typing():
+                    results, wait_time = await self.scheduler.submit(
+                        ctx.author.id,
+                        ctx.guild.id if ctx.guild else None,
+                        lambda: self.ocaml_service.evaluate_batch([(code, backend) for _, code in snippets]),
+                        cost=len(snippets)
+                    )
+            except AdmissionError as admission_error:
+                await ctx.reply(str(admission_error))
+                return
+            
+            execution = max((result.duration for result in results), default=0.0)
+            logger.info("Évaluation groupée terminée (attente %.2fs, exécution %.2fs)", wait_time, execution)
+            
+            embed, report = self._batch_report(snippets, results, skipped)
+            embed.set_author(
+                name="OCaBot",
+                icon_url=self.bot.user.avatar.url if self.bot.user.avatar else None
+            )
+            footer = [
+                Messages.REQUESTED_BY.format(user=ctx.author),
+                Messages.EVALUATE_TIMING.format(wait=wait_time, execution=execution),
+            ]
+            if backend != "toplevel":
+                footer.append(Messages.EVALUATE_BACKEND.format(backend=backend))
+            embed.set_footer(
+                text=" • ".join(footer),
+                icon_url=ctx.author.avatar.url if ctx.author.avatar else None
+            )
+            embed.timestamp = ctx.message.created_at
+            
+            with STAGE_DURATION.time(stage="discord_send"):
+                await ctx.reply(
+                    embed=embed,
+                    file=nextcord.File(io.BytesIO(report.encode("utf-8")), filename="resultats.txt")
+                )
+            STAGE_DURATION.observe(time.perf_counter() - started_at, stage="batch_result")
+            
+        except Exception as e:
+            logger.error("Erreur lors de l'évaluation groupée: %s", e)
+            await ErrorHandler.handle_message_error(ctx.message, e, Messages.ERROR_EVALUATION)
+    
+    @staticmethod
+    def _batch_files(message: nextcord.Message) -> Tuple[List[nextcord.Attachment], List[str]]:
+        """
+        Sélectionne les fichiers .ml joints à un message, sans les télécharger.
+        
+        Returns:
+            Tuple (fichiers retenus, avertissements sur les fichiers trop gros)
+        """
+        files = [attachment for attachment in message.attachments if attachment.filename.lower().endswith(".ml")]
+        skipped = [
+            Messages.BATCH_FILE_SKIPPED.format(filename=attachment.filename, limit=config.BATCH_MAX_FILE_BYTES)
+            for attachment in files if attachment.size > config.BATCH_MAX_FILE_BYTES
+        ]
+        return [attachment for attachment in files if attachment.size <= config.BATCH_MAX_FILE_BYTES], skipped
+    
+    async def _collect_snippets(self, files: List[nextcord.Attachment], blocks: List[str]) -> List[Tuple[str, str]]:
+        """
+        Rassemble les extraits d'un lot : contenu des fichiers .ml joints puis blocs ```ocaml.
+        
+        Returns:
+            Liste de couples (nom, code)
+        """
+        contents = await asyncio.gather(*(attachment.read() for attachment in files))
+        
+        snippets = [
+            (attachment.filename, content.decode("utf-8", errors="replace"))
+            for attachment, content in zip(files, contents)
+        ]
+        snippets.extend(
+            (Messages.BATCH_BLOCK_NAME.format(index=index), code)
+            for index, code in enumerate(blocks, start=1)
+        )
+        return snippets
+    
+    @staticmethod
+    def _batch_report(snippets: List[Tuple[str, str]], results: List[EvaluationResult], skipped: List[str]) -> Tuple[nextcord.Embed, str]:
+        """
+        Construit le résumé d'un lot (embed) et le rapport complet des sorties (texte joint).
+        
+        Args:
+            snippets: Couples (nom, code) évalués
+            results: Résultats dans l'ordre des extraits
+            skipped: Avertissements sur les fichiers ignorés
+            
+        Returns:
+            Tuple (embed de résumé, rapport complet)
+        """
+        failed = sum(1 for result in results if not result.success)
+        header = [Messages.BATCH_SUMMARY.format(succeeded=len(results) - failed, failed=failed)] + skipped + [""]
+        footer = ["", Messages.BATCH_REPORT_ATTACHED]
+        budget = MessageDelivery.EMBED_LIMIT - len("\n".join(header + footer)) - len(Messages.BATCH_MORE_RESULTS) - 16
+        
+        lines = []
+        report = []
+        for index, ((name, _), result) in enumerate(zip(snippets, results)):
+            first_line = next((line.strip() for line in result.output.splitlines() if line.strip()), "").replace("`", "'")
+            if len(first_line) > 80:
+                first_line = first_line[:77] + "..."
+            line = f"{'✅' if result.success else '❌'} `{name}` ({result.duration:.1f} s)"
+            if first_line:
+                line += f" : `{first_line}`"
+            if budget - len(line) - 1 >= 0 and len(lines) == index:
+                lines.append(line)
+                budget -= len(line) + 1
+            
+            status = "réussi" if result.success else "erreur"
+            report.append(f"=== {name} ({status}, {result.duration:.2f} s) ===\n{result.output}\n")
+        
+        if len(lines) < len(results):
+            lines.append(Messages.BATCH_MORE_RESULTS.format(count=len(results) - len(lines)))
+        
+        embed = nextcord.Embed(
+            title=Messages.BATCH_TITLE.format(count=len(results)),
+            description="\n".join(header + lines + footer),
+            color=0xFF0000 if failed == len(results) else 0xDF6799
+        )
+        return embed, "\n".join(report)
+    
     @commands.Cog.listener()
     async def on_message(self, message):
-        """Gère les mentions du bot dans les threads OCaml."""
+        """
+        Gère les mentions du bot dans les threads OCaml et tient à jour leur conversation.
+        
+        Sans mention, les blocs ```ocaml postés dans le thread sont évalués dans sa session REPL
+        si elle a été activée avec !session.
+        """
+        if not self._is_ocaml_thread(message.channel):
+            return
+        
         if message.author == self.bot.user:
             return
         
+        if message.content.strip():
+            self.conversations.append(
+                message.channel.id, message.id, self._author_name(message.author), message.content
+            )
+        
         if self.bot.user in message.mentions:
-            if (hasattr(message.channel, 'parent') and 
-                hasattr(message.channel, 'owner') and 
-                message.channel.owner == self.bot.user):
+            with request_context("mention"):
                 await self._handle_thread_mention(message)
+        elif self.ocaml_service.sessions_enabled and not message.author.bot:
+            # Les commandes (!batch, !session...) traitent elles-mêmes leurs blocs, hors de la session
+            if (await self.bot.get_context(message)).valid:
+                return
+            blocks = extract_ocaml_blocks(message.content)
+            if blocks and await self.conversations.repl_session_enabled(message.channel.id):
+                with request_context("repl"):
+                    await self._evaluate_in_session(message, blocks)
+    
+    async def _evaluate_in_session(self, message: nextcord.Message, blocks: List[str]):
+        """Évalue les blocs d'un message dans la session REPL du thread, à la suite des évaluations précédentes."""
+        started_at = time.perf_counter()
+        channel = message.channel
+        try:
+            seed = None
+            if not self.ocaml_service.has_session(channel.id):
+                conversation = await self.conversations.get(channel.id, lambda: self._fetch_history(channel))
+                if conversation.origin:
+                    seed = conversation.origin[0]
+            
+            logger.info("Évaluation en session (%s blocs) demandée par %s", len(blocks), message.author)
+            
+            try:
+                async with channel.typing():
+                    evaluation, wait_time = await self.scheduler.submit(
+                        message.author.id,
+                        message.guild.id if message.guild else None,
+                        lambda: self.ocaml_service.evaluate_in_session(channel.id, "\n;;\n".join(blocks), seed)
+                    )
+            except AdmissionError as admission_error:
+                await self.delivery.send(channel, str(admission_error), reply_to=message)
+                return
+            
+            logger.info("Évaluation en session terminée (attente %.2fs, exécution %.2fs)", wait_time, evaluation.duration)
+            
+            parts = []
+            if evaluation.session_reset:
+                parts.append(Messages.REPL_SESSION_RESET)
+            if evaluation.truncated:
+                parts.append(Messages.EVALUATE_OUTPUT_TRUNCATED.format(limit=self.ocaml_service.max_output_bytes))
+            if evaluation.success:
+                parts.append(f"```ocaml\n{evaluation.output}\n```")
+            else:
+                parts.append(f"```\nErreur:\n{evaluation.output}\n```")
+            
+            with STAGE_DURATION.time(stage="discord_send"):
+                reply = await self.delivery.send(channel, "\n".join(parts), reply_to=message)
+            self.conversations.append_reply(channel.id, reply.id, "\n".join(parts))
+            STAGE_DURATION.observe(time.perf_counter() - started_at, stage="repl_result")
+            
+        except Exception as e:
+            logger.error("Erreur lors de l'évaluation en session: %s", e)
+            await ErrorHandler.handle_message_error(message, e, Messages.ERROR_EVALUATION)
+    
+    def _is_ocaml_thread(self, channel) -> bool:
+        """Indique si le salon est un thread de discussion créé par le bot."""
+        return (hasattr(channel, 'parent') and 
+                hasattr(channel, 'owner') and 
+                channel.owner == self.bot.user)
+    
+    def _author_name(self, author) -> str:
+        """Nom de l'auteur tel qu'il apparaît dans le contexte envoyé à Mistral."""
+        return "Utilisateur" if author != self.bot.user else ConversationStore.BOT_AUTHOR
+    
+    @staticmethod
+    def _message_text(message: nextcord.Message) -> str:
+        """Texte d'un message, y compris celui d'une réponse livrée en embed."""
+        if message.content or not message.embeds:
+            return message.content
+        return message.embeds[0].description or ""
+    
+    async def _fetch_history(self, channel) -> Tuple[List[ConversationMessage], Optional[ConversationOrigin]]:
+        """Récupère les derniers messages d'un thread, du plus ancien au plus récent, et l'évaluation à son origine."""
+        history = []
+        async for msg in channel.history(limit=self.conversations.max_messages):
+            content = self._message_text(msg)
+            if content.strip():
+                history.append((msg.id, self._author_name(msg.author), content))
+        history.reverse()
+        return history, await self._fetch_origin(channel)
+    
+    async def _fetch_origin(self, channel) -> Optional[ConversationOrigin]:
+        """
+        Retrouve le code et la sortie de l'évaluation à l'origine du thread.
+        
+        Ils sont relus depuis le stockage des conversations ; à défaut, seule la sortie est reprise
+        du message d'origine du thread (le code n'y figure pas).
+        """
+        origin = await self.conversations.load_origin(channel.id)
+        if origin is not None:
+            return origin
+        
+        try:
+            starter = await channel.parent.fetch_message(channel.id)
+        except Exception as e:
+            logger.warning("Message d'origine du thread %s introuvable: %s", channel.id, e)
+            return None
+        
+        if not starter.embeds or not starter.embeds[0].description:
+            return None
+        output = starter.embeds[0].description
+        if output.startswith("```ocaml\n") and output.endswith("\n```"):
+            output = output[len("```ocaml\n"):-len("\n```")]
+        return None, output
     
     async def _handle_thread_mention(self, message):
         """Gère une mention dans un thread OCaml."""
         try:
             await message.channel.trigger_typing()
             
-            thread_history = []
-            async for msg in message.channel.history(limit=50, oldest_first=True):
-                if msg.content.strip():
-                    author_name = "Utilisateur" if msg.author != self.bot.user else "OCaBot"
-                    thread_history.append(f"{author_name}: {msg.content}")
+            conversation = await self.conversations.get(
+                message.channel.id, lambda: self._fetch_history(message.channel)
+            )
+            context = self.context_builder.build(conversation)
             
-            context = "\n".join(thread_history[-20:])
+            if config.MISTRAL_STREAMING:
+                writer = StreamingMessageWriter(
+                    message.reply,
+                    message.channel.send,
+                    queue=self.delivery.queue(message.channel.id)
+                )
+                try:
+                    await writer.consume(self.mistral_service.stream_response(context, message.content))
+                except Exception as stream_error:
+                    logger.error("Erreur lors du streaming de la réponse: %s", stream_error)
+                    await self.delivery.send(message.channel, Messages.ERROR_MISTRAL_RESPONSE, reply_to=message)
+                if writer.messages:
+                    self.conversations.append_reply(message.channel.id, writer.messages[0].id, writer.text)
+                return
             
             response = await self.mistral_service.generate_response(context, message.content)
             
+            reply = await self.delivery.send(message.channel, response or Messages.ERROR_MISTRAL_RESPONSE, reply_to=message)
             if response:
-                chunks = MistralService.split_message(response)
-                for chunk in chunks:
-                    await message.reply(chunk)
-            else:
-                await message.reply(Messages.ERROR_MISTRAL_RESPONSE)
+                self.conversations.append_reply(message.channel.id, reply.id, response)
                 
         except Exception as e:
-            logger.error(f"Erreur lors du traitement de mention: {str(e)}")
+            logger.error("Erreur lors du traitement de mention: %s", e)
             await ErrorHandler.handle_message_error(message, e)
 
 def setup(bot):
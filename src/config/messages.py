@@ -7,8 +7,33 @@ class Messages:
     EVALUATE_MODAL_TITLE = "Évaluer du code OCaml"
     EVALUATE_CODE_LABEL = "Code OCaml"
     EVALUATE_RESULT_TITLE = "Évaluation du code OCaml"
-    EVALUATE_OUTPUT_TOO_LONG = "Sortie trop longue... Essayez de simplifier votre code ou de l'exécuter localement. (Maximum 4096 caractères)"
+    EVALUATE_OUTPUT_ATTACHED = "Sortie trop longue pour être affichée, voir la pièce jointe."
+    EVALUATE_OUTPUT_TRUNCATED = "Sortie tronquée à {limit} octets : l'exécution a été interrompue."
     EVALUATE_THREAD_NAME = "Discussion OCaml - {username}"
+    EVALUATE_QUEUE_POSITION = "⏳ En file d'attente : position {position}"
+    EVALUATE_QUEUE_FULL = "Trop d'évaluations en attente pour le moment. Réessayez dans quelques instants."
+    EVALUATE_RATE_LIMITED = "Vous évaluez du code trop souvent. Réessayez dans {retry_after:.0f} secondes."
+    EVALUATE_TIMING = "File d'attente : {wait:.1f} s • Exécution : {execution:.1f} s"
+    EVALUATE_BACKEND = "Mode : {backend}"
+    EVALUATE_BACKEND_UNAVAILABLE = "Ce mode d'exécution n'est pas disponible sur ce bot."
+    
+    BATCH_TITLE = "Évaluation groupée : {count} extraits"
+    BATCH_SUMMARY = "✅ {succeeded} réussis • ❌ {failed} en erreur"
+    BATCH_BLOCK_NAME = "bloc {index}"
+    BATCH_NO_SNIPPETS = "Aucun code à évaluer : joignez des fichiers `.ml` ou placez le code dans des blocs ```ocaml."
+    BATCH_TOO_MANY = "Trop d'extraits dans ce lot ({count}, maximum {limit})."
+    BATCH_FILE_SKIPPED = "⚠️ `{filename}` ignoré : plus de {limit} octets"
+    BATCH_MORE_RESULTS = "… et {count} autres extraits"
+    BATCH_REPORT_ATTACHED = "Sorties complètes dans la pièce jointe."
+    
+    REPL_SESSION_ENABLED = "🟢 Session REPL activée : les blocs ```ocaml de ce thread sont évalués à la suite, avec les définitions précédentes. `!session off` pour l'arrêter."
+    REPL_SESSION_DISABLED = "Session REPL désactivée pour ce thread."
+    REPL_SESSION_USAGE = "Usage : `!session [on|off]`"
+    REPL_SESSION_NOT_THREAD = "Cette commande s'utilise dans un thread de discussion OCaml."
+    REPL_SESSION_UNAVAILABLE = "Les sessions REPL ne sont pas disponibles sur ce bot."
+    REPL_SESSION_RESET = "⚠️ La session de ce thread a été réinitialisée : les définitions précédentes ne sont plus disponibles."
+    
+    DELIVERY_ATTACHED = "\n\n*Réponse complète en pièce jointe.*"
     
     ERROR_GENERAL = "Désolé, j'ai rencontré une erreur. 🤖"
     ERROR_EVALUATION = "Erreur lors de l'évaluation du code OCaml."
@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Dict, Optional
 import logging
 import dotenv
 
@@ -11,9 +11,74 @@ class Config:
     """Configuration centralisée du bot."""
     
     def __init__(self):
-        self.BOT_TOKEN = self._get_env_var("BOT_TOKEN")
-        self.MISTRAL_API_KEY = self._get_env_var("MISTRAL_API_KEY")
+        self.BOT_TOKEN = self._get_env_var("BOT_TOKEN", "")
+        self.MISTRAL_API_KEY = self._get_env_var("MISTRAL_API_KEY", "")
         self.LOG_LEVEL = self._get_env_var("LOG_LEVEL", "INFO")
+        self.LOG_FORMAT = self._get_env_var("LOG_FORMAT", "text")
+        self.LOG_SAMPLE_RATE = self._get_float_env_var("LOG_SAMPLE_RATE", 1.0)
+        self.METRICS_HOST = self._get_env_var("METRICS_HOST", "127.0.0.1")
+        self.METRICS_PORT = self._get_int_env_var("METRICS_PORT", 9108)
+        self.COMMAND_SYNC_HASH_PATH = self._get_env_var("COMMAND_SYNC_HASH_PATH", "data/commands.hash")
+        
+        self.MISTRAL_SERVER_URL = self._get_env_var("MISTRAL_SERVER_URL", "")
+        self.MISTRAL_TIMEOUT = self._get_int_env_var("MISTRAL_TIMEOUT", 30)
+        self.MISTRAL_MAX_CONCURRENT = self._get_int_env_var("MISTRAL_MAX_CONCURRENT", 8)
+        self.MISTRAL_MAX_RETRIES = self._get_int_env_var("MISTRAL_MAX_RETRIES", 3)
+        self.MISTRAL_STREAMING = self._get_bool_env_var("MISTRAL_STREAMING", True)
+        self.MISTRAL_MODEL = self._get_env_var("MISTRAL_MODEL", "mistral-large-latest")
+        self.MISTRAL_SMALL_MODEL = self._get_env_var("MISTRAL_SMALL_MODEL", "mistral-small-latest")
+        self.MISTRAL_SMALL_INPUT_CHARS = self._get_int_env_var("MISTRAL_SMALL_INPUT_CHARS", 600)
+        self.MISTRAL_SLO = self._get_float_env_var("MISTRAL_SLO", 20.0)
+        self.MISTRAL_TASK_SLOS = self._get_durations_env_var("MISTRAL_TASK_SLOS")
+        self.MISTRAL_HEDGE = self._get_bool_env_var("MISTRAL_HEDGE", True)
+        self.MISTRAL_HEDGE_MIN_SAMPLES = self._get_int_env_var("MISTRAL_HEDGE_MIN_SAMPLES", 20)
+        self.PROMPT_CODE_TOKENS = self._get_int_env_var("PROMPT_CODE_TOKENS", 1500)
+        self.PROMPT_OUTPUT_TOKENS = self._get_int_env_var("PROMPT_OUTPUT_TOKENS", 1500)
+        self.PROMPT_MAX_LINE_CHARS = self._get_int_env_var("PROMPT_MAX_LINE_CHARS", 300)
+        
+        self.EXPLANATION_CACHE_SIZE = self._get_int_env_var("EXPLANATION_CACHE_SIZE", 1000)
+        self.EXPLANATION_CACHE_PATH = self._get_env_var("EXPLANATION_CACHE_PATH", "data/explanations.db")
+        self.EXPLANATION_CACHE_RENAME = self._get_bool_env_var("EXPLANATION_CACHE_RENAME", False)
+        
+        self.CONVERSATION_MAX_THREADS = self._get_int_env_var("CONVERSATION_MAX_THREADS", 500)
+        self.CONVERSATION_MAX_MESSAGES = self._get_int_env_var("CONVERSATION_MAX_MESSAGES", 50)
+        self.CONVERSATION_ORIGINS_PATH = self._get_env_var("CONVERSATION_ORIGINS_PATH", "data/threads.db")
+        self.CONTEXT_TOKEN_BUDGET = self._get_int_env_var("CONTEXT_TOKEN_BUDGET", 3000)
+        self.CONTEXT_SUMMARY_TOKENS = self._get_int_env_var("CONTEXT_SUMMARY_TOKENS", 400)
+        self.CONTEXT_RECENT_MESSAGES = self._get_int_env_var("CONTEXT_RECENT_MESSAGES", 20)
+        
+        self.DISCORD_CHANNEL_RATE = self._get_int_env_var("DISCORD_CHANNEL_RATE", 5)
+        self.DISCORD_CHANNEL_RATE_PERIOD = self._get_int_env_var("DISCORD_CHANNEL_RATE_PERIOD", 5)
+        
+        self.OCAML_MAX_CONCURRENT = self._get_int_env_var("OCAML_MAX_CONCURRENT", 4)
+        self.OCAML_TIMEOUT = self._get_int_env_var("OCAML_TIMEOUT", 35)
+        self.OCAML_POOL_MIN_SIZE = self._get_int_env_var("OCAML_POOL_MIN_SIZE", 2)
+        self.OCAML_POOL_MAX_SIZE = self._get_int_env_var("OCAML_POOL_MAX_SIZE", self.OCAML_MAX_CONCURRENT + 2)
+        self.OCAML_POOL_MAX_RUNS = self._get_int_env_var("OCAML_POOL_MAX_RUNS", 1)
+        self.OCAML_MAX_OUTPUT_BYTES = self._get_int_env_var("OCAML_MAX_OUTPUT_BYTES", 262144)
+        self.OCAML_ARTIFACT_DIR = self._get_env_var("OCAML_ARTIFACT_DIR", "data/artifacts")
+        self.OCAML_ARTIFACT_MAX_ENTRIES = self._get_int_env_var("OCAML_ARTIFACT_MAX_ENTRIES", 200)
+        self.OCAML_TYPECHECK = self._get_bool_env_var("OCAML_TYPECHECK", False)
+        self.OCAML_TYPECHECK_CACHE_SIZE = self._get_int_env_var("OCAML_TYPECHECK_CACHE_SIZE", 1024)
+        self.OCAML_CACHE_SIZE = self._get_int_env_var("OCAML_CACHE_SIZE", 1024)
+        self.OCAML_CACHE_TTL = self._get_int_env_var("OCAML_CACHE_TTL", 3600)
+        self.OCAML_CACHE_PATH = self._get_env_var("OCAML_CACHE_PATH", "")
+        self.OCAML_EVALUATOR_SOCKET = self._get_env_var("OCAML_EVALUATOR_SOCKET", "")
+        self.OCAML_EVALUATOR_TIMEOUT = self._get_int_env_var("OCAML_EVALUATOR_TIMEOUT", 120)
+        self.OCAML_EVALUATOR_MAX_PENDING = self._get_int_env_var("OCAML_EVALUATOR_MAX_PENDING", 64)
+        
+        self.EVALUATE_MAX_QUEUE_DEPTH = self._get_int_env_var("EVALUATE_MAX_QUEUE_DEPTH", 50)
+        self.EVALUATE_USER_RATE_PER_MINUTE = self._get_int_env_var("EVALUATE_USER_RATE_PER_MINUTE", 6)
+        self.EVALUATE_USER_BURST = self._get_int_env_var("EVALUATE_USER_BURST", 3)
+        self.EVALUATE_GUILD_RATE_PER_MINUTE = self._get_int_env_var("EVALUATE_GUILD_RATE_PER_MINUTE", 60)
+        self.EVALUATE_GUILD_BURST = self._get_int_env_var("EVALUATE_GUILD_BURST", 20)
+        self.EVALUATE_GUILD_WEIGHTS = self._get_weights_env_var("EVALUATE_GUILD_WEIGHTS")
+        self.BATCH_MAX_SNIPPETS = self._get_int_env_var("BATCH_MAX_SNIPPETS", 30)
+        self.BATCH_MAX_FILE_BYTES = self._get_int_env_var("BATCH_MAX_FILE_BYTES", 65536)
+        self.REPL_SESSIONS_MAX_LIVE = self._get_int_env_var("REPL_SESSIONS_MAX_LIVE", 8)
+        self.REPL_SESSIONS_MAX = self._get_int_env_var("REPL_SESSIONS_MAX", 500)
+        self.REPL_SESSION_IDLE_TIMEOUT = self._get_int_env_var("REPL_SESSION_IDLE_TIMEOUT", 600)
+        self.REPL_SESSION_MAX_REPLAY_BYTES = self._get_int_env_var("REPL_SESSION_MAX_REPLAY_BYTES", 65536)
         
     def _get_env_var(self, var_name: str, default: Optional[str] = None) -> str:
         """Récupère une variable d'environnement avec gestion d'erreur."""
@@ -22,5 +87,59 @@ class Config:
             logger.error(f"Variable d'environnement {var_name} manquante")
             raise ValueError(f"Variable d'environnement {var_name} requise")
         return value
+    
+    def _get_int_env_var(self, var_name: str, default: int) -> int:
+        """Récupère une variable d'environnement entière avec gestion d'erreur."""
+        value = self._get_env_var(var_name, str(default))
+        try:
+            return int(value)
+        except ValueError:
+            logger.error(f"Variable d'environnement {var_name} invalide: {value}")
+            raise ValueError(f"Variable d'environnement {var_name} doit être un entier")
+    
+    def _get_float_env_var(self, var_name: str, default: float) -> float:
+        """Récupère une variable d'environnement décimale avec gestion d'erreur."""
+        value = self._get_env_var(var_name, str(default))
+        try:
+            return float(value)
+        except ValueError:
+            logger.error(f"Variable d'environnement {var_name} invalide: {value}")
+            raise ValueError(f"Variable d'environnement {var_name} doit être un nombre")
+    
+    def _get_bool_env_var(self, var_name: str, default: bool) -> bool:
+        """Récupère une variable d'environnement booléenne (true/false, 1/0, yes/no)."""
+        value = self._get_env_var(var_name, "true" if default else "false").strip().lower()
+        if value in ("1", "true", "yes", "on"):
+            return True
+        if value in ("0", "false", "no", "off", ""):
+            return False
+        logger.error(f"Variable d'environnement {var_name} invalide: {value}")
+        raise ValueError(f"Variable d'environnement {var_name} doit être un booléen")
+    
+    def _get_weights_env_var(self, var_name: str) -> Dict[int, float]:
+        """Récupère une liste de poids de la forme "id:poids,id:poids"."""
+        value = self._get_env_var(var_name, "")
+        weights = {}
+        try:
+            for item in filter(None, (part.strip() for part in value.split(","))):
+                key, weight = item.split(":")
+                weights[int(key)] = float(weight)
+        except ValueError:
+            logger.error(f"Variable d'environnement {var_name} invalide: {value}")
+            raise ValueError(f"Variable d'environnement {var_name} doit être de la forme id:poids,id:poids")
+        return weights
+    
+    def _get_durations_env_var(self, var_name: str) -> Dict[str, float]:
+        """Récupère une liste de durées de la forme "nom:secondes,nom:secondes"."""
+        value = self._get_env_var(var_name, "")
+        durations = {}
+        try:
+            for item in filter(None, (part.strip() for part in value.split(","))):
+                key, duration = item.split(":")
+                durations[key.strip()] = float(duration)
+        except ValueError:
+            logger.error(f"Variable d'environnement {var_name} invalide: {value}")
+            raise ValueError(f"Variable d'environnement {var_name} doit être de la forme nom:secondes,nom:secondes")
+        return durations
 
-config = Config()
\ No newline at end of file
+config = Config()
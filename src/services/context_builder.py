@@ -0,0 +1,112 @@
+import asyncio
+import logging
+from typing import List, Optional
+from src.services.conversation_store import ConversationMessage, ThreadConversation
+from src.services.mistral_service import MistralService
+from src.utils.prompt_compactor import PromptCompactor
+from src.utils.tokens import estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+class ContextBuilder:
+    """Construit le contexte des réponses dans les threads en respectant un budget de tokens."""
+
+    def __init__(
+        self,
+        mistral_service: MistralService,
+        token_budget: int = 3000,
+        summary_tokens: int = 400,
+        recent_messages: int = 20,
+        compactor: Optional[PromptCompactor] = None
+    ):
+        """
+        Initialise le constructeur de contexte.
+
+        Args:
+            mistral_service: Service utilisé pour résumer les anciens messages
+            token_budget: Taille maximale du contexte en tokens
+            summary_tokens: Taille maximale du résumé des anciens messages en tokens
+            recent_messages: Nombre maximal de messages récents repris tels quels
+            compactor: Compaction du code et de la sortie d'origine (None : simple troncature)
+        """
+        self.mistral_service = mistral_service
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.recent_messages = recent_messages
+        self.origin_tokens = token_budget // 3
+        self.compactor = compactor
+
+    def build(self, conversation: ThreadConversation) -> str:
+        """
+        Construit le contexte d'une conversation : code et sortie d'origine, résumé, puis messages récents.
+
+        Les messages qui ne tiennent plus dans la fenêtre récente sont intégrés au résumé en arrière-plan.
+
+        Args:
+            conversation: Conversation du thread
+
+        Returns:
+            Contexte à envoyer au modèle
+        """
+        sections = []
+        if conversation.origin is not None:
+            code, output = conversation.origin
+            half = self.origin_tokens // 2
+            if code:
+                sections.append(f"Code évalué:\n{self._fit_origin('code', code, half)}")
+            if output:
+                sections.append(f"Sortie de l'évaluation:\n{self._fit_origin('output', output, half)}")
+        if conversation.summary:
+            sections.append(f"Résumé des échanges précédents:\n{conversation.summary}")
+
+        remaining = self.token_budget - sum(estimate_tokens(section) + 1 for section in sections)
+        unsummarized = [message for message in conversation.messages if message[0] > conversation.summarized_until]
+        recent = self._fit_recent(unsummarized, remaining)
+
+        older = unsummarized[:len(unsummarized) - len(recent)]
+        if older:
+            self._schedule_summary(conversation, older)
+
+        if recent:
+            sections.append("\n".join(f"{author}: {content}" for _, author, content in recent))
+        return "\n\n".join(sections)
+
+    def _fit_origin(self, section: str, text: str, budget: int) -> str:
+        """Réduit le code ou la sortie d'origine au budget, par compaction si possible."""
+        if self.compactor is None:
+            return truncate_to_tokens(text, budget)
+        return self.compactor.compact(section, text, budget=budget).text
+
+    def _fit_recent(self, messages: List[ConversationMessage], budget: int) -> List[ConversationMessage]:
+        """Sélectionne les messages les plus récents tenant dans le budget, du plus ancien au plus récent."""
+        recent: List[ConversationMessage] = []
+        for message_id, author, content in reversed(messages[-self.recent_messages:]):
+            line_budget = budget - estimate_tokens(f"{author}: ") - 1
+            if line_budget <= 0:
+                break
+            if estimate_tokens(content) > line_budget:
+                if recent:
+                    break
+                content = truncate_to_tokens(content, line_budget)
+            recent.append((message_id, author, content))
+            budget -= estimate_tokens(f"{author}: {content}") + 1
+        recent.reverse()
+        return recent
+
+    def _schedule_summary(self, conversation: ThreadConversation, older: List[ConversationMessage]) -> None:
+        """Lance la mise à jour du résumé si aucune n'est déjà en cours pour ce thread."""
+        if conversation.summary_task is not None and not conversation.summary_task.done():
+            return
+        conversation.summary_task = asyncio.ensure_future(self._summarize(conversation, older))
+
+    async def _summarize(self, conversation: ThreadConversation, older: List[ConversationMessage]) -> None:
+        """Intègre des messages au résumé de la conversation."""
+        lines = [f"{author}: {truncate_to_tokens(content, self.summary_tokens)}" for _, author, content in older]
+        summary = await self.mistral_service.summarize_conversation(
+            conversation.summary, lines, max_tokens=self.summary_tokens
+        )
+        if not summary:
+            return
+        conversation.summary = truncate_to_tokens(summary.strip(), self.summary_tokens)
+        conversation.summarized_until = older[-1][0]
+        logger.info("Résumé de discussion mis à jour (%s messages intégrés)", len(older))
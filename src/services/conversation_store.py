@@ -0,0 +1,256 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from src.utils.cache import SingleFlight, SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+ConversationMessage = Tuple[int, str, str]
+ConversationOrigin = Tuple[Optional[str], Optional[str]]
+
+class ThreadConversation:
+    """Historique récent d'un thread de discussion OCaml."""
+
+    def __init__(self, max_messages: int, origin: Optional[ConversationOrigin] = None):
+        self.messages: Deque[ConversationMessage] = deque(maxlen=max_messages)
+        self.origin = origin
+        self.summary = ""
+        self.summarized_until = 0
+        self.summary_task: Optional[asyncio.Task] = None
+        self.repl_session: Optional[bool] = None
+
+class ConversationStore:
+    """Mémoire des conversations des threads, mise à jour message par message."""
+
+    BOT_AUTHOR = "OCaBot"
+    ORIGIN_MAX_CHARS = 16384
+    ORIGINS_MAX_ENTRIES = 100000
+
+    def __init__(self, max_threads: int = 500, max_messages: int = 50, origins_path: Optional[str] = None):
+        """
+        Initialise le stockage.
+
+        Args:
+            max_threads: Nombre maximal de threads gardés en mémoire (les moins actifs sont évincés)
+            max_messages: Nombre maximal de messages conservés par thread
+            origins_path: Fichier SQLite conservant le code et la sortie à l'origine des threads,
+                ainsi que l'activation de leur session REPL, après un redémarrage (None le désactive)
+        """
+        self.max_threads = max_threads
+        self.max_messages = max_messages
+        self._threads: "OrderedDict[int, ThreadConversation]" = OrderedDict()
+        self._pending: Dict[int, List[ConversationMessage]] = {}
+        self._backfills = SingleFlight()
+        self.backfill_count = 0
+        self._origins = None
+        if origins_path:
+            directory = os.path.dirname(origins_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._origins = SQLiteCache(origins_path, max_entries=self.ORIGINS_MAX_ENTRIES)
+
+    def __contains__(self, thread_id: int) -> bool:
+        return thread_id in self._threads
+
+    def create(self, thread_id: int, origin: Optional[ConversationOrigin] = None) -> ThreadConversation:
+        """
+        Commence le suivi d'un nouveau thread, sans historique à récupérer.
+
+        Args:
+            thread_id: Identifiant du thread
+            origin: Couple (code, sortie) de l'évaluation à l'origine du thread
+
+        Returns:
+            Conversation vide du thread
+        """
+        conversation = ThreadConversation(self.max_messages, origin)
+        self._store(thread_id, conversation)
+        return conversation
+
+    async def save_origin(self, thread_id: int, origin: ConversationOrigin) -> None:
+        """
+        Enregistre sur disque le code et la sortie à l'origine d'un thread.
+
+        Le message d'origine du thread ne contient que la sortie : sans cet enregistrement,
+        le code évalué serait perdu au redémarrage.
+
+        Args:
+            thread_id: Identifiant du thread
+            origin: Couple (code, sortie)
+        """
+        if self._origins is None:
+            return
+        code, output = origin
+        try:
+            await self._origins.set(str(thread_id), [
+                code[:self.ORIGIN_MAX_CHARS] if code else code,
+                output[:self.ORIGIN_MAX_CHARS] if output else output,
+            ])
+        except Exception as e:
+            logger.error("Erreur lors de l'enregistrement de l'origine du thread %s: %s", thread_id, e)
+
+    async def load_origin(self, thread_id: int) -> Optional[ConversationOrigin]:
+        """
+        Relit le code et la sortie à l'origine d'un thread.
+
+        Args:
+            thread_id: Identifiant du thread
+
+        Returns:
+            Couple (code, sortie), ou None s'il n'a pas été enregistré
+        """
+        if self._origins is None:
+            return None
+        try:
+            value = await self._origins.get(str(thread_id))
+        except Exception as e:
+            logger.error("Erreur lors de la lecture de l'origine du thread %s: %s", thread_id, e)
+            return None
+        return (value[0], value[1]) if value else None
+
+    async def set_repl_session(self, thread_id: int, enabled: bool) -> None:
+        """
+        Active ou désactive l'évaluation des blocs ```ocaml d'un thread dans sa session REPL.
+
+        Args:
+            thread_id: Identifiant du thread
+            enabled: Nouvel état de la session
+        """
+        conversation = self._threads.get(thread_id)
+        if conversation is not None:
+            conversation.repl_session = enabled
+        if self._origins is None:
+            return
+        try:
+            await self._origins.set(f"repl:{thread_id}", enabled)
+        except Exception as e:
+            logger.error("Erreur lors de l'enregistrement de la session du thread %s: %s", thread_id, e)
+
+    async def repl_session_enabled(self, thread_id: int) -> bool:
+        """
+        Indique si les blocs ```ocaml d'un thread sont évalués dans sa session REPL.
+
+        Args:
+            thread_id: Identifiant du thread
+
+        Returns:
+            True si la session a été activée dans ce thread
+        """
+        conversation = self._threads.get(thread_id)
+        if conversation is not None and conversation.repl_session is not None:
+            return conversation.repl_session
+        if self._origins is None:
+            return False
+        try:
+            enabled = bool(await self._origins.get(f"repl:{thread_id}"))
+        except Exception as e:
+            logger.error("Erreur lors de la lecture de la session du thread %s: %s", thread_id, e)
+            return False
+        if conversation is not None:
+            conversation.repl_session = enabled
+        return enabled
+
+    def close(self) -> None:
+        """Ferme le fichier des origines de threads."""
+        if self._origins is not None:
+            self._origins.close()
+
+    def append(self, thread_id: int, message_id: int, author: str, content: str) -> None:
+        """
+        Ajoute un message à la conversation d'un thread suivi.
+
+        Les messages des threads inconnus sont ignorés : ils seront récupérés par le rattrapage.
+
+        Args:
+            thread_id: Identifiant du thread
+            message_id: Identifiant du message
+            author: Nom affiché de l'auteur
+            content: Contenu du message
+        """
+        if thread_id in self._pending:
+            self._pending[thread_id].append((message_id, author, content))
+            return
+
+        conversation = self._threads.get(thread_id)
+        if conversation is None:
+            return
+        conversation.messages.append((message_id, author, content))
+        self._threads.move_to_end(thread_id)
+
+    def append_reply(self, thread_id: int, message_id: int, content: str) -> None:
+        """
+        Ajoute une réponse du bot avec son texte final.
+
+        Les réponses du bot ne sont pas enregistrées à leur création : publiées en streaming, elles ne
+        contiennent alors que leur premier fragment, et livrées en embed ou en pièce jointe, leur contenu est vide.
+
+        Args:
+            thread_id: Identifiant du thread
+            message_id: Identifiant du (premier) message de la réponse
+            content: Texte complet de la réponse
+        """
+        if content.strip():
+            self.append(thread_id, message_id, self.BOT_AUTHOR, content)
+
+    async def get(
+        self,
+        thread_id: int,
+        backfill: Callable[[], Awaitable[Tuple[List[ConversationMessage], Optional[ConversationOrigin]]]]
+    ) -> ThreadConversation:
+        """
+        Retourne la conversation d'un thread, en la reconstruisant depuis l'historique si elle est inconnue.
+
+        Args:
+            thread_id: Identifiant du thread
+            backfill: Fonction récupérant l'historique (du plus ancien au plus récent) et l'origine du thread
+
+        Returns:
+            Conversation du thread
+        """
+        conversation = self._threads.get(thread_id)
+        if conversation is not None:
+            self._threads.move_to_end(thread_id)
+            return conversation
+
+        conversation, _ = await self._backfills.do(thread_id, lambda: self._backfill(thread_id, backfill))
+        return conversation
+
+    async def _backfill(
+        self,
+        thread_id: int,
+        backfill: Callable[[], Awaitable[Tuple[List[ConversationMessage], Optional[ConversationOrigin]]]]
+    ) -> ThreadConversation:
+        """Reconstruit la conversation depuis l'historique en conservant les messages reçus pendant la récupération."""
+        self._pending[thread_id] = []
+        try:
+            history, origin = await backfill()
+        finally:
+            pending = self._pending.pop(thread_id)
+
+        self.backfill_count += 1
+        logger.info("Conversation du thread %s reconstruite depuis l'historique (%s messages)", thread_id, len(history))
+
+        conversation = ThreadConversation(self.max_messages, origin)
+        received = {message[0]: message for message in pending}
+        known = {message_id for message_id, _, _ in history}
+        conversation.messages.extend(received.get(message[0], message) for message in history)
+        conversation.messages.extend(message for message in pending if message[0] not in known)
+        self._store(thread_id, conversation)
+        return conversation
+
+    def _store(self, thread_id: int, conversation: ThreadConversation) -> None:
+        self._threads[thread_id] = conversation
+        self._threads.move_to_end(thread_id)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne l'état du stockage.
+
+        Returns:
+            Dictionnaire du nombre de threads suivis et de rattrapages effectués
+        """
+        return {"threads": len(self._threads), "backfills": self.backfill_count}
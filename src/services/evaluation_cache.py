@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from src.utils.cache import LRUCache, SQLiteCache, SingleFlight
+
+logger = logging.getLogger(__name__)
+
+class EvaluationCache:
+    """Cache des résultats d'évaluation adressé par le contenu, avec déduplication des évaluations concurrentes."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: Optional[float] = 3600,
+        disk_path: Optional[str] = None,
+        disk_max_entries: int = 100000
+    ):
+        """
+        Initialise le cache.
+
+        Args:
+            max_size: Nombre maximal de résultats gardés en mémoire
+            ttl: Durée de vie d'un résultat en secondes
+            disk_path: Chemin du cache SQLite persistant (None le désactive)
+            disk_max_entries: Nombre maximal de résultats gardés sur disque
+        """
+        self._memory = LRUCache(max_size=max_size, ttl=ttl)
+        self._disk = SQLiteCache(disk_path, max_entries=disk_max_entries, ttl=ttl) if disk_path else None
+        self._single_flight = SingleFlight()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def normalize_code(code: str) -> str:
+        """
+        Normalise le code pour que des soumissions équivalentes partagent la même clé.
+
+        Seuls les fins de ligne et les espaces en fin de ligne ou de fichier sont normalisés,
+        afin de ne pas modifier le contenu des chaînes de caractères.
+
+        Args:
+            code: Code OCaml soumis
+
+        Returns:
+            Code normalisé
+        """
+        lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+    @classmethod
+    def make_key(cls, code: str, ocaml_version: str, limits: Any) -> str:
+        """
+        Calcule la clé de cache d'une évaluation.
+
+        Args:
+            code: Code OCaml soumis
+            ocaml_version: Version du toplevel OCaml
+            limits: Limites de la sandbox (sérialisables en JSON)
+
+        Returns:
+            Empreinte SHA-256 hexadécimale
+        """
+        payload = json.dumps([cls.normalize_code(code), ocaml_version, limits], sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            Dictionnaire des succès, échecs, déduplications et de la taille mémoire
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "size": len(self._memory),
+        }
+
+    async def get_or_evaluate(
+        self,
+        key: str,
+        evaluate: Callable[[], Awaitable[Dict[str, Any]]],
+        is_cacheable: Callable[[Dict[str, Any]], bool]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Retourne le résultat en cache, ou évalue une seule fois pour tous les appelants concurrents.
+
+        Args:
+            key: Clé de cache calculée par make_key()
+            evaluate: Fonction lançant l'évaluation et retournant un résultat sérialisable
+            is_cacheable: Prédicat indiquant si un résultat est déterministe et peut être gardé
+
+        Returns:
+            Tuple (résultat, depuis_cache)
+        """
+        value = self._memory.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, True
+
+        if self._disk is not None:
+            try:
+                value = await self._disk.get(key)
+            except Exception as e:
+                logger.error("Erreur de lecture du cache d'évaluation: %s", e)
+                value = None
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._memory.set(key, value)
+                return value, True
+
+        async def evaluate_and_store() -> Dict[str, Any]:
+            result = await evaluate()
+            if is_cacheable(result):
+                self._memory.set(key, result)
+                if self._disk is not None:
+                    try:
+                        await self._disk.set(key, result)
+                    except Exception as e:
+                        logger.error("Erreur d'écriture du cache d'évaluation: %s", e)
+            return result
+
+        value, shared = await self._single_flight.do(key, evaluate_and_store)
+        if shared:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+        return value, shared
+
+    def close(self) -> None:
+        """Ferme le cache persistant."""
+        if self._disk is not None:
+            self._disk.close()
@@ -0,0 +1,350 @@
+import asyncio
+import heapq
+import itertools
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from src.config.messages import Messages
+from src.utils.metrics import STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
+class AdmissionError(Exception):
+    """Évaluation refusée par le contrôle d'admission (limite de débit ou file pleine)."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Seau à jetons limitant le débit d'un utilisateur ou d'un serveur."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialise un seau plein.
+
+        Args:
+            rate: Jetons ajoutés par seconde
+            capacity: Nombre maximal de jetons (taille des rafales)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        """Ajoute les jetons accumulés depuis la dernière mise à jour."""
+        self.tokens = min(self.capacity, self.tokens + max(now - self.updated_at, 0.0) * self.rate)
+        self.updated_at = max(now, self.updated_at)
+
+    def retry_after(self, now: float, cost: float = 1) -> float:
+        """
+        Délai avant que le seau permette une demande de cost jetons.
+
+        Une demande plus grosse que le seau n'exige qu'un seau plein ; le solde devient alors négatif
+        et les demandes suivantes attendent qu'il soit remboursé.
+        """
+        self.refill(now)
+        needed = min(cost, self.capacity)
+        return 0.0 if self.tokens >= needed else (needed - self.tokens) / self.rate
+
+    @property
+    def full(self) -> bool:
+        """Indique si le seau est plein."""
+        return self.tokens >= self.capacity
+
+class _QueueEntry:
+    """Évaluation en attente dans la file équitable."""
+
+    __slots__ = ("flow", "start", "finish", "seq", "slots", "future", "on_position", "position", "notified_at", "cancelled", "trailing_update")
+
+    def __init__(
+        self,
+        flow: Hashable,
+        start: float,
+        finish: float,
+        seq: int,
+        slots: int,
+        on_position: Optional[Callable[[int], Awaitable[Any]]]
+    ):
+        self.flow = flow
+        self.start = start
+        self.finish = finish
+        self.seq = seq
+        self.slots = slots
+        self.future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self.on_position = on_position
+        self.position = 0
+        self.notified_at = 0.0
+        self.cancelled = False
+        self.trailing_update: Optional[asyncio.TimerHandle] = None
+
+    def __lt__(self, other: "_QueueEntry") -> bool:
+        return (self.finish, self.seq) < (other.finish, other.seq)
+
+class EvaluationScheduler:
+    """Contrôle d'admission et file d'attente équitable pondérée devant le service OCaml."""
+
+    POSITION_UPDATE_INTERVAL = 2.0
+    BUCKET_PRUNE_THRESHOLD = 10000
+
+    def __init__(
+        self,
+        slots: int = 4,
+        max_queue_depth: int = 50,
+        user_rate: float = 6 / 60,
+        user_burst: float = 3,
+        guild_rate: float = 60 / 60,
+        guild_burst: float = 20,
+        guild_weights: Optional[Dict[int, float]] = None
+    ):
+        """
+        Initialise le planificateur.
+
+        Args:
+            slots: Nombre d'évaluations exécutées simultanément
+            max_queue_depth: Nombre maximal d'évaluations en attente avant rejet
+            user_rate: Évaluations par seconde autorisées par utilisateur
+            user_burst: Rafale maximale par utilisateur
+            guild_rate: Évaluations par seconde autorisées par serveur
+            guild_burst: Rafale maximale par serveur
+            guild_weights: Poids des serveurs dans la file équitable (1 par défaut)
+        """
+        self.slots = slots
+        self.max_queue_depth = max_queue_depth
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.guild_rate = guild_rate
+        self.guild_burst = guild_burst
+        self.guild_weights = guild_weights or {}
+
+        self._user_buckets: Dict[int, TokenBucket] = {}
+        self._guild_buckets: Dict[int, TokenBucket] = {}
+        self._heap: List[_QueueEntry] = []
+        self._waiting = 0
+        self._running = 0
+        self._virtual_time = 0.0
+        self._last_finish: Dict[Hashable, float] = {}
+        self._seq = itertools.count()
+        self._tasks = set()
+        self.rejected = 0
+        self.rate_limited = 0
+
+    @property
+    def depth(self) -> int:
+        """Nombre d'évaluations en attente."""
+        return self._waiting
+
+    @property
+    def running(self) -> int:
+        """Nombre d'évaluations en cours."""
+        return self._running
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne l'état du planificateur.
+
+        Returns:
+            Dictionnaire des évaluations en attente, en cours et rejetées
+        """
+        return {
+            "waiting": self._waiting,
+            "running": self._running,
+            "rejected": self.rejected,
+            "rate_limited": self.rate_limited,
+        }
+
+    def close(self) -> None:
+        """Annule les mises à jour de position en cours ou programmées."""
+        for entry in self._heap:
+            self._cancel_trailing_update(entry)
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def submit(
+        self,
+        user_id: int,
+        guild_id: Optional[int],
+        func: Callable[[], Awaitable[Any]],
+        on_position: Optional[Callable[[int], Awaitable[Any]]] = None,
+        cost: int = 1
+    ) -> Tuple[Any, float]:
+        """
+        Admet une évaluation, attend son tour dans la file équitable puis l'exécute.
+
+        Une demande de coût n (lot de n extraits) consomme n jetons de l'utilisateur, compte pour
+        n évaluations dans la file équitable et occupe jusqu'à n emplacements d'exécution. Le seau du serveur
+        n'est débité que de min(n, guild_burst / 2) jetons : un gros lot ne doit pas endetter le serveur
+        au point de bloquer tous ses autres membres.
+
+        Args:
+            user_id: Identifiant de l'utilisateur
+            guild_id: Identifiant du serveur (None en message privé)
+            func: Fonction lançant l'évaluation
+            on_position: Rappel appelé avec la position dans la file tant que l'évaluation attend
+            cost: Nombre d'évaluations que représente la demande
+
+        Returns:
+            Tuple (résultat de func, temps d'attente dans la file en secondes)
+
+        Raises:
+            AdmissionError: Si la limite de débit est atteinte ou la file pleine
+        """
+        cost = max(cost, 1)
+        self._admit(user_id, guild_id, cost)
+
+        slots = min(cost, self.slots)
+        enqueued_at = time.monotonic()
+        if self._running + slots <= self.slots and self._waiting == 0:
+            self._running += slots
+        else:
+            await self._wait_turn(self._enqueue(user_id, guild_id, on_position, cost, slots))
+        wait_time = time.monotonic() - enqueued_at
+        STAGE_DURATION.observe(wait_time, stage="queue_wait")
+
+        try:
+            return await func(), wait_time
+        finally:
+            self._running -= slots
+            self._dispatch()
+
+    def _admit(self, user_id: int, guild_id: Optional[int], cost: int = 1) -> None:
+        """Vérifie la profondeur de la file et consomme les jetons utilisateur et serveur d'une demande de coût cost."""
+        if self._waiting >= self.max_queue_depth:
+            self.rejected += 1
+            logger.warning("File d'évaluation pleine (%s), requête de %s rejetée", self._waiting, user_id)
+            raise AdmissionError(Messages.EVALUATE_QUEUE_FULL)
+
+        now = time.monotonic()
+        charges = [(self._bucket(self._user_buckets, user_id, self.user_rate, self.user_burst), cost)]
+        if guild_id is not None:
+            charges.append((
+                self._bucket(self._guild_buckets, guild_id, self.guild_rate, self.guild_burst),
+                min(cost, max(self.guild_burst / 2, 1))
+            ))
+
+        retry_after = max(bucket.retry_after(now, charge) for bucket, charge in charges)
+        if retry_after > 0:
+            self.rate_limited += 1
+            logger.warning("Limite de débit atteinte pour %s (serveur %s)", user_id, guild_id)
+            raise AdmissionError(Messages.EVALUATE_RATE_LIMITED.format(retry_after=retry_after), retry_after)
+
+        for bucket, charge in charges:
+            bucket.tokens -= charge
+
+    def _bucket(self, buckets: Dict[int, TokenBucket], key: int, rate: float, capacity: float) -> TokenBucket:
+        bucket = buckets.get(key)
+        if bucket is None:
+            if len(buckets) >= self.BUCKET_PRUNE_THRESHOLD:
+                self._prune_buckets(buckets)
+            bucket = buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+
+    @staticmethod
+    def _prune_buckets(buckets: Dict[int, TokenBucket]) -> None:
+        """Oublie les seaux redevenus pleins, équivalents à des seaux neufs."""
+        now = time.monotonic()
+        for key in list(buckets):
+            buckets[key].refill(now)
+            if buckets[key].full:
+                del buckets[key]
+
+    def _enqueue(self, user_id: int, guild_id: Optional[int], on_position, cost: int = 1, slots: int = 1) -> _QueueEntry:
+        """Ajoute une évaluation à la file avec son temps de fin virtuel, proportionnel à son coût."""
+        flow = guild_id if guild_id is not None else ("user", user_id)
+        weight = self.guild_weights.get(guild_id, 1.0) if guild_id is not None else 1.0
+
+        start = max(self._virtual_time, self._last_finish.get(flow, 0.0))
+        entry = _QueueEntry(flow, start, start + cost / weight, next(self._seq), slots, on_position)
+        self._last_finish[flow] = entry.finish
+
+        heapq.heappush(self._heap, entry)
+        self._waiting += 1
+        self._notify_positions()
+        return entry
+
+    async def _wait_turn(self, entry: _QueueEntry) -> None:
+        """Attend que l'entrée soit choisie par _dispatch()."""
+        try:
+            await entry.future
+        except asyncio.CancelledError:
+            if entry.future.done() and not entry.future.cancelled():
+                self._running -= entry.slots
+                self._dispatch()
+            else:
+                entry.cancelled = True
+                self._cancel_trailing_update(entry)
+                self._waiting -= 1
+                self._notify_positions()
+            raise
+
+    def _dispatch(self) -> None:
+        """
+        Démarre les évaluations en attente ayant le plus petit temps de fin virtuel.
+
+        Une demande occupant plusieurs emplacements attend qu'ils soient tous libres, sans être doublée.
+        """
+        while self._heap:
+            entry = self._heap[0]
+            if entry.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self._running + entry.slots > self.slots:
+                break
+            heapq.heappop(self._heap)
+            self._waiting -= 1
+            self._running += entry.slots
+            self._virtual_time = max(self._virtual_time, entry.start)
+            self._cancel_trailing_update(entry)
+            entry.future.set_result(None)
+
+        if not self._heap:
+            self._last_finish.clear()
+        self._notify_positions()
+
+    def _notify_positions(self) -> None:
+        """
+        Informe les évaluations en attente de leur nouvelle position, sans dépasser une mise à jour par intervalle.
+
+        Un changement survenu pendant l'intervalle est publié à la fin de celui-ci.
+        """
+        now = time.monotonic()
+        waiting = sorted(entry for entry in self._heap if not entry.cancelled)
+        for position, entry in enumerate(waiting, start=1):
+            if entry.on_position is None or entry.position == position:
+                continue
+            elapsed = now - entry.notified_at
+            if entry.position and elapsed < self.POSITION_UPDATE_INTERVAL:
+                if entry.trailing_update is None:
+                    entry.trailing_update = asyncio.get_running_loop().call_later(
+                        self.POSITION_UPDATE_INTERVAL - elapsed, self._flush_position, entry
+                    )
+                continue
+            entry.position = position
+            entry.notified_at = now
+            self._spawn_background(self._safe_notify(entry.on_position, position))
+
+    def _flush_position(self, entry: _QueueEntry) -> None:
+        """Publie la position retenue pendant l'intervalle de mise à jour d'une évaluation toujours en attente."""
+        entry.trailing_update = None
+        if not entry.cancelled and not entry.future.done():
+            self._notify_positions()
+
+    def _spawn_background(self, coro) -> None:
+        """Lance une coroutine en tâche de fond en gardant une référence."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    @staticmethod
+    def _cancel_trailing_update(entry: _QueueEntry) -> None:
+        if entry.trailing_update is not None:
+            entry.trailing_update.cancel()
+            entry.trailing_update = None
+
+    @staticmethod
+    async def _safe_notify(callback: Callable[[int], Awaitable[Any]], position: int) -> None:
+        try:
+            await callback(position)
+        except Exception as e:
+            logger.warning("Impossible d'afficher la position dans la file: %s", e)
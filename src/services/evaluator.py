@@ -0,0 +1,352 @@
+import asyncio
+import itertools
+import json
+import os
+import logging
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from src.utils.logger import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# Une ligne du protocole peut contenir un lot de codes ou de sorties complètes
+MAX_LINE_BYTES = 64 * 1024 * 1024
+
+class EvaluatorError(Exception):
+    """Erreur renvoyée par le service d'évaluation pour une requête."""
+
+class EvaluatorServer:
+    """
+    Service d'évaluation autonome partagé par plusieurs processus du bot, sur une socket Unix.
+
+    Le protocole échange un objet JSON par ligne. Chaque requête porte un identifiant repris dans sa réponse ;
+    les requêtes d'une même connexion sont traitées en parallèle (pipelining) et leurs réponses
+    envoyées dans l'ordre où elles se terminent :
+        {"id": 1, "op": "evaluate", "code": "...", "backend": "toplevel"}
+        {"id": 2, "op": "batch", "items": [{"code": "...", "backend": "native"}, ...]}
+        {"id": 3, "op": "info"}
+        {"op": "cancel", "target": 1}
+    Un champ "request_id" facultatif est repris dans les logs du service.
+    Réponses : {"id": 1, "result": ...} ou {"id": 1, "error": "...", "kind": "value" | "internal"}.
+    """
+
+    def __init__(self, service: Any, path: str, max_pending: int = 64):
+        """
+        Initialise le serveur sans le démarrer.
+
+        Args:
+            service: OCamlService local (pool, limites de concurrence et cache partagés)
+            path: Chemin de la socket Unix
+            max_pending: Nombre maximal de requêtes en cours par connexion (au-delà, la lecture est suspendue)
+        """
+        self.service = service
+        self.path = path
+        self.max_pending = max_pending
+        self.connections = 0
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        """Ouvre la socket, en remplaçant une socket orpheline laissée par un service arrêté."""
+        if os.path.exists(self.path):
+            if await self._is_alive():
+                raise RuntimeError(f"Un service d'évaluation écoute déjà sur {self.path}")
+            os.unlink(self.path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._server = await asyncio.start_unix_server(self._handle_connection, self.path, limit=MAX_LINE_BYTES)
+        os.chmod(self.path, 0o660)
+        logger.info("Service d'évaluation à l'écoute sur %s", self.path)
+
+    async def serve_forever(self) -> None:
+        """Traite les connexions jusqu'à l'annulation."""
+        await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        """Ferme la socket et les connexions des clients (leurs requêtes en cours sont annulées)."""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def _is_alive(self) -> bool:
+        """Indique si un autre processus accepte les connexions sur la socket."""
+        try:
+            _, writer = await asyncio.open_unix_connection(self.path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            return False
+        writer.close()
+        return True
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Lit les requêtes d'un client et lance leur traitement au fil de l'eau."""
+        self.connections += 1
+        self._writers.add(writer)
+        tasks: Dict[Any, asyncio.Task] = {}
+        slots = asyncio.Semaphore(self.max_pending)
+        write_lock = asyncio.Lock()
+        logger.info("Client connecté au service d'évaluation (%s connexions)", self.connections)
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError) as e:
+                    logger.warning("Lecture d'une requête impossible: %s", e)
+                    break
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await self._send(writer, write_lock, {"id": None, "error": "Requête JSON invalide", "kind": "value"})
+                    continue
+
+                if request.get("op") == "cancel":
+                    task = tasks.get(request.get("target"))
+                    if task is not None:
+                        task.cancel()
+                    continue
+
+                await slots.acquire()
+                request_id = request.get("id")
+                task = asyncio.ensure_future(self._serve(request, writer, write_lock))
+                tasks[request_id] = task
+
+                def done(_task: asyncio.Task, request_id: Any = request_id) -> None:
+                    slots.release()
+                    if tasks.get(request_id) is _task:
+                        del tasks[request_id]
+
+                task.add_done_callback(done)
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+            self.connections -= 1
+            self._writers.discard(writer)
+            writer.close()
+            logger.info("Client déconnecté du service d'évaluation")
+
+    async def _serve(self, request: Dict[str, Any], writer: asyncio.StreamWriter, write_lock: asyncio.Lock) -> None:
+        """Traite une requête et envoie sa réponse."""
+        self.requests += 1
+        request_id_var.set(request.get("request_id"))
+        response: Dict[str, Any] = {"id": request.get("id")}
+        try:
+            response["result"] = await self._dispatch(request)
+        except (ValueError, KeyError, TypeError) as e:
+            response.update(error=str(e), kind="value")
+        except Exception as e:
+            logger.error("Erreur du service d'évaluation: %s", e)
+            response.update(error=str(e), kind="internal")
+        await self._send(writer, write_lock, response)
+
+    async def _dispatch(self, request: Dict[str, Any]) -> Any:
+        """Exécute l'opération demandée."""
+        op = request.get("op")
+        if op == "evaluate":
+            return asdict(await self.service.evaluate_code(request["code"], request.get("backend", "toplevel")))
+        if op == "batch":
+            items = [(item["code"], item.get("backend", "toplevel")) for item in request["items"]]
+            return [asdict(result) for result in await self.service.evaluate_batch(items)]
+        if op == "info":
+            return {
+                "backends": self.service.backends,
+                "max_output_bytes": self.service.max_output_bytes,
+                "stats": self.service.get_stats(),
+            }
+        raise ValueError(f"Opération inconnue: {op}")
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, write_lock: asyncio.Lock, message: Dict[str, Any]) -> None:
+        """Envoie une réponse, en ignorant une connexion déjà fermée."""
+        async with write_lock:
+            try:
+                writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+class EvaluatorClient:
+    """Client du service d'évaluation : une connexion persistante sur laquelle les requêtes sont multiplexées."""
+
+    def __init__(self, path: str, timeout: float = 120, connect_timeout: float = 5):
+        """
+        Initialise le client sans se connecter.
+
+        Args:
+            path: Chemin de la socket Unix du service
+            timeout: Durée maximale d'une requête, attente dans la file du service comprise
+            connect_timeout: Durée maximale de la connexion
+        """
+        self.path = path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.backends: List[str] = ["toplevel"]
+        self.requests = 0
+        self.reconnects = 0
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Nombre de requêtes en attente de réponse."""
+        return len(self._pending)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du client.
+
+        Returns:
+            Dictionnaire des requêtes envoyées, en attente et des reconnexions
+        """
+        return {"requests": self.requests, "pending": self.pending, "reconnects": self.reconnects}
+
+    async def refresh(self) -> Dict[str, Any]:
+        """
+        Récupère les backends disponibles et l'état du service (fait aussi à chaque reconnexion).
+
+        Returns:
+            Informations renvoyées par le service
+        """
+        info = await self._request({"op": "info"})
+        self.backends = info["backends"]
+        return info
+
+    async def evaluate(self, code: str, backend: str = "toplevel") -> Dict[str, Any]:
+        """
+        Évalue du code dans le service.
+
+        Args:
+            code: Code OCaml à évaluer
+            backend: Backend d'évaluation
+
+        Returns:
+            Champs d'un EvaluationResult
+
+        Raises:
+            ValueError: Si le service refuse la requête (backend inconnu...)
+            EvaluatorError: Si le service a rencontré une erreur interne
+            ConnectionError: Si le service est injoignable ou la connexion perdue
+            asyncio.TimeoutError: Si la réponse n'arrive pas à temps
+        """
+        return await self._request({"op": "evaluate", "code": code, "backend": backend})
+
+    async def evaluate_batch(self, items: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Évalue plusieurs codes en une requête ; le service les exécute en parallèle.
+
+        Args:
+            items: Couples (code, backend)
+
+        Returns:
+            Champs des EvaluationResult, dans l'ordre des codes
+        """
+        return await self._request({
+            "op": "batch",
+            "items": [{"code": code, "backend": backend} for code, backend in items],
+        })
+
+    async def close(self) -> None:
+        """Ferme la connexion."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    async def _request(self, message: Dict[str, Any]) -> Any:
+        """Envoie une requête et attend la réponse portant son identifiant."""
+        await self._connect(refresh=message["op"] != "info")
+        message_id = next(self._ids)
+        message["id"] = message_id
+        message["request_id"] = request_id_var.get()
+        future = asyncio.get_running_loop().create_future()
+        self._pending[message_id] = future
+        self.requests += 1
+
+        try:
+            await self._write(message)
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if self._writer is not None and (future.cancelled() or not future.done()):
+                self._spawn(self._write({"op": "cancel", "target": message_id}))
+            raise
+        finally:
+            self._pending.pop(message_id, None)
+
+    async def _connect(self, refresh: bool = True) -> None:
+        """Ouvre la connexion si elle n'est pas déjà établie, puis met à jour les backends disponibles."""
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(self.path, limit=MAX_LINE_BYTES),
+                    timeout=self.connect_timeout
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                raise ConnectionError(f"Service d'évaluation injoignable sur {self.path}: {e}") from e
+            if self._reader_task is not None:
+                self.reconnects += 1
+            if refresh:
+                self._spawn(self.refresh())
+            self._reader_task = asyncio.ensure_future(self._read_responses(self._reader, self._writer))
+            logger.info("Connecté au service d'évaluation sur %s", self.path)
+
+    async def _write(self, message: Dict[str, Any]) -> None:
+        async with self._write_lock:
+            if self._writer is None:
+                raise ConnectionError("Connexion au service d'évaluation fermée")
+            self._writer.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+            await self._writer.drain()
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Associe chaque réponse reçue à la requête en attente de même identifiant."""
+        error: Exception = ConnectionError("Connexion au service d'évaluation perdue")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self._pending.get(response.get("id"))
+                if future is None or future.done():
+                    continue
+                if "error" in response:
+                    exception_type = ValueError if response.get("kind") == "value" else EvaluatorError
+                    future.set_exception(exception_type(response["error"]))
+                else:
+                    future.set_result(response.get("result"))
+        except asyncio.CancelledError:
+            error = ConnectionError("Connexion au service d'évaluation fermée")
+            raise
+        except Exception as e:
+            logger.error("Réponse illisible du service d'évaluation: %s", e)
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+
+    def _spawn(self, coro) -> None:
+        """Lance une coroutine en tâche de fond en gardant une référence, sans propager ses erreurs."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: (self._tasks.discard(task), task.cancelled() or task.exception()))
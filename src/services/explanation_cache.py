@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+from src.utils.cache import LRUCache, SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+class ExplanationCache:
+    """Cache persistant des explications et noms de thread, indexé par la forme canonique du couple (code, sortie)."""
+
+    KEY_VERSION = "v1"
+    KEYWORDS = {
+        "and", "as", "assert", "begin", "class", "constraint", "do", "done", "downto", "else",
+        "end", "exception", "external", "false", "for", "fun", "function", "functor", "if", "in",
+        "include", "inherit", "initializer", "lazy", "let", "match", "method", "module", "mutable",
+        "new", "nonrec", "object", "of", "open", "or", "private", "rec", "sig", "struct", "then",
+        "to", "true", "try", "type", "val", "virtual", "when", "while", "with",
+        "land", "lor", "lxor", "lsl", "lsr", "asr", "mod",
+    }
+    _TOKEN_RE = re.compile(
+        r"\s+"
+        r"|(?P<comment>\(\*)"
+        r'|(?P<string>"(?:\\.|[^"\\])*")'
+        r"|(?P<quoted>\{(?P<tag>[a-z_]*)\|.*?\|(?P=tag)\})"
+        r"|(?P<char>'(?:\\(?:[\\'\"ntbr ]|\d{3}|x[0-9a-fA-F]{2}|o[0-7]{3})|[^\\'])')"
+        r"|(?P<ident>[a-z_][A-Za-z0-9_']*)"
+        r"|(?P<other>[A-Z][A-Za-z0-9_']*|'[a-z_][A-Za-z0-9_']*|\d[\w.]*|->|;;|[^\sA-Za-z0-9_])",
+        re.DOTALL
+    )
+    _CODE_SPAN_RE = re.compile(r"```.*?```|`[^`\n]+`", re.DOTALL)
+
+    def __init__(self, max_size: int = 1000, disk_path: Optional[str] = None, rename_identifiers: bool = False):
+        """
+        Initialise le cache.
+
+        Args:
+            max_size: Nombre maximal d'explications conservées (en mémoire et sur disque)
+            disk_path: Chemin du fichier SQLite persistant (None le désactive)
+            rename_identifiers: Renomme les identifiants liés pour faire correspondre les quasi-doublons
+        """
+        self.rename_identifiers = rename_identifiers
+        self._memory = LRUCache(max_size=max_size)
+        self._disk = None
+        if disk_path:
+            directory = os.path.dirname(disk_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._disk = SQLiteCache(disk_path, max_entries=max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du cache.
+
+        Returns:
+            Dictionnaire des succès, échecs et de la taille mémoire
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._memory)}
+
+    async def load(self) -> None:
+        """Précharge en mémoire les entrées les plus récemment utilisées du cache persistant."""
+        if self._disk is None:
+            return
+        try:
+            items = await self._disk.items()
+        except Exception as e:
+            logger.error("Erreur lors du chargement du cache d'explications: %s", e)
+            return
+
+        for key, value in reversed(items[:self._memory.max_size]):
+            self._memory.set(key, value)
+        logger.info("Cache d'explications préchargé (%s entrées)", len(self._memory))
+
+    async def get(self, code: str, output: str) -> Optional[Dict[str, Optional[str]]]:
+        """
+        Recherche une explication pour le couple (code, sortie).
+
+        Args:
+            code: Code OCaml source
+            output: Sortie de l'évaluation
+
+        Returns:
+            Dictionnaire {"title", "explanation"} ou None si absent
+        """
+        key, mapping = self._key(code, output)
+        value = self._memory.get(key)
+        if value is None and self._disk is not None:
+            try:
+                value = await self._disk.get(key)
+            except Exception as e:
+                logger.error("Erreur de lecture du cache d'explications: %s", e)
+            if value is not None:
+                self._memory.set(key, value)
+
+        if value is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        restore = {placeholder: name for name, placeholder in mapping.items()}
+        return {
+            "title": value.get("title"),
+            "explanation": self._rename_in_code_spans(value["explanation"], restore),
+        }
+
+    async def set(self, code: str, output: str, explanation: str, title: Optional[str] = None) -> None:
+        """
+        Enregistre l'explication et le nom de thread générés pour le couple (code, sortie).
+
+        Args:
+            code: Code OCaml source
+            output: Sortie de l'évaluation
+            explanation: Explication générée
+            title: Nom de thread généré (optionnel)
+        """
+        key, mapping = self._key(code, output)
+        value = {"title": title, "explanation": self._rename_in_code_spans(explanation, mapping)}
+        self._memory.set(key, value)
+        if self._disk is not None:
+            try:
+                await self._disk.set(key, value)
+            except Exception as e:
+                logger.error("Erreur d'écriture du cache d'explications: %s", e)
+
+    def close(self) -> None:
+        """Ferme le cache persistant."""
+        if self._disk is not None:
+            self._disk.close()
+
+    def _key(self, code: str, output: str) -> Tuple[str, Dict[str, str]]:
+        """Calcule la clé du couple (code, sortie) et le renommage appliqué aux identifiants."""
+        tokens = self.tokenize(code)
+        mapping = self._bound_identifiers(tokens) if self.rename_identifiers else {}
+        canonical_code = " ".join(mapping.get(token, token) for token in tokens)
+
+        canonical_output = " ".join(output.split())
+        if mapping:
+            canonical_output = self._rename_words(canonical_output, mapping)
+
+        payload = "\0".join([self.KEY_VERSION, canonical_code, canonical_output])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest(), mapping
+
+    @classmethod
+    def tokenize(cls, code: str) -> List[str]:
+        """
+        Découpe du code OCaml en lexèmes, en ignorant les espaces et les commentaires.
+
+        Args:
+            code: Code OCaml source
+
+        Returns:
+            Liste des lexèmes
+        """
+        tokens: List[str] = []
+        pos = 0
+        while pos < len(code):
+            match = cls._TOKEN_RE.match(code, pos)
+            if match is None:
+                tokens.append(code[pos])
+                pos += 1
+                continue
+            if match.group("comment"):
+                pos = cls._skip_comment(code, match.end())
+                continue
+            if not match.group(0).isspace():
+                tokens.append(match.group(0))
+            pos = match.end()
+        return tokens
+
+    @staticmethod
+    def _skip_comment(code: str, pos: int) -> int:
+        """Retourne la position suivant un commentaire (éventuellement imbriqué) commençant avant pos."""
+        depth = 1
+        while pos < len(code) and depth:
+            if code.startswith("(*", pos):
+                depth += 1
+                pos += 2
+            elif code.startswith("*)", pos):
+                depth -= 1
+                pos += 2
+            elif code[pos] == '"':
+                end = pos + 1
+                while end < len(code) and code[end] != '"':
+                    end += 2 if code[end] == "\\" else 1
+                pos = end + 1
+            else:
+                pos += 1
+        return pos
+
+    @classmethod
+    def _bound_identifiers(cls, tokens: List[str]) -> Dict[str, str]:
+        """
+        Associe un nom canonique à chaque identifiant lié par let/and/fun dans le code.
+
+        Les identifiants non liés localement (fonctions de la bibliothèque standard...) sont conservés.
+        """
+        mapping: Dict[str, str] = {}
+        binding_end = None
+        for index, token in enumerate(tokens):
+            if token in ("let", "and"):
+                binding_end = "="
+            elif token == "fun":
+                binding_end = "->"
+            elif token == binding_end:
+                binding_end = None
+            elif binding_end and token not in cls.KEYWORDS and cls._is_identifier(token):
+                if (index == 0 or tokens[index - 1] not in (".", "~", "?")) and token not in mapping:
+                    mapping[token] = f"__id{len(mapping)}__"
+        return mapping
+
+    @staticmethod
+    def _is_identifier(token: str) -> bool:
+        return bool(re.fullmatch(r"[a-z][A-Za-z0-9_']*|_[A-Za-z0-9_']+", token))
+
+    @staticmethod
+    def _rename_words(text: str, mapping: Dict[str, str]) -> str:
+        """Remplace les identifiants (mots entiers) selon le renommage."""
+        if not mapping:
+            return text
+        pattern = re.compile(r"(?<![\w.'])(" + "|".join(re.escape(name) for name in mapping) + r")(?![\w'])")
+        return pattern.sub(lambda match: mapping[match.group(1)], text)
+
+    @classmethod
+    def _rename_in_code_spans(cls, text: str, mapping: Dict[str, str]) -> str:
+        """Applique le renommage uniquement dans les blocs et extraits de code Markdown d'un texte."""
+        if not mapping:
+            return text
+        return cls._CODE_SPAN_RE.sub(lambda match: cls._rename_words(match.group(0), mapping), text)
@@ -1,22 +1,342 @@
-from mistralai import Mistral
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Tuple
+import asyncio
+import importlib
+import json
+import random
+import time
+import httpx
 import logging
+from src.utils.delivery import split_markdown
+from src.utils.json_stream import JsonStringFieldsParser
+from src.utils.prompt_compactor import PromptCompactor
+from src.services.model_router import ModelRouter
+from src.utils.metrics import LLM_DURATION, LLM_HEDGES, LLM_MODEL_DURATION, MISTRAL_RATE_LIMITED, TIMEOUTS
 
 logger = logging.getLogger(__name__)
 
 class MistralService:
     """Service pour l'interaction avec l'API Mistral."""
     
-    def __init__(self, api_key: str):
+    DEFAULT_MODEL = "mistral-large-latest"
+    SYSTEM_PROMPT = "Tu es OCaBot, un bot Discord qui évalue du code OCaml en mode REPL, expression par expression, dans un sandbox sécurisé (firejail, pas de réseau, pas de root, limites CPU/mémoire, isolement), et qui répond en français de façon claire et concise sur les résultats d’exécution, les erreurs et la compréhension du code, sans s’attarder sur les problèmes d’indentation."
+    THREAD_DETAILS_INSTRUCTIONS = "Réponds uniquement avec un objet JSON de la forme {\"title\": \"...\", \"explanation\": \"...\"}. title est un nom de thread concis (50 caractères maximum, en français, sans guillemets) décrivant ce que fait le code. explanation explique la sortie de manière simple et concise."
+    THREAD_NAME_MAX_LENGTH = 50
+    THREAD_NAME_CODE_TOKENS = 400
+    RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+    
+    def __init__(
+        self,
+        api_key: str,
+        server_url: Optional[str] = None,
+        timeout: float = 30,
+        max_concurrent: int = 8,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8,
+        router: Optional[ModelRouter] = None,
+        compactor: Optional[PromptCompactor] = None
+    ):
         """
         Initialise le service Mistral.
         
         Args:
             api_key: Clé API Mistral
+            server_url: URL de l'API (None pour l'API officielle, utile pour un serveur local de test)
+            timeout: Délai maximal d'un appel, tentatives comprises, en secondes
+            max_concurrent: Nombre maximal de requêtes simultanées vers l'API
+            max_retries: Nombre de nouvelles tentatives sur 429/5xx ou erreur réseau
+            backoff_base: Délai de base du backoff exponentiel en secondes
+            backoff_max: Délai maximal entre deux tentatives en secondes
+            router: Choix du modèle de chaque appel (par défaut, DEFAULT_MODEL pour tous les appels)
+            compactor: Compaction du code et des sorties avant leur envoi (None : envoyés tels quels)
         """
-        self.client = Mistral(api_key)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.router = router or ModelRouter(self.DEFAULT_MODEL, default_slo=timeout)
+        self.compactor = compactor
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        
+        self._http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrent,
+                max_keepalive_connections=max_concurrent
+            ),
+            timeout=timeout
+        )
+        self._api_key = api_key
+        self._server_url = server_url or None
+        self._client = None
         logger.info("Service Mistral initialisé")
     
+    @property
+    def client(self) -> Any:
+        """
+        Client Mistral, créé au premier appel à l'API.
+        
+        L'import du SDK mistralai est coûteux : il est différé pour ne pas ralentir le démarrage du bot.
+        """
+        if self._client is None:
+            from mistralai import Mistral
+            self._client = Mistral(
+                api_key=self._api_key,
+                server_url=self._server_url,
+                async_client=self._http_client
+            )
+        return self._client
+    
+    async def warm_up(self) -> None:
+        """Importe le SDK mistralai dans un thread, pour que le premier appel n'en paie pas le coût."""
+        try:
+            await asyncio.to_thread(importlib.import_module, "mistralai")
+        except Exception as e:
+            logger.warning("Préchargement du SDK Mistral impossible: %s", e)
+    
+    async def close(self) -> None:
+        """Ferme le pool de connexions HTTP."""
+        await self._http_client.aclose()
+    
+    async def _complete(self, messages: List[Dict[str, str]], method: str = "complete", **kwargs: Any) -> str:
+        """
+        Envoie une requête de complétion au modèle choisi par le routeur.
+        
+        Le délai de l'appel est l'objectif de latence de la tâche (borné par le délai global).
+        Si l'appel principal dépasse le p95 de son modèle, une requête de couverture est envoyée
+        au modèle de relais et la première réponse l'emporte. Si l'appel principal échoue,
+        le modèle de relais est essayé dans le temps restant.
+        
+        Args:
+            messages: Messages de la conversation
+            method: Nom de l'opération, pour le routage et les métriques de latence
+            **kwargs: Paramètres supplémentaires de l'API de complétion
+        
+        Returns:
+            Contenu de la réponse générée
+        
+        Raises:
+            asyncio.TimeoutError: Si le délai de l'appel est dépassé
+            Exception: Erreur de l'API non récupérable ou tentatives épuisées
+        """
+        route = self.router.route(method, messages)
+        start = time.perf_counter()
+        outcome = "error"
+        tasks: Dict[asyncio.Future, str] = {}
+        try:
+            deadline = time.monotonic() + min(self.timeout, route.slo)
+            primary = asyncio.ensure_future(self._complete_with_retries(route.model, messages, deadline, **kwargs))
+            tasks[primary] = route.model
+            relayed = None
+            
+            if route.fallback and route.hedge_after is not None:
+                await asyncio.wait([primary], timeout=route.hedge_after)
+                if not primary.done():
+                    logger.info("Appel %s sur %s au-delà du p95 (%.2fs), couverture sur %s", method, route.model, route.hedge_after, route.fallback)
+                    relayed = "hedge"
+                    tasks[asyncio.ensure_future(self._complete_with_retries(route.fallback, messages, deadline, **kwargs))] = route.fallback
+            
+            while True:
+                done, _ = await asyncio.wait(list(tasks), return_when=asyncio.FIRST_COMPLETED)
+                error = None
+                for task in done:
+                    model = tasks.pop(task)
+                    if task.exception() is None:
+                        if relayed:
+                            LLM_HEDGES.inc(kind=relayed, winner="primary" if model == route.model else "fallback")
+                        outcome = "success"
+                        return task.result()
+                    error = task.exception()
+                
+                if tasks:
+                    continue
+                if relayed or not route.fallback or isinstance(error, asyncio.TimeoutError) or time.monotonic() >= deadline:
+                    if relayed:
+                        LLM_HEDGES.inc(kind=relayed, winner="none")
+                    raise error
+                
+                logger.warning("Appel %s sur %s échoué (%s), relais sur %s", method, route.model, str(error)[:100], route.fallback)
+                relayed = "fallback"
+                tasks[asyncio.ensure_future(self._complete_with_retries(route.fallback, messages, deadline, **kwargs))] = route.fallback
+        
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            TIMEOUTS.inc(component="mistral")
+            raise
+        finally:
+            for task in tasks:
+                task.cancel()
+            LLM_DURATION.observe(time.perf_counter() - start, method=method, outcome=outcome)
+    
+    async def _complete_with_retries(self, model: str, messages: List[Dict[str, str]], deadline: float, **kwargs: Any) -> str:
+        """
+        Envoie une requête de complétion à un modèle en respectant le délai, la concurrence et les tentatives.
+        
+        Args:
+            model: Modèle Mistral à utiliser
+            messages: Messages de la conversation
+            deadline: Échéance de l'appel (horloge monotone)
+            **kwargs: Paramètres supplémentaires de l'API de complétion
+        
+        Returns:
+            Contenu de la réponse générée
+        """
+        attempt = 0
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("Délai de l'appel Mistral dépassé")
+            
+            try:
+                response = await asyncio.wait_for(
+                    self._request(model, messages, **kwargs),
+                    timeout=remaining
+                )
+                return response.choices[0].message.content
+            
+            except Exception as e:
+                self._record_failure(e)
+                delay = self._retry_delay(e, attempt)
+                if delay is None or time.monotonic() + delay >= deadline:
+                    raise
+                
+                attempt += 1
+                logger.warning("Appel Mistral échoué (%s), nouvelle tentative %s/%s dans %.2fs", str(e)[:100], attempt, self.max_retries, delay)
+                await asyncio.sleep(delay)
+    
+    async def _stream(self, messages: List[Dict[str, str]], method: str = "stream", **kwargs: Any) -> AsyncIterator[str]:
+        """
+        Envoie une requête de complétion en streaming au modèle choisi par le routeur.
+        
+        L'objectif de latence de la tâche s'applique au premier fragment, le délai global à chaque
+        attente entre deux fragments. Les nouvelles tentatives ne sont faites que tant qu'aucun fragment
+        n'a été produit, et passent par le modèle de relais.
+        
+        Args:
+            messages: Messages de la conversation
+            method: Nom de l'opération, pour le routage et les métriques de latence
+            **kwargs: Paramètres supplémentaires de l'API de complétion
+        
+        Yields:
+            Fragments successifs du contenu généré
+        """
+        route = self.router.route(method, messages, streaming=True)
+        model = route.model
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            attempt = 0
+            started = False
+            
+            while True:
+                try:
+                    async with self._semaphore:
+                        request_start = time.perf_counter()
+                        stream = await asyncio.wait_for(
+                            self.client.chat.stream_async(model=model, messages=messages, **kwargs),
+                            timeout=min(self.timeout, route.slo)
+                        )
+                        async with stream:
+                            while True:
+                                try:
+                                    event = await asyncio.wait_for(
+                                        stream.__anext__(),
+                                        timeout=self.timeout if started else max(0.0, min(self.timeout, route.slo) - (time.perf_counter() - request_start))
+                                    )
+                                except StopAsyncIteration:
+                                    outcome = "success"
+                                    return
+                                
+                                if not event.data.choices:
+                                    continue
+                                delta = event.data.choices[0].delta.content
+                                if isinstance(delta, str) and delta:
+                                    if not started:
+                                        started = True
+                                        self._record_latency(model, time.perf_counter() - request_start, streaming=True)
+                                    yield delta
+                
+                except Exception as e:
+                    if not started:
+                        self.router.record_failure(model, streaming=True)
+                    self._record_failure(e)
+                    delay = None if started else self._retry_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    
+                    attempt += 1
+                    if route.fallback:
+                        model = route.fallback if model == route.model else route.model
+                    logger.warning("Streaming Mistral échoué (%s), nouvelle tentative %s/%s sur %s dans %.2fs", str(e)[:100], attempt, self.max_retries, model, delay)
+                    await asyncio.sleep(delay)
+        
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            TIMEOUTS.inc(component="mistral")
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "cancelled"
+            raise
+        finally:
+            LLM_DURATION.observe(time.perf_counter() - start, method=method, outcome=outcome)
+    
+    async def _request(self, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        """Effectue une tentative de complétion dans la limite de concurrence et mesure la latence du modèle."""
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                response = await self.client.chat.complete_async(model=model, messages=messages, **kwargs)
+            except asyncio.CancelledError:
+                self.router.record_abandoned(model, time.perf_counter() - start)
+                raise
+            except Exception:
+                self.router.record_failure(model)
+                raise
+            self._record_latency(model, time.perf_counter() - start)
+            return response
+    
+    def _record_latency(self, model: str, seconds: float, streaming: bool = False) -> None:
+        """Enregistre la latence d'un appel réussi pour le routage et les métriques."""
+        self.router.record(model, seconds, streaming=streaming)
+        LLM_MODEL_DURATION.observe(seconds, model=model, mode="first_token" if streaming else "complete")
+    
+    @staticmethod
+    def _record_failure(error: Exception) -> None:
+        """Comptabilise les limitations de débit (429) de l'API Mistral."""
+        if getattr(error, "status_code", None) == 429:
+            MISTRAL_RATE_LIMITED.inc()
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """
+        Calcule le délai avant une nouvelle tentative (backoff exponentiel avec jitter complet).
+        
+        Args:
+            error: Erreur de la tentative précédente
+            attempt: Nombre de tentatives déjà relancées
+            
+        Returns:
+            Délai en secondes, ou None si l'erreur n'est pas récupérable
+        """
+        if attempt >= self.max_retries:
+            return None
+        
+        retry_after = 0.0
+        status_code = getattr(error, "status_code", None)
+        if status_code is not None:
+            if status_code not in self.RETRYABLE_STATUS_CODES:
+                return None
+            raw_response = getattr(error, "raw_response", None)
+            if raw_response is not None:
+                try:
+                    retry_after = float(raw_response.headers.get("retry-after", 0))
+                except ValueError:
+                    retry_after = 0.0
+        elif not isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+            return None
+        
+        backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(backoff, retry_after)
+    
     async def explain_ocaml_code(self, code: str, output: str) -> Optional[str]:
         """
         Génère une explication du code OCaml et de sa sortie.
@@ -29,32 +349,15 @@ class MistralService:
             Explication générée ou None en cas d'erreur
         """
         try:
-            messages = [{
-                "role": "system",
-                "content": "Tu es OCaBot, un bot Discord qui évalue du code OCaml en mode REPL, expression par expression, dans un sandbox sécurisé (firejail, pas de réseau, pas de root, limites CPU/mémoire, isolement), et qui répond en français de façon claire et concise sur les résultats d’exécution, les erreurs et la compréhension du code, sans s’attarder sur les problèmes d’indentation."
-            }, {
-                "role": "user",
-                "content": f"Évalue le code OCaml suivant:\n{code}"
-            }, {
-                "role": "assistant",
-                "content": f"Voici l'évaluation du code OCaml\n: {output}"
-            },{
-                "role": "user",
-                "content": "Explique la sortie de manière simple et concise."
-            }]
+            messages = self._explanation_messages(*self._compact_evaluation(code, output))
             
             logger.info("Génération d'explication OCaml via Mistral")
-            response = self.client.chat.complete(
-                model="mistral-large-latest",
-                messages=messages
-            )
-            
-            explanation = response.choices[0].message.content
+            explanation = await self._complete(messages, method="explain")
             logger.info("Explication générée avec succès")
             return explanation
             
         except Exception as e:
-            logger.error(f"Erreur lors de l'appel à Mistral: {str(e)}")
+            logger.error("Erreur lors de l'appel à Mistral: %s", e)
             return None
     
     async def generate_thread_name(self, code: str) -> Optional[str]:
@@ -68,6 +371,8 @@ class MistralService:
             Nom de thread généré ou None en cas d'erreur
         """
         try:
+            if self.compactor is not None:
+                code = self.compactor.compact("code", code, budget=self.THREAD_NAME_CODE_TOKENS).text
             messages = [{
                 "role": "system",
                 "content": "Tu es un assistant qui génère des noms de threads concis et descriptifs. Le nom doit faire maximum 50 caractères, être en français et décrire brièvement ce que fait le code OCaml. N'utilise pas de guillemets dans ta réponse, juste le nom du thread."
@@ -77,20 +382,13 @@ class MistralService:
             }]
             
             logger.info("Génération de nom de thread via Mistral")
-            response = self.client.chat.complete(
-                model="mistral-large-latest",
-                messages=messages
-            )
+            thread_name = self._clean_thread_name(await self._complete(messages, method="thread_name"))
             
-            thread_name = response.choices[0].message.content.strip()
-            if len(thread_name) > 50:
-                thread_name = thread_name[:47] + "..."
-            
-            logger.info(f"Nom de thread généré: {thread_name}")
+            logger.info("Nom de thread généré: %s", thread_name)
             return thread_name
             
         except Exception as e:
-            logger.error(f"Erreur lors de la génération du nom de thread: {str(e)}")
+            logger.error("Erreur lors de la génération du nom de thread: %s", e)
             return None
     
     async def generate_response(self, context: str, question: str) -> Optional[str]:
@@ -105,32 +403,230 @@ class MistralService:
             Réponse générée ou None en cas d'erreur
         """
         try:
-            messages = [{
-                "role": "system",
-                "content": "Tu es OCaBot, un bot Discord qui évalue du code OCaml en mode REPL, expression par expression, dans un sandbox sécurisé (firejail, pas de réseau, pas de root, limites CPU/mémoire, isolement), et qui répond en français de façon claire et concise sur les résultats d’exécution, les erreurs et la compréhension du code, sans s’attarder sur les problèmes d’indentation."
-            }, {
-                "role": "user", 
-                "content": f"Contexte de la discussion:\n{context}\n\nQuestion actuelle: {question}"
-            }]
+            messages = self._response_messages(context, question)
             
             logger.info("Génération de réponse contextuelle via Mistral")
-            response = self.client.chat.complete(
-                model="mistral-large-latest",
-                messages=messages
-            )
-            
-            result = response.choices[0].message.content
+            result = await self._complete(messages, method="response")
             logger.info("Réponse générée avec succès")
             return result
             
         except Exception as e:
-            logger.error(f"Erreur lors de l'appel à Mistral: {str(e)}")
+            logger.error("Erreur lors de l'appel à Mistral: %s", e)
+            return None
+    
+    async def summarize_conversation(self, previous_summary: str, lines: List[str], max_tokens: int = 400) -> Optional[str]:
+        """
+        Met à jour le résumé d'une discussion avec ses messages les plus anciens.
+        
+        Args:
+            previous_summary: Résumé existant (vide s'il n'y en a pas encore)
+            lines: Messages à intégrer au résumé, du plus ancien au plus récent
+            max_tokens: Taille maximale du résumé en tokens
+            
+        Returns:
+            Nouveau résumé ou None en cas d'erreur
+        """
+        try:
+            logger.info("Mise à jour du résumé de discussion via Mistral (%s messages)", len(lines))
+            return await self._complete(
+                self._summary_messages(previous_summary, lines),
+                method="summary",
+                max_tokens=max_tokens
+            )
+        except Exception as e:
+            logger.error("Erreur lors du résumé de la discussion: %s", e)
+            return None
+    
+    async def generate_thread_details(self, code: str, output: str) -> Optional[Dict[str, str]]:
+        """
+        Génère en une seule requête le nom du thread et l'explication du code OCaml.
+        
+        Args:
+            code: Code OCaml source
+            output: Sortie de l'évaluation
+            
+        Returns:
+            Dictionnaire {"title", "explanation"} validé ou None en cas d'erreur
+        """
+        try:
+            logger.info("Génération structurée du nom de thread et de l'explication via Mistral")
+            content = await self._complete(
+                self._thread_details_messages(*self._compact_evaluation(code, output)),
+                method="thread_details",
+                response_format={"type": "json_object"}
+            )
+            details = self._parse_thread_details(content)
+            logger.info("Nom de thread et explication générés: %s", details['title'])
+            return details
+            
+        except Exception as e:
+            logger.error("Erreur lors de la génération structurée: %s", e)
             return None
     
+    async def stream_thread_details(self, code: str, output: str) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Génère en une seule requête en streaming le nom du thread et l'explication du code OCaml.
+        
+        Le nom est produit en une fois dès qu'il est complet ; l'explication est produite par fragments.
+        La réponse complète est validée à la fin du flux.
+        
+        Args:
+            code: Code OCaml source
+            output: Sortie de l'évaluation
+            
+        Yields:
+            Couples ("title", nom complet) ou ("explanation", fragment)
+            
+        Raises:
+            ValueError: Si la réponse ne respecte pas le schéma attendu
+        """
+        logger.info("Génération structurée en streaming du nom de thread et de l'explication via Mistral")
+        parser = JsonStringFieldsParser()
+        title = ""
+        
+        async for delta in self._stream(
+            self._thread_details_messages(*self._compact_evaluation(code, output)),
+            method="stream_thread_details",
+            response_format={"type": "json_object"}
+        ):
+            for key, text, done in parser.feed(delta):
+                if key == "explanation" and text:
+                    yield "explanation", text
+                elif key == "title":
+                    title += text
+                    if done:
+                        yield "title", self._clean_thread_name(title)
+        
+        self._parse_thread_details(parser.raw)
+    
+    async def stream_explanation(self, code: str, output: str) -> AsyncIterator[str]:
+        """
+        Génère une explication du code OCaml en streaming.
+        
+        Args:
+            code: Code OCaml source
+            output: Sortie de l'évaluation
+            
+        Yields:
+            Fragments successifs de l'explication
+        """
+        logger.info("Génération d'explication OCaml en streaming via Mistral")
+        async for delta in self._stream(self._explanation_messages(*self._compact_evaluation(code, output)), method="stream_explanation"):
+            yield delta
+    
+    async def stream_response(self, context: str, question: str) -> AsyncIterator[str]:
+        """
+        Génère une réponse contextuelle en streaming.
+        
+        Args:
+            context: Contexte de la conversation
+            question: Question de l'utilisateur
+            
+        Yields:
+            Fragments successifs de la réponse
+        """
+        logger.info("Génération de réponse contextuelle en streaming via Mistral")
+        async for delta in self._stream(self._response_messages(context, question), method="stream_response"):
+            yield delta
+    
+    def _compact_evaluation(self, code: str, output: str) -> Tuple[str, str]:
+        """Compacte le code et la sortie d'une évaluation si un compacteur est configuré."""
+        if self.compactor is None:
+            return code, output
+        return self.compactor.compact_evaluation(code, output)
+    
+    @classmethod
+    def _explanation_messages(cls, code: str, output: str) -> List[Dict[str, str]]:
+        """Construit les messages de la requête d'explication."""
+        return [{
+            "role": "system",
+            "content": cls.SYSTEM_PROMPT
+        }, {
+            "role": "user",
+            "content": f"Évalue le code OCaml suivant:\n{code}"
+        }, {
+            "role": "assistant",
+            "content": f"Voici l'évaluation du code OCaml\n: {output}"
+        },{
+            "role": "user",
+            "content": "Explique la sortie de manière simple et concise."
+        }]
+    
+    @classmethod
+    def _thread_details_messages(cls, code: str, output: str) -> List[Dict[str, str]]:
+        """Construit les messages de la requête structurée (nom du thread et explication)."""
+        messages = cls._explanation_messages(code, output)
+        messages[-1] = {
+            "role": "user",
+            "content": cls.THREAD_DETAILS_INSTRUCTIONS
+        }
+        return messages
+    
+    @classmethod
+    def _parse_thread_details(cls, content: str) -> Dict[str, str]:
+        """
+        Valide la réponse JSON de la requête structurée.
+        
+        Args:
+            content: Réponse brute du modèle
+            
+        Returns:
+            Dictionnaire {"title", "explanation"} avec un nom de thread tronqué si besoin
+            
+        Raises:
+            ValueError: Si la réponse ne respecte pas le schéma attendu
+        """
+        data = json.loads(content)
+        if not isinstance(data, dict):
+            raise ValueError("La réponse structurée n'est pas un objet JSON")
+        
+        title = data.get("title")
+        explanation = data.get("explanation")
+        if not isinstance(title, str) or not title.strip():
+            raise ValueError("Champ 'title' manquant ou invalide")
+        if not isinstance(explanation, str) or not explanation.strip():
+            raise ValueError("Champ 'explanation' manquant ou invalide")
+        
+        return {"title": cls._clean_thread_name(title), "explanation": explanation}
+    
+    @classmethod
+    def _clean_thread_name(cls, name: str) -> str:
+        """Nettoie et tronque un nom de thread généré."""
+        name = name.strip().strip('"«»').strip()
+        if len(name) > cls.THREAD_NAME_MAX_LENGTH:
+            name = name[:cls.THREAD_NAME_MAX_LENGTH - 3] + "..."
+        return name
+    
+    @classmethod
+    def _response_messages(cls, context: str, question: str) -> List[Dict[str, str]]:
+        """Construit les messages de la requête de réponse contextuelle."""
+        return [{
+            "role": "system",
+            "content": cls.SYSTEM_PROMPT
+        }, {
+            "role": "user", 
+            "content": f"Contexte de la discussion:\n{context}\n\nQuestion actuelle: {question}"
+        }]
+    
+    @classmethod
+    def _summary_messages(cls, previous_summary: str, lines: List[str]) -> List[Dict[str, str]]:
+        """Construit les messages de la requête de mise à jour du résumé de discussion."""
+        previous = previous_summary or "(aucun)"
+        conversation = "\n".join(lines)
+        return [{
+            "role": "system",
+            "content": cls.SYSTEM_PROMPT
+        }, {
+            "role": "user",
+            "content": f"Résumé actuel de la discussion:\n{previous}\n\nNouveaux messages:\n{conversation}\n\n"
+                       "Mets à jour le résumé en intégrant les nouveaux messages. Conserve les questions posées, "
+                       "les réponses apportées et les extraits de code importants. Réponds uniquement avec le résumé."
+        }]
+    
     @staticmethod
     def split_message(message: str, max_length: int = 2000) -> List[str]:
         """
-        Divise un message en chunks pour respecter les limites Discord.
+        Divise un message en chunks pour respecter les limites Discord, sans casser les blocs de code.
         
         Args:
             message: Message à diviser
@@ -142,9 +638,7 @@ class MistralService:
         if len(message) <= max_length:
             return [message]
         
-        chunks = []
-        for i in range(0, len(message), max_length):
-            chunks.append(message[i:i+max_length])
+        chunks = split_markdown(message, max_length)
         
-        logger.info(f"Message divisé en {len(chunks)} chunks")
+        logger.info("Message divisé en %s chunks", len(chunks))
         return chunks
\ No newline at end of file
@@ -0,0 +1,214 @@
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Route:
+    """Choix du modèle pour un appel Mistral."""
+
+    model: str
+    fallback: Optional[str]
+    slo: float
+    hedge_after: Optional[float] = None
+
+class LatencyStats:
+    """Latences des derniers appels d'un modèle (réussis ou abandonnés), sur une fenêtre glissante."""
+
+    def __init__(self, window: int = 200):
+        """
+        Initialise des statistiques vides.
+
+        Args:
+            window: Nombre de mesures conservées
+        """
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.successes = 0
+        self.failures = 0
+        self.abandoned = 0
+
+    def record(self, seconds: float) -> None:
+        """Enregistre la durée d'un appel réussi."""
+        self._samples.append(seconds)
+        self.successes += 1
+
+    def record_failure(self) -> None:
+        """Comptabilise un appel en échec."""
+        self.failures += 1
+
+    def record_abandoned(self, seconds: float) -> None:
+        """
+        Enregistre un appel interrompu avant sa réponse.
+
+        Sa durée n'est qu'une borne inférieure de sa latence, souvent courte puisque l'appel a été coupé
+        dès la réponse de l'autre modèle : elle est comptée au moins au p95 courant, pour ne jamais faire
+        baisser le p95 du modèle abandonné. Sans mesure préalable, l'appel est seulement comptabilisé.
+        """
+        self.abandoned += 1
+        p95 = self.percentile(0.95)
+        if p95 is not None:
+            self._samples.append(max(seconds, p95))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """
+        Calcule un quantile des latences de la fenêtre.
+
+        Args:
+            q: Quantile entre 0 et 1
+
+        Returns:
+            Latence en secondes, ou None sans mesure
+        """
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class ModelRouter:
+    """
+    Choisit le modèle Mistral de chaque appel selon la tâche, la taille de l'entrée et les latences observées.
+
+    Les tâches courtes (nom de thread, entrées de petite taille) vont au petit modèle, les autres au grand.
+    Un modèle dont le p95 dépasse l'objectif de latence de la tâche cède sa place à l'autre si celui-ci
+    est plus rapide. L'autre modèle sert aussi de relais : requête de couverture lancée quand l'appel
+    principal dépasse son p95, et nouvel essai si l'appel principal échoue.
+    """
+
+    DEFAULT_SLOS = {
+        "thread_name": 5.0,
+        "summary": 30.0,
+    }
+    SMALL_TASKS = ("thread_name",)
+    SIZE_ROUTED_TASKS = ("explain", "thread_details", "stream_explanation", "stream_thread_details", "response", "stream_response")
+
+    def __init__(
+        self,
+        large_model: str,
+        small_model: Optional[str] = None,
+        small_input_chars: int = 600,
+        default_slo: float = 20.0,
+        slos: Optional[Dict[str, float]] = None,
+        hedge: bool = True,
+        min_samples: int = 20,
+        window: int = 200
+    ):
+        """
+        Initialise le routeur.
+
+        Args:
+            large_model: Modèle par défaut
+            small_model: Modèle rapide pour les tâches courtes, les couvertures et les relais (None : un seul modèle)
+            small_input_chars: Taille d'entrée en caractères en dessous de laquelle le petit modèle est choisi
+            default_slo: Objectif de latence des tâches sans objectif propre, en secondes
+            slos: Objectifs de latence par tâche, en secondes
+            hedge: Active les requêtes de couverture
+            min_samples: Nombre de mesures nécessaires avant d'utiliser le p95 d'un modèle
+            window: Nombre de mesures conservées par modèle
+        """
+        self.large_model = large_model
+        self.small_model = small_model if small_model and small_model != large_model else None
+        self.small_input_chars = small_input_chars
+        self.default_slo = default_slo
+        self.slos = {**self.DEFAULT_SLOS, **(slos or {})}
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self.window = window
+        self._stats: Dict[Tuple[str, bool], LatencyStats] = {}
+
+    def route(self, method: str, messages: List[Dict[str, str]], streaming: bool = False) -> Route:
+        """
+        Choisit le modèle d'un appel.
+
+        Args:
+            method: Nom de la tâche (thread_name, explain, response...)
+            messages: Messages envoyés au modèle
+            streaming: Appel en streaming (la latence mesurée est alors celle du premier fragment)
+
+        Returns:
+            Modèle principal, modèle de relais, objectif de latence et délai avant couverture
+        """
+        slo = self.slos.get(method, self.default_slo)
+        if self.small_model is None:
+            return Route(self.large_model, None, slo)
+
+        model, fallback = self.large_model, self.small_model
+        if method in self.SMALL_TASKS or (
+            method in self.SIZE_ROUTED_TASKS and self._input_size(messages) <= self.small_input_chars
+        ):
+            model, fallback = fallback, model
+
+        primary_p95 = self._p95(model, streaming)
+        if primary_p95 is not None and primary_p95 > slo:
+            fallback_p95 = self._p95(fallback, streaming)
+            if fallback_p95 is not None and fallback_p95 < primary_p95:
+                logger.debug("Modèle %s trop lent pour %s (p95 %.2fs), remplacé par %s", model, method, primary_p95, fallback)
+                model, fallback = fallback, model
+                primary_p95 = fallback_p95
+
+        hedge_after = None
+        if self.hedge and not streaming and primary_p95 is not None and primary_p95 < slo:
+            hedge_after = primary_p95
+        return Route(model, fallback, slo, hedge_after)
+
+    def record(self, model: str, seconds: float, streaming: bool = False) -> None:
+        """
+        Enregistre la latence d'un appel réussi.
+
+        Args:
+            model: Modèle appelé
+            seconds: Durée de l'appel (du premier fragment en streaming)
+            streaming: Appel en streaming
+        """
+        self._get(model, streaming).record(seconds)
+
+    def record_failure(self, model: str, streaming: bool = False) -> None:
+        """Comptabilise un appel en échec."""
+        self._get(model, streaming).record_failure()
+
+    def record_abandoned(self, model: str, seconds: float, streaming: bool = False) -> None:
+        """
+        Enregistre un appel interrompu (couverture gagnante, délai dépassé).
+
+        Sa durée compte comme une mesure censurée : elle peut relever le p95 du modèle, jamais le faire baisser.
+        """
+        self._get(model, streaming).record_abandoned(seconds)
+
+    def get_stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """
+        Retourne les statistiques de latence par modèle.
+
+        Returns:
+            Dictionnaire {"modèle" ou "modèle/stream": {successes, failures, abandoned, p50, p95}}
+        """
+        return {
+            f"{model}/stream" if streaming else model: {
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "abandoned": stats.abandoned,
+                "p50": stats.percentile(0.5),
+                "p95": stats.percentile(0.95),
+            }
+            for (model, streaming), stats in self._stats.items()
+        }
+
+    def _get(self, model: str, streaming: bool) -> LatencyStats:
+        stats = self._stats.get((model, streaming))
+        if stats is None:
+            stats = self._stats[(model, streaming)] = LatencyStats(self.window)
+        return stats
+
+    def _p95(self, model: str, streaming: bool) -> Optional[float]:
+        stats = self._stats.get((model, streaming))
+        if stats is None or len(stats) < self.min_samples:
+            return None
+        return stats.percentile(0.95)
+
+    @staticmethod
+    def _input_size(messages: List[Dict[str, str]]) -> int:
+        """Taille des messages hors prompt système, en caractères."""
+        return sum(len(message["content"]) for message in messages if message["role"] != "system")
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import logging
+from typing import Callable, Dict, List, Optional
+from src.utils.cache import LRUCache, SingleFlight
+from src.utils.metrics import CACHE_REQUESTS, STAGE_DURATION
+from src.utils.process import communicate_capped, firejail_timeout, kill_process_tree
+
+logger = logging.getLogger(__name__)
+
+class OCamlTypeChecker:
+    """
+    Analyse et typage du code OCaml avant sa compilation, pour rejeter immédiatement le code invalide.
+
+    ocamlc n'a pas de mode persistant : chaque vérification lance un ocamlc dans une sandbox firejail,
+    et les résultats sont mis en cache par empreinte du source. La concurrence est bornée par l'appelant.
+    """
+
+    SOURCE_NAME = "main.ml"
+    DIRECTIVE_RE = re.compile(r"^\s*#\s*[a-z_]+", re.MULTILINE)
+    LOCATION_RE = re.compile(r'File "main\.ml", line')
+    GENERALIZATION_ERROR = "cannot be generalized"
+    COMMAND = ["ocamlc", "-stop-after", "typing", "-c", SOURCE_NAME]
+
+    def __init__(
+        self,
+        work_dir: str,
+        sandbox_command: Callable[[List[str], List[str]], List[str]],
+        timeout: float = 10,
+        cache_size: int = 1024,
+        max_output_bytes: int = 64 * 1024
+    ):
+        """
+        Initialise le vérificateur.
+
+        Args:
+            work_dir: Répertoire où sont créés les répertoires temporaires des vérifications
+                (hors de /tmp, invisible dans la sandbox)
+            sandbox_command: Fonction construisant la commande firejail (options, commande)
+            timeout: Durée maximale d'une vérification en secondes
+            cache_size: Nombre de résultats de vérification gardés en mémoire
+            max_output_bytes: Taille maximale conservée des diagnostics
+        """
+        self.work_dir = os.path.abspath(work_dir)
+        self.sandbox_command = sandbox_command
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self._cache = LRUCache(max_size=cache_size)
+        self._single_flight = SingleFlight()
+        self._available = True
+        self.rejected = 0
+        self.passed = 0
+        self.skipped = 0
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du vérificateur.
+
+        Returns:
+            Dictionnaire du code rejeté, accepté et non vérifié
+        """
+        return {"rejected": self.rejected, "passed": self.passed, "skipped": self.skipped}
+
+    async def check(self, code: str) -> Optional[str]:
+        """
+        Vérifie la syntaxe et le typage du code, sans l'exécuter.
+
+        Le code utilisant des directives du toplevel (#use, #require...) n'est pas vérifié,
+        et les erreurs de généralisation propres aux unités de compilation sont ignorées.
+
+        Args:
+            code: Code OCaml à vérifier
+
+        Returns:
+            Diagnostics du compilateur si le code est invalide, None sinon
+        """
+        if not self._available or self.DIRECTIVE_RE.search(code):
+            self.skipped += 1
+            return None
+
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        cached = self._cache.get(key)
+        CACHE_REQUESTS.inc(cache="typecheck", result="miss" if cached is None else "hit")
+        if cached is None:
+            try:
+                cached, _ = await self._single_flight.do(key, lambda: self._typecheck(code))
+            except FileNotFoundError:
+                logger.warning("firejail ou ocamlc est introuvable, vérification statique désactivée")
+                self._available = False
+                self.skipped += 1
+                return None
+            except Exception as e:
+                logger.warning("Vérification statique impossible: %s", e)
+                self.skipped += 1
+                return None
+            self._cache.set(key, cached)
+
+        if cached["ok"]:
+            self.passed += 1
+            return None
+        self.rejected += 1
+        logger.info("Code rejeté par la vérification statique")
+        return cached["diagnostics"]
+
+    async def _typecheck(self, code: str) -> Dict[str, object]:
+        """Lance ocamlc jusqu'à l'étape de typage sur le code, dans une sandbox firejail."""
+        workdir = tempfile.mkdtemp(prefix="check-", dir=self.work_dir)
+        process = None
+        try:
+            with open(os.path.join(workdir, self.SOURCE_NAME), "w") as source:
+                source.write(code)
+
+            process = await asyncio.create_subprocess_exec(
+                *self.sandbox_command([firejail_timeout(self.timeout)], self.COMMAND),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=workdir,
+                start_new_session=True
+            )
+            with STAGE_DURATION.time(stage="typecheck"):
+                stdout, stderr, _ = await asyncio.wait_for(
+                    communicate_capped(process, self.max_output_bytes), timeout=self.timeout
+                )
+        finally:
+            if process is not None:
+                await kill_process_tree(process)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        diagnostics = (stderr or stdout).decode("utf-8", errors="replace").strip()
+        if process.returncode != 0 and not self.LOCATION_RE.search(diagnostics):
+            # Échec de firejail ou ocamlc introuvable dans la sandbox, et non un diagnostic sur le code
+            raise RuntimeError(diagnostics or f"code de sortie {process.returncode}")
+        ok = process.returncode == 0 or self.GENERALIZATION_ERROR in diagnostics
+        return {"ok": ok, "diagnostics": self.LOCATION_RE.sub("Line", diagnostics)}
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import logging
+from typing import Callable, Dict, List, Set, Tuple
+from src.utils.cache import SingleFlight
+from src.utils.metrics import CACHE_REQUESTS, STAGE_DURATION
+from src.utils.process import communicate_capped, firejail_timeout, kill_process_tree
+
+logger = logging.getLogger(__name__)
+
+class CompilationError(Exception):
+    """Le code n'a pas pu être compilé ; le message contient les diagnostics du compilateur."""
+
+class OCamlCompiler:
+    """Compile du code OCaml en bytecode (ocamlc) ou en natif (ocamlopt) et conserve les exécutables produits."""
+
+    COMPILERS = {"bytecode": "ocamlc", "native": "ocamlopt"}
+    SOURCE_NAME = "main.ml"
+    EXECUTABLE_NAME = "main"
+
+    def __init__(
+        self,
+        artifact_dir: str,
+        sandbox_command: Callable[[List[str], List[str]], List[str]],
+        timeout: float = 35,
+        max_artifacts: int = 200,
+        max_output_bytes: int = 256 * 1024
+    ):
+        """
+        Initialise le compilateur.
+
+        Args:
+            artifact_dir: Répertoire des exécutables compilés
+            sandbox_command: Fonction construisant la commande firejail (options, commande)
+            timeout: Durée maximale d'une compilation en secondes
+            max_artifacts: Nombre maximal d'exécutables conservés (les moins récemment utilisés sont supprimés)
+            max_output_bytes: Taille maximale conservée des diagnostics du compilateur
+        """
+        self.artifact_dir = os.path.abspath(artifact_dir)
+        self.sandbox_command = sandbox_command
+        self.timeout = timeout
+        self.max_artifacts = max_artifacts
+        self.max_output_bytes = max_output_bytes
+        self._versions: Dict[str, str] = {}
+        self._builds = SingleFlight()
+        self._processes: Set[asyncio.subprocess.Process] = set()
+        self._in_use: Dict[str, int] = {}
+        self.hits = 0
+        self.compilations = 0
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne les compteurs du cache d'exécutables.
+
+        Returns:
+            Dictionnaire des exécutables réutilisés et des compilations effectuées
+        """
+        return {"hits": self.hits, "compilations": self.compilations}
+
+    async def get_version(self, backend: str) -> str:
+        """
+        Retourne la version du compilateur d'un backend (mise en cache après le premier appel).
+
+        Args:
+            backend: "bytecode" ou "native"
+
+        Returns:
+            Version du compilateur, ou "unknown" si elle n'a pas pu être déterminée
+        """
+        compiler = self.COMPILERS[backend]
+        if compiler not in self._versions:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    compiler, "-vnum",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+                stdout, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+                self._versions[compiler] = stdout.decode("utf-8", errors="replace").strip() or "unknown"
+            except Exception as e:
+                logger.warning("Impossible de déterminer la version de %s: %s", compiler, e)
+                self._versions[compiler] = "unknown"
+        return self._versions[compiler]
+
+    async def build(self, code: str, backend: str) -> str:
+        """
+        Retourne l'exécutable compilé du code, en le compilant s'il n'est pas déjà en cache.
+
+        Les compilations concurrentes d'un même code sont partagées. L'exécutable est réservé jusqu'à
+        l'appel de release : le nettoyage du cache ne peut pas le supprimer entre sa recherche
+        et son exécution.
+
+        Args:
+            code: Code OCaml source
+            backend: "bytecode" ou "native"
+
+        Returns:
+            Chemin de l'exécutable, à libérer avec release
+
+        Raises:
+            CompilationError: Si le code ne compile pas
+            asyncio.TimeoutError: Si la compilation dépasse le délai
+        """
+        key = hashlib.sha256(
+            "\0".join([backend, await self.get_version(backend), code]).encode("utf-8")
+        ).hexdigest()
+        path = os.path.join(self.artifact_dir, f"{key}.{backend}")
+
+        self._in_use[path] = self._in_use.get(path, 0) + 1
+        try:
+            if os.path.exists(path):
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache="artifacts", result="hit")
+                os.utime(path)
+                logger.info("Exécutable %s servi depuis le cache", backend)
+                return path
+
+            CACHE_REQUESTS.inc(cache="artifacts", result="miss")
+            await self._builds.do(key, lambda: self._compile(code, backend, path))
+            return path
+        except BaseException:
+            self.release(path)
+            raise
+
+    def release(self, path: str) -> None:
+        """
+        Libère un exécutable réservé par build, qui peut de nouveau être supprimé par le nettoyage du cache.
+
+        Args:
+            path: Chemin retourné par build
+        """
+        count = self._in_use.get(path, 0) - 1
+        if count > 0:
+            self._in_use[path] = count
+        else:
+            self._in_use.pop(path, None)
+
+    async def close(self) -> None:
+        """Tue les compilations encore en cours."""
+        for process in list(self._processes):
+            await kill_process_tree(process)
+
+    async def _compile(self, code: str, backend: str, path: str) -> None:
+        """Compile le code dans un répertoire temporaire de la sandbox puis publie l'exécutable."""
+        workdir = tempfile.mkdtemp(prefix="build-", dir=self.artifact_dir)
+        process = None
+        try:
+            with open(os.path.join(workdir, self.SOURCE_NAME), "w") as source:
+                source.write(code)
+
+            logger.info("Compilation %s du code OCaml avec firejail", backend)
+            process = await asyncio.create_subprocess_exec(
+                *self.sandbox_command(
+                    [firejail_timeout(self.timeout)],
+                    [self.COMPILERS[backend], "-o", self.EXECUTABLE_NAME, self.SOURCE_NAME]
+                ),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=workdir,
+                start_new_session=True
+            )
+            self._processes.add(process)
+
+            try:
+                with STAGE_DURATION.time(stage="compile"):
+                    stdout, stderr, _ = await asyncio.wait_for(
+                        communicate_capped(process, self.max_output_bytes), timeout=self.timeout
+                    )
+            except asyncio.TimeoutError:
+                await kill_process_tree(process)
+                raise
+
+            self.compilations += 1
+            executable = os.path.join(workdir, self.EXECUTABLE_NAME)
+            if process.returncode != 0 or not os.path.exists(executable):
+                diagnostics = (stderr or stdout).decode("utf-8", errors="replace").strip()
+                raise CompilationError(diagnostics or "Erreur inconnue lors de la compilation")
+
+            os.replace(executable, path)
+            self._prune()
+
+        except asyncio.CancelledError:
+            if process is not None:
+                await kill_process_tree(process)
+            raise
+        finally:
+            if process is not None:
+                self._processes.discard(process)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def _prune(self) -> None:
+        """Supprime les exécutables les moins récemment utilisés au-delà de la limite, sauf ceux réservés."""
+        artifacts: List[Tuple[float, str]] = []
+        for entry in os.scandir(self.artifact_dir):
+            if entry.is_file():
+                artifacts.append((entry.stat().st_mtime, entry.path))
+        if len(artifacts) <= self.max_artifacts:
+            return
+
+        artifacts.sort()
+        excess = len(artifacts) - self.max_artifacts
+        for _, path in [artifact for artifact in artifacts if artifact[1] not in self._in_use][:excess]:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
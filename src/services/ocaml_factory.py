@@ -0,0 +1,40 @@
+from src.config.settings import config
+from src.services.evaluation_cache import EvaluationCache
+from src.services.ocaml_service import OCamlService
+
+def create_ocaml_service(repl_sessions: bool = False) -> OCamlService:
+    """
+    Construit le service d'évaluation local (pool de toplevels, cache, vérification statique)
+    à partir de la configuration.
+
+    Args:
+        repl_sessions: Active les sessions REPL par thread (le service partagé ne les expose pas)
+
+    Returns:
+        Service OCaml non démarré
+    """
+    evaluation_cache = None
+    if config.OCAML_CACHE_SIZE > 0:
+        evaluation_cache = EvaluationCache(
+            max_size=config.OCAML_CACHE_SIZE,
+            ttl=config.OCAML_CACHE_TTL,
+            disk_path=config.OCAML_CACHE_PATH or None
+        )
+
+    return OCamlService(
+        max_concurrent=config.OCAML_MAX_CONCURRENT,
+        timeout=config.OCAML_TIMEOUT,
+        pool_min_size=config.OCAML_POOL_MIN_SIZE,
+        pool_max_size=config.OCAML_POOL_MAX_SIZE,
+        pool_max_runs=config.OCAML_POOL_MAX_RUNS,
+        cache=evaluation_cache,
+        max_output_bytes=config.OCAML_MAX_OUTPUT_BYTES,
+        artifact_dir=config.OCAML_ARTIFACT_DIR or None,
+        max_artifacts=config.OCAML_ARTIFACT_MAX_ENTRIES,
+        typecheck=config.OCAML_TYPECHECK,
+        typecheck_cache_size=config.OCAML_TYPECHECK_CACHE_SIZE,
+        session_max_live=config.REPL_SESSIONS_MAX_LIVE if repl_sessions else 0,
+        session_max_sessions=config.REPL_SESSIONS_MAX,
+        session_idle_timeout=config.REPL_SESSION_IDLE_TIMEOUT,
+        session_max_replay_bytes=config.REPL_SESSION_MAX_REPLAY_BYTES
+    )
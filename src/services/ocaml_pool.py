@@ -0,0 +1,430 @@
+import re
+import asyncio
+import secrets
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from src.utils.metrics import SANDBOX_FAILURES, STAGE_DURATION
+from src.utils.process import kill_process_tree
+
+logger = logging.getLogger(__name__)
+
+QUOTED_STRING_START = re.compile(r"\{([a-z_]*)\|")
+CHAR_LITERAL = re.compile(r"'(?:[^\\'\n]|\\(?:[\\'\"ntbr ]|[0-9]{3}|x[0-9a-fA-F]{2}|o[0-3][0-7]{2}))'")
+
+# Phrases envoyées au démarrage d'un toplevel. Elles définissent la fonction sentinelle (liée à Stdlib
+# dès maintenant, donc insensible aux redéfinitions du code utilisateur), puis font lire les phrases
+# sur une copie du canal de contrôle et placent /dev/null sur l'entrée standard du code utilisateur.
+# La dernière phrase doit terminer le message : ce que le toplevel aurait lu au-delà, dans le tampon
+# de stdin, serait perdu au changement de canal.
+TOPLEVEL_BOOTSTRAP = """#directory "+compiler-libs";;
+#directory "+unix";;
+#load "unix.cma";;
+let {sentinel} () = Stdlib.print_endline "{marker}";;
+let () =
+  let control = Unix.in_channel_of_descr (Unix.dup Unix.stdin) in
+  let null = Unix.openfile "/dev/null" [Unix.O_RDONLY] 0 in
+  Unix.dup2 null Unix.stdin;
+  Unix.close null;
+  Toploop.read_interactive_input := (fun prompt buffer len ->
+    Stdlib.print_string prompt;
+    Stdlib.flush Stdlib.stdout;
+    let rec read i =
+      if i >= len then (i, false)
+      else match Stdlib.input_char control with
+        | c -> Bytes.set buffer i c; if c = '\\n' then (i + 1, false) else read (i + 1)
+        | exception End_of_file -> (i, true)
+    in
+    read 0);
+  {sentinel} ();;
+"""
+
+def unterminated_literal(code: str) -> Optional[str]:
+    """
+    Détecte un commentaire ou une chaîne non terminés, qui absorberaient la phrase sentinelle du toplevel.
+
+    Les chaînes (y compris {id|...|id}) et les caractères sont reconnus aussi dans les commentaires,
+    comme le fait le lexer OCaml.
+
+    Args:
+        code: Code OCaml à envoyer au toplevel
+
+    Returns:
+        Message d'erreur au format du toplevel, ou None si le code est bien délimité
+    """
+    depth = 0
+    i, n = 0, len(code)
+    while i < n:
+        quoted = QUOTED_STRING_START.match(code, i)
+        char = CHAR_LITERAL.match(code, i)
+        if code.startswith("(*", i):
+            depth += 1
+            i += 2
+        elif depth and code.startswith("*)", i):
+            depth -= 1
+            i += 2
+        elif code[i] == '"':
+            i += 1
+            while i < n and code[i] != '"':
+                i += 2 if code[i] == "\\" else 1
+            if i >= n:
+                break
+            i += 1
+        elif quoted is not None:
+            end = code.find(f"|{quoted.group(1)}}}", quoted.end())
+            if end < 0:
+                break
+            i = end + len(quoted.group(1)) + 2
+        elif char is not None:
+            i = char.end()
+        else:
+            i += 1
+    else:
+        return "Error: Comment not terminated" if depth else None
+    if depth:
+        return "Error: This comment contains an unterminated string literal"
+    return "Error: String literal not terminated"
+
+class OCamlWorker:
+    """Toplevel OCaml sandboxé lancé à l'avance et prêt à évaluer du code."""
+
+    STDERR_MAX_BYTES = 64 * 1024
+
+    def __init__(self, command: List[str], max_output_bytes: int = 256 * 1024):
+        """
+        Initialise le worker sans lancer le processus.
+
+        Args:
+            command: Commande complète (firejail + ocaml) à lancer
+            max_output_bytes: Taille maximale de la sortie d'une exécution, au-delà de laquelle le worker est tué
+        """
+        self.command = command
+        self.max_output_bytes = max_output_bytes
+        self.truncated = False
+        self.runs = 0
+        self.created_at = time.monotonic()
+        self.process: Optional[asyncio.subprocess.Process] = None
+        token = secrets.token_hex(8)
+        self._marker = f"__OCABOT_{token}__"
+        self._sentinel = f"ocabot_sentinel_{token}"
+        self._buffer = b""
+        self._stderr = bytearray()
+        self._stderr_task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        """Indique si le toplevel est toujours en vie."""
+        return self.process is not None and self.process.returncode is None
+
+    @property
+    def stderr(self) -> str:
+        """Sortie d'erreur accumulée depuis la dernière exécution."""
+        return self._stderr.decode("utf-8", errors="replace")
+
+    async def start(self, timeout: float) -> None:
+        """
+        Lance le toplevel et attend qu'il soit prêt (bannière consommée, canal de contrôle installé).
+
+        Args:
+            timeout: Durée maximale du démarrage
+        """
+        start = time.perf_counter()
+        self.process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd="/tmp",
+            start_new_session=True
+        )
+        self._stderr_task = asyncio.ensure_future(self._drain_stderr())
+
+        bootstrap = TOPLEVEL_BOOTSTRAP.format(sentinel=self._sentinel, marker=self._marker)
+        try:
+            output, exited = await asyncio.wait_for(self._exchange(bootstrap), timeout=timeout)
+        except BaseException:
+            await self.kill()
+            raise
+        if exited:
+            raise RuntimeError(f"Le toplevel s'est arrêté au démarrage: {self.stderr.strip()}")
+        if "Error" in output:
+            await self.kill()
+            raise RuntimeError(f"Initialisation du toplevel impossible: {output.strip()}")
+        self._buffer = b""
+        STAGE_DURATION.observe(time.perf_counter() - start, stage="sandbox_spawn")
+
+    async def run(self, code: str, timeout: float) -> Tuple[str, bool]:
+        """
+        Évalue du code dans le toplevel.
+
+        Le worker est tué en cas de timeout, d'annulation ou de sortie trop longue
+        (truncated est alors positionné).
+
+        Args:
+            code: Code OCaml à évaluer
+            timeout: Durée maximale de l'évaluation
+
+        Returns:
+            Tuple (sortie, terminé) où terminé indique que le toplevel s'est arrêté
+        """
+        self.runs += 1
+        self.truncated = False
+        self._stderr.clear()
+        try:
+            return await asyncio.wait_for(self._exchange(self._payload(code)), timeout=timeout)
+        except BaseException:
+            await self.kill()
+            raise
+
+    async def ping(self, timeout: float = 2) -> bool:
+        """
+        Vérifie que le toplevel répond.
+
+        Args:
+            timeout: Durée maximale de la vérification
+
+        Returns:
+            True si le toplevel a répondu à temps
+        """
+        if not self.alive:
+            return False
+        try:
+            _, exited = await asyncio.wait_for(self._exchange(self._payload("")), timeout=timeout)
+        except Exception:
+            await self.kill()
+            return False
+        return not exited
+
+    async def kill(self) -> None:
+        """Tue le toplevel et sa sandbox."""
+        if self.process is not None:
+            await kill_process_tree(self.process)
+        if self._stderr_task is not None:
+            self._stderr_task.cancel()
+
+    def _payload(self, code: str) -> str:
+        """Code suivi de l'appel à la fonction sentinelle, dont le nom aléatoire ne peut être redéfini."""
+        payload = ""
+        if code:
+            payload += f"{code}\n;;\n"
+        return payload + f"let () = {self._sentinel} ();;\n"
+
+    async def _exchange(self, payload: str) -> Tuple[str, bool]:
+        """
+        Envoie des phrases au toplevel et lit la sortie jusqu'à la sentinelle.
+
+        Args:
+            payload: Phrases à envoyer, la dernière affichant la sentinelle
+
+        Returns:
+            Tuple (sortie, terminé)
+        """
+        try:
+            self.process.stdin.write(payload.encode("utf-8"))
+            await self.process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+        needle = (self._marker + "\n").encode("utf-8")
+        while needle not in self._buffer:
+            if len(self._buffer) > self.max_output_bytes + len(needle):
+                self.truncated = True
+                await self.kill()
+                output, self._buffer = self._buffer[:self.max_output_bytes], b""
+                return output.decode("utf-8", errors="replace"), True
+            chunk = await self.process.stdout.read(4096)
+            if not chunk:
+                await self.process.wait()
+                output, self._buffer = self._buffer, b""
+                return output.decode("utf-8", errors="replace"), True
+            self._buffer += chunk
+
+        output, self._buffer = self._buffer.split(needle, 1)
+        output = output.decode("utf-8", errors="replace")
+        if output.endswith("# "):
+            output = output[:-2]
+        return output, False
+
+    async def _drain_stderr(self) -> None:
+        """Consomme stderr en continu pour éviter de bloquer le toplevel."""
+        while True:
+            chunk = await self.process.stderr.read(4096)
+            if not chunk:
+                return
+            self._stderr.extend(chunk)
+            if len(self._stderr) > self.STDERR_MAX_BYTES:
+                del self._stderr[:-self.STDERR_MAX_BYTES]
+
+class OCamlWorkerPool:
+    """Pool de toplevels OCaml sandboxés maintenus chauds."""
+
+    def __init__(
+        self,
+        command: List[str],
+        min_size: int = 2,
+        max_size: int = 4,
+        max_runs: int = 1,
+        start_timeout: float = 10,
+        health_check_interval: float = 30,
+        max_output_bytes: int = 256 * 1024
+    ):
+        """
+        Initialise le pool sans lancer de worker.
+
+        Args:
+            command: Commande complète (firejail + ocaml) d'un worker
+            min_size: Nombre de workers inactifs à garder prêts
+            max_size: Nombre maximal de workers (inactifs, occupés ou en démarrage)
+            max_runs: Nombre d'exécutions avant recyclage d'un worker (1 = aucun état partagé)
+            start_timeout: Durée maximale du démarrage d'un worker
+            health_check_interval: Intervalle entre deux vérifications des workers inactifs
+            max_output_bytes: Taille maximale de la sortie d'une exécution
+        """
+        self.command = command
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.max_runs = max(max_runs, 1)
+        self.start_timeout = start_timeout
+        self.health_check_interval = health_check_interval
+        self.max_output_bytes = max_output_bytes
+
+        self._idle: "asyncio.Queue[OCamlWorker]" = asyncio.Queue()
+        self._busy = 0
+        self._spawning = 0
+        self._waiters = 0
+        self._spawn_failures = 0
+        self._recycled = 0
+        self._closed = False
+        self._tasks = set()
+        self._maintenance_task: Optional[asyncio.Task] = None
+
+    @property
+    def size(self) -> int:
+        """Nombre total de workers (inactifs, occupés ou en démarrage)."""
+        return self._idle.qsize() + self._busy + self._spawning
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne l'état du pool.
+
+        Returns:
+            Dictionnaire avec le nombre de workers par état et les compteurs de recyclage
+        """
+        return {
+            "idle": self._idle.qsize(),
+            "busy": self._busy,
+            "spawning": self._spawning,
+            "waiting": self._waiters,
+            "recycled": self._recycled,
+            "spawn_failures": self._spawn_failures,
+        }
+
+    def start(self) -> None:
+        """Lance les workers initiaux et la boucle de maintenance."""
+        self._replenish()
+        self._maintenance_task = asyncio.ensure_future(self._maintain())
+        logger.info("Pool OCaml démarré (min %s, max %s, %s exécution(s) par worker)", self.min_size, self.max_size, self.max_runs)
+
+    async def acquire(self) -> OCamlWorker:
+        """
+        Obtient un worker prêt, en attendant qu'un worker se libère ou démarre.
+
+        Returns:
+            Worker réservé, à rendre avec release()
+        """
+        self._waiters += 1
+        try:
+            while True:
+                self._replenish()
+                worker = await self._idle.get()
+                if worker.alive:
+                    self._busy += 1
+                    return worker
+                self._recycled += 1
+        finally:
+            self._waiters -= 1
+
+    def release(self, worker: OCamlWorker) -> None:
+        """
+        Rend un worker au pool, ou le recycle s'il est mort ou a atteint sa limite d'exécutions.
+
+        Args:
+            worker: Worker obtenu par acquire()
+        """
+        self._busy -= 1
+        if not self._closed and worker.alive and worker.runs < self.max_runs:
+            self._idle.put_nowait(worker)
+        else:
+            self._recycled += 1
+            self._spawn_background(worker.kill())
+        self._replenish()
+
+    async def close(self) -> None:
+        """Arrête le pool et tue tous les workers inactifs."""
+        self._closed = True
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        while not self._idle.empty():
+            await self._idle.get_nowait().kill()
+
+    def _replenish(self) -> None:
+        """Lance de nouveaux workers jusqu'à couvrir la demande, dans la limite de max_size."""
+        if self._closed:
+            return
+        target = self.min_size + self._waiters
+        while self._idle.qsize() + self._spawning < target and self.size < self.max_size:
+            self._spawning += 1
+            self._spawn_background(self._spawn_worker())
+
+    async def _spawn_worker(self) -> None:
+        """Démarre un worker et l'ajoute aux workers inactifs."""
+        worker = OCamlWorker(self.command, self.max_output_bytes)
+        try:
+            await worker.start(self.start_timeout)
+        except Exception as e:
+            self._spawn_failures += 1
+            SANDBOX_FAILURES.inc(backend="pool")
+            logger.error("Impossible de démarrer un worker OCaml: %s", e)
+            await asyncio.sleep(min(2 ** min(self._spawn_failures, 5), 30))
+            self._spawning -= 1
+            self._replenish()
+            return
+        except BaseException:
+            self._spawning -= 1
+            raise
+
+        self._spawning -= 1
+        self._spawn_failures = 0
+        if self._closed:
+            await worker.kill()
+            return
+        self._idle.put_nowait(worker)
+
+    def _spawn_background(self, coro) -> None:
+        """Lance une coroutine en tâche de fond en gardant une référence."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _maintain(self) -> None:
+        """Vérifie périodiquement les workers inactifs et remplace ceux qui ne répondent plus."""
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+
+            healthy = []
+            while not self._idle.empty():
+                worker = self._idle.get_nowait()
+                self._busy += 1
+                if await worker.ping():
+                    healthy.append(worker)
+                else:
+                    logger.warning("Worker OCaml inactif défaillant, remplacement")
+                    self._recycled += 1
+                    await worker.kill()
+                self._busy -= 1
+
+            for worker in healthy:
+                self._idle.put_nowait(worker)
+            self._replenish()
@@ -1,104 +1,752 @@
-import tempfile
-import subprocess
+import re
+import asyncio
+import time
 import logging
-from typing import List, Tuple
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from src.services.evaluation_cache import EvaluationCache
+from src.services.evaluator import EvaluatorClient, EvaluatorError
+from src.services.ocaml_checker import OCamlTypeChecker
+from src.services.ocaml_compiler import CompilationError, OCamlCompiler
+from src.services.ocaml_pool import OCamlWorker, OCamlWorkerPool, unterminated_literal
+from src.services.ocaml_sessions import OCamlSessionManager
+from src.utils.metrics import CACHE_REQUESTS, EVALUATIONS_IN_FLIGHT, SANDBOX_FAILURES, STAGE_DURATION, TIMEOUTS
+from src.utils.process import communicate_capped, firejail_timeout, kill_process_tree
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class EvaluationResult:
+    """Résultat d'une évaluation OCaml."""
+
+    success: bool
+    output: str
+    timed_out: bool = False
+    internal_error: bool = False
+    duration: float = 0.0
+    cached: bool = False
+    truncated: bool = False
+    session_reset: bool = False
+
+    @property
+    def cacheable(self) -> bool:
+        """Indique si le résultat est déterministe et peut être mis en cache."""
+        return not self.timed_out and not self.internal_error
+
 class OCamlService:
     """Service pour l'évaluation de code OCaml."""
-    
-    @staticmethod
-    async def evaluate_code(code: str) -> Tuple[bool, str]:
+
+    BACKENDS = ("toplevel", "bytecode", "native")
+    PHRASE_FAILURE = re.compile(r"^(Error|Exception):", re.MULTILINE)
+
+    SANDBOX_ARGS = [
+        "firejail",
+        "--quiet",
+        "--noroot",
+        "--net=none",
+        "--private-tmp",
+        "--private-dev",
+        "--no3d",
+        "--nosound",
+        "--novideo",
+        "--nonewprivs",
+        "--seccomp",
+        "--caps.drop=all",
+        "--rlimit-cpu=10",
+        "--rlimit-as=134217728",
+        "--rlimit-nproc=10",
+    ]
+
+    def __init__(
+        self,
+        max_concurrent: int = 4,
+        timeout: float = 35,
+        pool_min_size: int = 0,
+        pool_max_size: int = 4,
+        pool_max_runs: int = 1,
+        cache: Optional[EvaluationCache] = None,
+        max_output_bytes: int = 256 * 1024,
+        artifact_dir: Optional[str] = None,
+        max_artifacts: int = 200,
+        typecheck: bool = False,
+        typecheck_cache_size: int = 1024,
+        evaluator: Optional[EvaluatorClient] = None,
+        session_max_live: int = 0,
+        session_max_sessions: int = 500,
+        session_idle_timeout: float = 600,
+        session_max_replay_bytes: int = 64 * 1024
+    ):
+        """
+        Initialise le service OCaml.
+
+        Args:
+            max_concurrent: Nombre maximal de sandboxes exécutées simultanément
+            timeout: Durée maximale (en secondes) d'une évaluation
+            pool_min_size: Nombre de toplevels gardés chauds (0 désactive le pool)
+            pool_max_size: Nombre maximal de toplevels dans le pool
+            pool_max_runs: Nombre d'exécutions avant recyclage d'un toplevel
+            cache: Cache des résultats d'évaluation (None le désactive)
+            max_output_bytes: Taille maximale conservée de stdout et de stderr ; la sandbox est tuée au-delà
+            artifact_dir: Répertoire des exécutables compilés (None désactive les backends compilés)
+            max_artifacts: Nombre maximal d'exécutables compilés conservés
+            typecheck: Active la vérification statique (syntaxe et typage, en sandbox) préalable à la compilation
+                des backends compilés ; sans effet si artifact_dir n'est pas défini
+            typecheck_cache_size: Nombre de résultats de vérification gardés en mémoire
+            evaluator: Client d'un service d'évaluation partagé ; les évaluations lui sont déléguées
+                et aucune sandbox n'est lancée dans ce processus
+            session_max_live: Nombre maximal de toplevels de session REPL vivants (0 désactive les sessions)
+            session_max_sessions: Nombre maximal de sessions REPL conservées
+            session_idle_timeout: Inactivité en secondes après laquelle le toplevel d'une session est arrêté
+            session_max_replay_bytes: Taille maximale du journal de rejeu d'une session
+        """
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._queued = 0
+        self._in_flight = 0
+        self._processes: Set[asyncio.subprocess.Process] = set()
+        self._cache = cache
+        self._checker: Optional[OCamlTypeChecker] = None
+        if typecheck and artifact_dir:
+            self._checker = OCamlTypeChecker(
+                artifact_dir,
+                self._sandbox_command,
+                cache_size=typecheck_cache_size
+            )
+        self._evaluator = evaluator
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._ocaml_version: Optional[str] = None
+
+        self._pool: Optional[OCamlWorkerPool] = None
+        if pool_min_size > 0:
+            self._pool = OCamlWorkerPool(
+                self._sandbox_command([], ["ocaml"]),
+                min_size=pool_min_size,
+                max_size=pool_max_size,
+                max_runs=pool_max_runs,
+                max_output_bytes=max_output_bytes
+            )
+
+        self._sessions: Optional[OCamlSessionManager] = None
+        if session_max_live > 0 and evaluator is None:
+            self._sessions = OCamlSessionManager(
+                self._sandbox_command([], ["ocaml"]),
+                max_live=session_max_live,
+                max_sessions=session_max_sessions,
+                idle_timeout=session_idle_timeout,
+                max_replay_bytes=session_max_replay_bytes,
+                timeout=timeout,
+                max_output_bytes=max_output_bytes
+            )
+
+        self._compiler: Optional[OCamlCompiler] = None
+        if artifact_dir:
+            self._compiler = OCamlCompiler(
+                artifact_dir,
+                self._sandbox_command,
+                timeout=timeout,
+                max_artifacts=max_artifacts,
+                max_output_bytes=max_output_bytes
+            )
+
+        logger.info("Service OCaml initialisé (%s sandboxes simultanées max)", max_concurrent)
+
+    def start(self) -> None:
+        """Démarre le pool de toplevels et les sessions REPL s'ils sont activés, ou récupère les backends du service d'évaluation."""
+        if self._pool is not None:
+            self._pool.start()
+        if self._sessions is not None:
+            self._sessions.start()
+        if self._evaluator is not None:
+            self._refresh_task = asyncio.ensure_future(self._refresh_evaluator())
+
+    @property
+    def queued(self) -> int:
+        """Nombre d'évaluations en attente d'une sandbox."""
+        return self._queued
+
+    @property
+    def in_flight(self) -> int:
+        """Nombre d'évaluations en cours d'exécution."""
+        return self._in_flight
+
+    @property
+    def sessions_enabled(self) -> bool:
+        """Indique si les sessions REPL par thread sont disponibles."""
+        return self._sessions is not None
+
+    def has_session(self, session_id: int) -> bool:
+        """Indique si une session REPL existe déjà pour cet identifiant."""
+        return self._sessions is not None and session_id in self._sessions
+
+    async def end_session(self, session_id: int) -> None:
+        """Oublie la session REPL d'un thread et arrête son toplevel."""
+        if self._sessions is not None:
+            await self._sessions.discard(session_id)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne l'état de la file d'évaluation.
+
+        Returns:
+            Dictionnaire avec les évaluations en attente, en cours et la capacité
+        """
+        stats = {
+            "queued": self._queued,
+            "in_flight": self._in_flight,
+            "max_concurrent": self.max_concurrent,
+        }
+        if self._pool is not None:
+            stats.update({f"pool_{key}": value for key, value in self._pool.get_stats().items()})
+        if self._sessions is not None:
+            stats.update({f"session_{key}": value for key, value in self._sessions.get_stats().items()})
+        if self._cache is not None:
+            stats.update({f"cache_{key}": value for key, value in self._cache.get_stats().items()})
+        if self._checker is not None:
+            stats.update({f"check_{key}": value for key, value in self._checker.get_stats().items()})
+        if self._compiler is not None:
+            stats.update({f"artifacts_{key}": value for key, value in self._compiler.get_stats().items()})
+        if self._evaluator is not None:
+            stats.update({f"evaluator_{key}": value for key, value in self._evaluator.get_stats().items()})
+        return stats
+
+    @property
+    def backends(self) -> List[str]:
+        """Backends d'évaluation disponibles."""
+        if self._evaluator is not None:
+            return list(self._evaluator.backends)
+        return list(self.BACKENDS) if self._compiler is not None else ["toplevel"]
+
+    async def get_ocaml_version(self) -> str:
+        """
+        Retourne la version du toplevel OCaml installé (mise en cache après le premier appel).
+
+        Returns:
+            Version d'OCaml, ou "unknown" si elle n'a pas pu être déterminée
+        """
+        if self._ocaml_version is None:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    "ocaml", "-vnum",
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL
+                )
+                stdout, _ = await asyncio.wait_for(process.communicate(), timeout=10)
+                self._ocaml_version = stdout.decode("utf-8", errors="replace").strip() or "unknown"
+            except Exception as e:
+                logger.warning("Impossible de déterminer la version d'OCaml: %s", e)
+                self._ocaml_version = "unknown"
+        return self._ocaml_version
+
+    async def evaluate_code(self, code: str, backend: str = "toplevel") -> EvaluationResult:
         """
         Évalue du code OCaml et retourne le résultat dans un environnement sandboxé avec firejail.
-        
+
+        L'appel attend qu'une sandbox se libère si la limite de concurrence est atteinte.
+        En cas d'annulation (interaction abandonnée, arrêt du bot), la sandbox est tuée.
+        Les résultats déterministes sont mis en cache et les soumissions identiques
+        concurrentes partagent une seule exécution.
+
         Args:
             code: Code OCaml à évaluer
-            
+            backend: "toplevel" (interprété), "bytecode" (ocamlc) ou "native" (ocamlopt)
+
         Returns:
-            Tuple (succès, résultat) où résultat contient soit la sortie soit l'erreur
+            Résultat de l'évaluation contenant soit la sortie soit l'erreur
+
+        Raises:
+            ValueError: Si le backend est inconnu ou indisponible
+        """
+        if self._evaluator is not None:
+            return await self._evaluate_remote(code, backend)
+
+        if backend not in self.backends:
+            raise ValueError(f"Backend d'évaluation indisponible: {backend}")
+
+        if self._cache is None:
+            return await self._evaluate_uncached(code, backend)
+
+        start = time.monotonic()
+        key = EvaluationCache.make_key(code, await self._backend_version(backend), self._sandbox_limits() + [backend])
+        value, cached = await self._cache.get_or_evaluate(
+            key,
+            lambda: self._evaluate_serialized(code, backend),
+            lambda value: EvaluationResult(**value).cacheable
+        )
+
+        result = EvaluationResult(**value)
+        CACHE_REQUESTS.inc(cache="evaluation", result="hit" if cached else "miss")
+        if cached:
+            result.cached = True
+            result.duration = time.monotonic() - start
+            logger.info("Résultat d'évaluation OCaml servi depuis le cache")
+        return result
+
+    async def evaluate_batch(self, items: List[Tuple[str, str]]) -> List[EvaluationResult]:
         """
-        import os
-        temp_file_path = None
-        
+        Évalue plusieurs codes en parallèle, dans la limite de concurrence du service.
+
+        Avec un service d'évaluation partagé, le lot est envoyé en une seule requête.
+
+        Args:
+            items: Couples (code, backend)
+
+        Returns:
+            Résultats dans l'ordre des codes
+
+        Raises:
+            ValueError: Si un backend est inconnu ou indisponible
+        """
+        if self._evaluator is not None:
+            start = time.monotonic()
+            try:
+                values = await self._evaluator.evaluate_batch(items)
+            except (ConnectionError, EvaluatorError, asyncio.TimeoutError) as e:
+                return [self._evaluator_failure(backend, e, start) for _, backend in items]
+            return [EvaluationResult(**value) for value in values]
+
+        for _, backend in items:
+            if backend not in self.backends:
+                raise ValueError(f"Backend d'évaluation indisponible: {backend}")
+        return list(await asyncio.gather(*(self.evaluate_code(code, backend) for code, backend in items)))
+
+    async def _evaluate_remote(self, code: str, backend: str) -> EvaluationResult:
+        """Délègue l'évaluation au service d'évaluation partagé."""
+        start = time.monotonic()
         try:
-            logger.info("Début de l'évaluation du code OCaml avec firejail")
-            
-            with tempfile.NamedTemporaryFile(suffix=".ml", delete=False, mode='w') as temp_file:
-                temp_file.write(code)
-                temp_file_path = temp_file.name
-            
-            firejail_args = [
-                "firejail",
-                "--quiet",
-                "--noroot",
-                "--net=none",
-                "--private-tmp",
-                "--private-dev",
-                "--no3d",
-                "--nosound",
-                "--novideo",
-                "--nonewprivs",
-                "--seccomp",
-                "--caps.drop=all",
-                f"--read-only={os.path.dirname(temp_file_path)}",
-                "--timeout=00:00:30",
-                "--rlimit-cpu=10",
-                "--rlimit-as=134217728",
-                "--rlimit-nproc=10",
-                "sh", "-c",
-                f"cat {temp_file_path} | ocaml"
-            ]
-            
-            process = subprocess.Popen(
-                firejail_args,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd="/tmp"
+            return EvaluationResult(**await self._evaluator.evaluate(code, backend))
+        except (ConnectionError, EvaluatorError, asyncio.TimeoutError) as e:
+            return self._evaluator_failure(backend, e, start)
+
+    def _evaluator_failure(self, backend: str, error: Exception, start: float) -> EvaluationResult:
+        """Construit le résultat d'une évaluation que le service d'évaluation n'a pas pu traiter."""
+        logger.error("Service d'évaluation indisponible: %s", error)
+        SANDBOX_FAILURES.inc(backend=backend)
+        return EvaluationResult(
+            False,
+            "Erreur: le service d'évaluation est indisponible",
+            internal_error=True,
+            duration=time.monotonic() - start
+        )
+
+    async def _refresh_evaluator(self) -> None:
+        """Récupère les backends proposés par le service d'évaluation."""
+        try:
+            info = await self._evaluator.refresh()
+            logger.info("Service d'évaluation joint (backends: %s)", ", ".join(info["backends"]))
+        except Exception as e:
+            logger.warning("Service d'évaluation injoignable au démarrage: %s", e)
+
+    async def _evaluate_serialized(self, code: str, backend: str) -> Dict[str, Any]:
+        """Évalue le code et retourne le résultat sous forme sérialisable pour le cache."""
+        return asdict(await self._evaluate_uncached(code, backend))
+
+    async def _backend_version(self, backend: str) -> str:
+        """Retourne la version de l'outil OCaml utilisé par un backend."""
+        if backend == "toplevel":
+            return await self.get_ocaml_version()
+        return await self._compiler.get_version(backend)
+
+    def _sandbox_limits(self) -> List[Any]:
+        """Retourne les paramètres de la sandbox influant sur le résultat d'une évaluation."""
+        return [self.SANDBOX_ARGS, self.timeout, self.max_output_bytes, self._checker is not None]
+
+    async def _evaluate_uncached(self, code: str, backend: str = "toplevel") -> EvaluationResult:
+        """
+        Évalue du code OCaml en attendant qu'une sandbox se libère.
+
+        Pour les backends compilés, le code mal formé ou mal typé est rejeté par la vérification statique
+        sans compilation. Le toplevel n'est pas vérifié : il signale lui-même les erreurs phrase par phrase,
+        après avoir affiché le résultat des phrases précédentes.
+
+        Args:
+            code: Code OCaml à évaluer
+            backend: Backend d'évaluation
+
+        Returns:
+            Résultat de l'évaluation
+        """
+        self._queued += 1
+        try:
+            with STAGE_DURATION.time(stage="sandbox_wait"):
+                await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        EVALUATIONS_IN_FLIGHT.inc()
+        start = time.monotonic()
+        try:
+            if backend != "toplevel" and self._checker is not None:
+                diagnostics = await self._checker.check(code)
+                if diagnostics is not None:
+                    return EvaluationResult(False, diagnostics, duration=time.monotonic() - start)
+            if backend != "toplevel":
+                result = await self._run_compiled(code, backend)
+            elif self._pool is not None:
+                result = await self._run_pooled(code)
+            else:
+                result = await self._run_sandbox(code)
+            result.duration = time.monotonic() - start
+            if result.timed_out:
+                TIMEOUTS.inc(component="sandbox")
+            if result.internal_error:
+                SANDBOX_FAILURES.inc(backend=backend)
+            return result
+        finally:
+            self._in_flight -= 1
+            EVALUATIONS_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+    async def evaluate_in_session(self, session_id: int, code: str, seed: Optional[str] = None) -> EvaluationResult:
+        """
+        Évalue du code dans la session REPL persistante d'un thread.
+
+        Les définitions des évaluations précédentes de la session restent visibles ; seul le nouveau code
+        est exécuté. Le résultat n'est pas mis en cache puisqu'il dépend de l'état de la session.
+
+        Args:
+            session_id: Identifiant de la session (identifiant du thread)
+            code: Code OCaml à évaluer
+            seed: Code évalué à la création de la session (ignoré si elle existe déjà)
+
+        Returns:
+            Résultat de l'évaluation ; session_reset indique que l'état précédent a été perdu
+        """
+        if self._sessions is None:
+            raise RuntimeError("Les sessions REPL ne sont pas activées")
+
+        self._queued += 1
+        try:
+            with STAGE_DURATION.time(stage="sandbox_wait"):
+                await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        EVALUATIONS_IN_FLIGHT.inc()
+        start = time.monotonic()
+        try:
+            try:
+                async with self._sessions.session(session_id, seed) as session:
+                    result = await self._run_in_worker(session.worker, code, "de session")
+                    if self._replayable(result) and session.live:
+                        session.record(code, self._sessions.max_replay_bytes)
+                    result.session_reset = session.lost
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error_msg = f"Erreur lors du démarrage de la session OCaml: {str(e)}"
+                logger.error(error_msg)
+                result = EvaluationResult(False, error_msg, internal_error=True)
+            result.duration = time.monotonic() - start
+            if result.timed_out:
+                TIMEOUTS.inc(component="sandbox")
+            if result.internal_error:
+                SANDBOX_FAILURES.inc(backend="session")
+            return result
+        finally:
+            self._in_flight -= 1
+            EVALUATIONS_IN_FLIGHT.dec()
+            self._semaphore.release()
+
+    def _replayable(self, result: EvaluationResult) -> bool:
+        """
+        Indique si du code évalué en session peut être ajouté au journal de rejeu.
+
+        Le code refusé par le typeur ou ayant levé une exception n'est pas journalisé : le rejouer
+        reproduirait l'erreur, ou des effets de bord partiels, à chaque restauration de la session.
+        """
+        if not result.success or result.timed_out or result.truncated or result.internal_error:
+            return False
+        return self.PHRASE_FAILURE.search(result.output) is None
+
+    async def close(self) -> None:
+        """Tue toutes les sandboxes encore actives et ferme la connexion au service d'évaluation."""
+        if self._evaluator is not None:
+            await self._evaluator.close()
+        if self._pool is not None:
+            await self._pool.close()
+        if self._sessions is not None:
+            await self._sessions.close()
+        if self._cache is not None:
+            self._cache.close()
+        if self._compiler is not None:
+            await self._compiler.close()
+        for process in list(self._processes):
+            await kill_process_tree(process)
+
+    def _sandbox_command(self, extra_args: List[str], command: List[str]) -> List[str]:
+        """
+        Construit la commande firejail complète.
+
+        Args:
+            extra_args: Options firejail spécifiques à l'appel
+            command: Commande à exécuter dans la sandbox
+
+        Returns:
+            Liste des arguments du processus
+        """
+        return self.SANDBOX_ARGS + extra_args + command
+
+    async def _run_pooled(self, code: str) -> EvaluationResult:
+        """
+        Évalue le code dans un toplevel pré-lancé du pool.
+
+        Se rabat sur une sandbox à froid si aucun toplevel n'est disponible à temps.
+
+        Args:
+            code: Code OCaml à évaluer
+
+        Returns:
+            Résultat de l'évaluation
+        """
+        try:
+            with STAGE_DURATION.time(stage="pool_acquire"):
+                worker = await asyncio.wait_for(self._pool.acquire(), timeout=self._pool.start_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Aucun toplevel disponible dans le pool, lancement à froid")
+            return await self._run_sandbox(code)
+
+        try:
+            return await self._run_in_worker(worker, code, "du pool")
+        finally:
+            self._pool.release(worker)
+
+    async def _run_in_worker(self, worker: OCamlWorker, code: str, origin: str) -> EvaluationResult:
+        """
+        Évalue le code dans un toplevel déjà lancé.
+
+        Args:
+            worker: Toplevel réservé
+            code: Code OCaml à évaluer
+            origin: Provenance du toplevel pour les logs ("du pool", "de session")
+
+        Returns:
+            Résultat de l'évaluation
+        """
+        unterminated = unterminated_literal(code)
+        if unterminated is not None:
+            return EvaluationResult(False, unterminated)
+
+        try:
+            logger.info("Début de l'évaluation du code OCaml dans un toplevel %s", origin)
+            try:
+                with STAGE_DURATION.time(stage="execution"):
+                    stdout, exited = await worker.run(code, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Timeout lors de l'évaluation OCaml")
+                return EvaluationResult(False, "Erreur: Timeout - l'exécution a pris trop de temps", timed_out=True)
+
+            if worker.truncated:
+                logger.warning("Sortie OCaml tronquée à %s octets, toplevel tué", self.max_output_bytes)
+                return EvaluationResult(True, self._parse_toplevel_output(stdout, has_banner=False), truncated=True)
+
+            if exited and worker.process.returncode != 0:
+                stderr = worker.stderr.strip()
+                error_msg = stderr if stderr else "Erreur inconnue lors de l'exécution"
+                logger.warning("Erreur firejail/OCaml (code %s): %s", worker.process.returncode, error_msg)
+                return EvaluationResult(False, error_msg)
+
+            result = self._parse_toplevel_output(stdout, has_banner=False)
+            if not result:
+                return EvaluationResult(False, "Aucune sortie générée par le code OCaml")
+
+            logger.info("Évaluation OCaml réussie dans un toplevel %s", origin)
+            return EvaluationResult(True, result)
+
+        except asyncio.CancelledError:
+            logger.warning("Évaluation OCaml annulée, toplevel tué")
+            raise
+        except Exception as e:
+            error_msg = f"Erreur lors de l'évaluation OCaml: {str(e)}"
+            logger.error(error_msg)
+            return EvaluationResult(False, error_msg, internal_error=True)
+
+    async def _run_compiled(self, code: str, backend: str) -> EvaluationResult:
+        """
+        Compile le code (ou réutilise l'exécutable en cache) puis l'exécute dans une sandbox.
+
+        Args:
+            code: Code OCaml à compiler
+            backend: "bytecode" ou "native"
+
+        Returns:
+            Résultat de l'exécution, ou diagnostics du compilateur
+        """
+        try:
+            executable = await self._compiler.build(code, backend)
+        except CompilationError as e:
+            logger.info("Compilation %s échouée", backend)
+            return EvaluationResult(False, str(e))
+        except asyncio.TimeoutError:
+            logger.warning("Timeout lors de la compilation OCaml")
+            return EvaluationResult(False, "Erreur: Timeout - la compilation a pris trop de temps", timed_out=True)
+        except FileNotFoundError:
+            error_msg = "Erreur: firejail n'est pas installé sur le système"
+            logger.error(error_msg)
+            return EvaluationResult(False, error_msg, internal_error=True)
+        except Exception as e:
+            error_msg = f"Erreur lors de la compilation OCaml: {str(e)}"
+            logger.error(error_msg)
+            return EvaluationResult(False, error_msg, internal_error=True)
+
+        # Le répertoire des exécutables est en lecture seule dans la sandbox : un programme ne doit pas
+        # pouvoir remplacer l'exécutable en cache servi aux utilisateurs suivants.
+        try:
+            return await self._run_process(
+                [executable], b"", lambda stdout: stdout.strip(),
+                extra_args=[f"--read-only={self._compiler.artifact_dir}"]
             )
-            
+        finally:
+            self._compiler.release(executable)
+
+    async def _run_sandbox(self, code: str) -> EvaluationResult:
+        """
+        Lance une sandbox firejail pour cette seule évaluation.
+
+        Le toplevel suit le même protocole que ceux du pool : le code arrive sur le canal de contrôle
+        et l'entrée standard du code utilisateur est /dev/null, si bien qu'un programme lisant stdin
+        se comporte de la même façon à froid et à chaud.
+
+        Args:
+            code: Code OCaml à évaluer
+
+        Returns:
+            Résultat de l'évaluation
+        """
+        worker = OCamlWorker(
+            self._sandbox_command([firejail_timeout(self.timeout)], ["ocaml"]),
+            max_output_bytes=self.max_output_bytes
+        )
+        try:
+            logger.info("Début de l'évaluation du code OCaml avec firejail")
+            try:
+                await worker.start(timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Timeout lors du démarrage de la sandbox OCaml")
+                return EvaluationResult(False, "Erreur: Timeout - l'exécution a pris trop de temps", timed_out=True)
+            except FileNotFoundError:
+                error_msg = "Erreur: firejail n'est pas installé sur le système"
+                logger.error(error_msg)
+                return EvaluationResult(False, error_msg, internal_error=True)
+            except Exception as e:
+                error_msg = f"Erreur lors du démarrage de la sandbox OCaml: {str(e)}"
+                logger.error(error_msg)
+                return EvaluationResult(False, error_msg, internal_error=True)
+            self._processes.add(worker.process)
+            return await self._run_in_worker(worker, code, "à froid")
+        finally:
+            await worker.kill()
+            self._processes.discard(worker.process)
+
+    async def _run_process(
+        self,
+        command: List[str],
+        stdin: bytes,
+        parse: Callable[[str], str],
+        extra_args: Optional[List[str]] = None
+    ) -> EvaluationResult:
+        """
+        Exécute une commande dans une sandbox firejail et attend sa fin.
+
+        Args:
+            command: Commande à exécuter dans la sandbox
+            stdin: Données envoyées sur l'entrée standard
+            parse: Fonction extrayant le résultat de la sortie standard
+            extra_args: Options firejail supplémentaires
+
+        Returns:
+            Résultat de l'évaluation
+        """
+        process = None
+
+        try:
+            logger.info("Début de l'évaluation du code OCaml avec firejail")
+
+            firejail_args = self._sandbox_command([firejail_timeout(self.timeout)] + (extra_args or []), command)
+
+            with STAGE_DURATION.time(stage="sandbox_spawn"):
+                process = await asyncio.create_subprocess_exec(
+                    *firejail_args,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd="/tmp",
+                    start_new_session=True
+                )
+            self._processes.add(process)
+
             try:
-                stdout, stderr = process.communicate(timeout=35)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                process.communicate()
+                with STAGE_DURATION.time(stage="execution"):
+                    stdout_bytes, stderr_bytes, truncated = await asyncio.wait_for(
+                        communicate_capped(process, self.max_output_bytes, input=stdin),
+                        timeout=self.timeout
+                    )
+            except asyncio.TimeoutError:
+                await kill_process_tree(process)
                 logger.warning("Timeout lors de l'évaluation OCaml")
-                return False, "Erreur: Timeout - l'exécution a pris trop de temps"
-            
+                return EvaluationResult(False, "Erreur: Timeout - l'exécution a pris trop de temps", timed_out=True)
+
+            stdout = stdout_bytes.decode("utf-8", errors="replace")
+            stderr = stderr_bytes.decode("utf-8", errors="replace")
+
+            if truncated:
+                logger.warning("Sortie OCaml tronquée à %s octets, sandbox tuée", self.max_output_bytes)
+                if not stdout.strip():
+                    return EvaluationResult(False, stderr.strip(), truncated=True)
+                return EvaluationResult(True, parse(stdout), truncated=True)
+
             if process.returncode != 0:
                 error_msg = stderr.strip() if stderr.strip() else "Erreur inconnue lors de l'exécution"
-                logger.warning(f"Erreur firejail/OCaml (code {process.returncode}): {error_msg}")
-                return False, error_msg
-            
+                logger.warning("Erreur firejail/OCaml (code %s): %s", process.returncode, error_msg)
+                return EvaluationResult(False, error_msg)
+
             if stderr and not stderr.startswith("Reading configuration from"):
                 if "firejail" not in stderr.lower():
-                    logger.warning(f"Avertissement OCaml: {stderr}")
-            
+                    logger.warning("Avertissement OCaml: %s", stderr)
+
             if not stdout.strip():
-                return False, "Aucune sortie générée par le code OCaml"
-            
-            executions = stdout.split("# ")
-            executions = [exec.strip() for exec in executions if exec.strip()]
-            executions = executions[1:] if len(executions) > 1 else executions
-            
-            result = "\n\n".join(executions) if executions else stdout.strip()
+                return EvaluationResult(False, "Aucune sortie générée par le code OCaml")
+
+            result = parse(stdout)
             logger.info("Évaluation OCaml réussie avec firejail")
-            return True, result
-                    
+            return EvaluationResult(True, result)
+
+        except asyncio.CancelledError:
+            if process is not None:
+                await kill_process_tree(process)
+            logger.warning("Évaluation OCaml annulée, sandbox tuée")
+            raise
         except FileNotFoundError:
             error_msg = "Erreur: firejail n'est pas installé sur le système"
             logger.error(error_msg)
-            return False, error_msg
+            return EvaluationResult(False, error_msg, internal_error=True)
         except Exception as e:
             error_msg = f"Erreur lors de l'évaluation OCaml: {str(e)}"
             logger.error(error_msg)
-            return False, error_msg
-        
+            return EvaluationResult(False, error_msg, internal_error=True)
+
         finally:
-            if temp_file_path:
-                try:
-                    os.unlink(temp_file_path)
-                except:
-                    pass
\ No newline at end of file
+            if process is not None:
+                self._processes.discard(process)
+
+    @staticmethod
+    def _parse_toplevel_output(stdout: str, has_banner: bool = True) -> str:
+        """
+        Extrait les résultats de chaque phrase de la sortie du toplevel.
+
+        Args:
+            stdout: Sortie brute du toplevel OCaml
+            has_banner: Indique si la sortie commence par la bannière du toplevel
+
+        Returns:
+            Résultats des phrases séparés par une ligne vide
+        """
+        executions: List[str] = stdout.split("# ")
+        executions = [exec.strip() for exec in executions if exec.strip()]
+        if has_banner:
+            executions = executions[1:] if len(executions) > 1 else executions
+
+        return "\n\n".join(executions) if executions else stdout.strip()
@@ -0,0 +1,302 @@
+import asyncio
+import time
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set
+from src.services.ocaml_pool import OCamlWorker
+
+logger = logging.getLogger(__name__)
+
+class OCamlSession:
+    """Session REPL d'un thread : toplevel dédié et journal des phrases déjà évaluées."""
+
+    def __init__(self, session_id: int, seed: Optional[str] = None):
+        """
+        Initialise une session sans lancer de toplevel.
+
+        Args:
+            session_id: Identifiant de la session (identifiant du thread)
+            seed: Code évalué à l'ouverture de la session (définitions de l'évaluation d'origine)
+        """
+        self.session_id = session_id
+        self.worker: Optional[OCamlWorker] = None
+        self.phrases: List[str] = [seed] if seed else []
+        self.replay_bytes = len(seed.encode("utf-8")) if seed else 0
+        self.replayable = True
+        self.lost = False
+        self.last_used = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    @property
+    def live(self) -> bool:
+        """Indique si le toplevel de la session est en vie."""
+        return self.worker is not None and self.worker.alive
+
+    def record(self, code: str, max_replay_bytes: int) -> None:
+        """
+        Ajoute du code évalué au journal de rejeu.
+
+        Au-delà de max_replay_bytes, le journal est abandonné : l'état ne vit plus que dans le toplevel
+        et sera perdu si celui-ci est arrêté.
+
+        Args:
+            code: Code évalué avec succès
+            max_replay_bytes: Taille maximale du journal
+        """
+        if not self.replayable:
+            return
+        self.phrases.append(code)
+        self.replay_bytes += len(code.encode("utf-8"))
+        if self.replay_bytes > max_replay_bytes:
+            logger.info("Journal de la session %s trop volumineux, rejeu désactivé", self.session_id)
+            self.phrases.clear()
+            self.replay_bytes = 0
+            self.replayable = False
+
+class OCamlSessionManager:
+    """
+    Sessions REPL persistantes, une par thread de discussion.
+
+    Chaque session garde un toplevel sandboxé vivant entre deux messages, de sorte que seul le nouveau
+    code est évalué. Les toplevels inactifs depuis idle_timeout, ou les moins récemment utilisés au-delà
+    de max_live, sont arrêtés ; leur état est reconstruit au besoin en rejouant le journal de la session.
+    Quand les max_live toplevels sont tous occupés, une session à restaurer attend qu'un d'eux se libère :
+    la mémoire totale est ainsi bornée par max_live fois la limite mémoire de la sandbox.
+    """
+
+    def __init__(
+        self,
+        command: List[str],
+        max_live: int = 8,
+        max_sessions: int = 500,
+        idle_timeout: float = 600,
+        max_replay_bytes: int = 64 * 1024,
+        timeout: float = 35,
+        start_timeout: float = 10,
+        max_output_bytes: int = 256 * 1024
+    ):
+        """
+        Initialise le gestionnaire sans lancer de toplevel.
+
+        Args:
+            command: Commande complète (firejail + ocaml) d'un toplevel
+            max_live: Nombre maximal de toplevels de session vivants
+            max_sessions: Nombre maximal de sessions conservées (journaux compris)
+            idle_timeout: Inactivité en secondes après laquelle le toplevel d'une session est arrêté
+            max_replay_bytes: Taille maximale du journal de rejeu d'une session
+            timeout: Durée maximale du rejeu d'une phrase
+            start_timeout: Durée maximale du démarrage d'un toplevel
+            max_output_bytes: Taille maximale de la sortie d'une exécution
+        """
+        self.command = command
+        self.max_live = max(max_live, 1)
+        self.max_sessions = max(max_sessions, 1)
+        self.idle_timeout = idle_timeout
+        self.max_replay_bytes = max_replay_bytes
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.max_output_bytes = max_output_bytes
+
+        self._sessions: "OrderedDict[int, OCamlSession]" = OrderedDict()
+        self._room = asyncio.Condition()
+        self._starting: Set[int] = set()
+        self._evicted = 0
+        self._replays = 0
+        self._tasks = set()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __contains__(self, session_id: int) -> bool:
+        return session_id in self._sessions
+
+    @property
+    def live(self) -> int:
+        """Nombre de toplevels de session vivants."""
+        return sum(1 for session in self._sessions.values() if session.live)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne l'état des sessions.
+
+        Returns:
+            Dictionnaire du nombre de sessions, de toplevels vivants, d'arrêts et de rejeux
+        """
+        return {
+            "sessions": len(self._sessions),
+            "live": self.live,
+            "evicted": self._evicted,
+            "replays": self._replays,
+        }
+
+    def start(self) -> None:
+        """Lance la boucle d'arrêt des toplevels inactifs."""
+        if self._sweep_task is None:
+            self._sweep_task = asyncio.ensure_future(self._sweep())
+
+    @asynccontextmanager
+    async def session(self, session_id: int, seed: Optional[str] = None) -> AsyncIterator[OCamlSession]:
+        """
+        Réserve la session d'un thread avec un toplevel prêt, en la créant ou en la restaurant si besoin.
+
+        Les évaluations d'une même session sont exécutées l'une après l'autre. Si max_live toplevels
+        sont déjà occupés, la restauration attend que l'un d'eux puisse être arrêté.
+
+        Args:
+            session_id: Identifiant de la session (identifiant du thread)
+            seed: Code à évaluer à la création de la session
+
+        Yields:
+            Session dont le worker est vivant
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = OCamlSession(session_id, seed)
+            self._prune()
+        self._sessions.move_to_end(session_id)
+
+        try:
+            async with session.lock:
+                session.lost = False
+                if not session.live:
+                    await self._make_room(session)
+                    try:
+                        await self._restore(session)
+                    finally:
+                        self._starting.discard(session_id)
+                try:
+                    yield session
+                finally:
+                    session.last_used = time.monotonic()
+        finally:
+            await self._notify_room()
+
+    async def discard(self, session_id: int) -> None:
+        """
+        Oublie une session et arrête son toplevel, une fois l'évaluation en cours terminée.
+
+        Args:
+            session_id: Identifiant de la session (identifiant du thread)
+        """
+        session = self._sessions.pop(session_id, None)
+        if session is None:
+            return
+        async with session.lock:
+            if session.worker is not None:
+                await session.worker.kill()
+        await self._notify_room()
+
+    async def close(self) -> None:
+        """Arrête tous les toplevels de session."""
+        self._closed = True
+        if self._sweep_task is not None:
+            self._sweep_task.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        for session in self._sessions.values():
+            if session.worker is not None:
+                await session.worker.kill()
+
+    async def _restore(self, session: OCamlSession) -> None:
+        """
+        Lance le toplevel d'une session et rejoue son journal (sortie ignorée).
+
+        Args:
+            session: Session à restaurer
+        """
+        had_state = session.worker is not None
+        await self._start_worker(session)
+
+        session.lost = had_state and not session.replayable
+        session.replayable = True
+        if not session.phrases:
+            return
+
+        self._replays += 1
+        logger.info("Rejeu de %s phrase(s) dans la session %s", len(session.phrases), session.session_id)
+        for phrase in session.phrases:
+            try:
+                await session.worker.run(phrase, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                break
+            if not session.worker.alive:
+                break
+
+        if not session.worker.alive:
+            logger.warning("Rejeu de la session %s interrompu, la session repart de zéro", session.session_id)
+            session.phrases.clear()
+            session.replay_bytes = 0
+            session.lost = True
+            await self._start_worker(session)
+
+    async def _start_worker(self, session: OCamlSession) -> None:
+        """Lance un nouveau toplevel pour une session."""
+        session.worker = OCamlWorker(self.command, self.max_output_bytes)
+        await session.worker.start(self.start_timeout)
+
+    async def _make_room(self, session: OCamlSession) -> None:
+        """
+        Réserve une place de toplevel pour une session, en arrêtant les moins récemment utilisés
+        pour rester sous max_live.
+
+        Les toplevels en cours d'évaluation ne peuvent pas être arrêtés : s'ils occupent toutes les places,
+        attend qu'une évaluation se termine. L'appelant retire la session de _starting une fois
+        son toplevel lancé.
+
+        Args:
+            session: Session dont le toplevel va être lancé
+        """
+        async with self._room:
+            while self._occupied() >= self.max_live:
+                candidate = next(
+                    (other for other in self._sessions.values() if other.live and not other.lock.locked()),
+                    None
+                )
+                if candidate is None:
+                    await self._room.wait()
+                else:
+                    await self._evict(candidate, "limite de sessions actives")
+            self._starting.add(session.session_id)
+
+    def _occupied(self) -> int:
+        """Nombre de places de toplevel prises, par des toplevels vivants ou en cours de lancement."""
+        return sum(
+            1 for session_id, session in self._sessions.items() if session.live or session_id in self._starting
+        )
+
+    async def _notify_room(self) -> None:
+        """Réveille les restaurations en attente d'une place de toplevel."""
+        async with self._room:
+            self._room.notify_all()
+
+    def _prune(self) -> None:
+        """Oublie les sessions les plus anciennes au-delà de max_sessions."""
+        while len(self._sessions) > self.max_sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.lock.locked():
+                return
+            del self._sessions[session_id]
+            if session.worker is not None:
+                self._spawn_background(session.worker.kill())
+
+    async def _evict(self, session: OCamlSession, reason: str) -> None:
+        """Arrête le toplevel d'une session en gardant son journal."""
+        logger.info("Toplevel de la session %s arrêté (%s)", session.session_id, reason)
+        self._evicted += 1
+        await session.worker.kill()
+
+    def _spawn_background(self, coro) -> None:
+        """Lance une coroutine en tâche de fond en gardant une référence."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _sweep(self) -> None:
+        """Arrête périodiquement les toplevels inactifs depuis plus de idle_timeout."""
+        interval = max(1.0, min(60.0, self.idle_timeout / 4))
+        while not self._closed:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            for session in list(self._sessions.values()):
+                if session.live and not session.lock.locked() and now - session.last_used > self.idle_timeout:
+                    await self._evict(session, "inactivité")
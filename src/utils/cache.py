@@ -0,0 +1,237 @@
+import asyncio
+import json
+import sqlite3
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """Cache mémoire LRU avec expiration optionnelle des entrées."""
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None):
+        """
+        Initialise le cache.
+
+        Args:
+            max_size: Nombre maximal d'entrées conservées
+            ttl: Durée de vie d'une entrée en secondes (None = pas d'expiration)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Récupère une entrée et la marque comme récemment utilisée.
+
+        Args:
+            key: Clé de l'entrée
+
+        Returns:
+            Valeur associée ou None si absente ou expirée
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        stored_at, value = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Ajoute ou remplace une entrée, en évinçant la moins récemment utilisée si besoin.
+
+        Args:
+            key: Clé de l'entrée
+            value: Valeur à conserver
+        """
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """
+        Retire une entrée du cache.
+
+        Args:
+            key: Clé de l'entrée
+
+        Returns:
+            Valeur retirée ou None si absente
+        """
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        """Vide le cache."""
+        self._entries.clear()
+
+class SQLiteCache:
+    """Cache persistant clé/valeur JSON stocké dans SQLite, accédé hors de la boucle d'événements."""
+
+    def __init__(self, path: str, max_entries: int = 100000, ttl: Optional[float] = None):
+        """
+        Initialise le cache persistant.
+
+        Args:
+            path: Chemin du fichier SQLite
+            max_entries: Nombre maximal d'entrées conservées sur disque
+            ttl: Durée de vie d'une entrée en secondes (None = pas d'expiration)
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = asyncio.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        self._connection.commit()
+
+    async def get(self, key: str) -> Optional[Any]:
+        """
+        Récupère une entrée.
+
+        Args:
+            key: Clé de l'entrée
+
+        Returns:
+            Valeur désérialisée ou None si absente ou expirée
+        """
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(None, self._get, key)
+
+    async def set(self, key: str, value: Any) -> None:
+        """
+        Ajoute ou remplace une entrée.
+
+        Args:
+            key: Clé de l'entrée
+            value: Valeur sérialisable en JSON
+        """
+        async with self._lock:
+            await asyncio.get_running_loop().run_in_executor(None, self._set, key, json.dumps(value))
+
+    async def items(self) -> List[Tuple[str, Any]]:
+        """
+        Liste les entrées non expirées, des plus récemment utilisées aux plus anciennes.
+
+        Returns:
+            Liste de couples (clé, valeur)
+        """
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(None, self._items)
+
+    def close(self) -> None:
+        """Ferme la connexion SQLite."""
+        self._connection.close()
+
+    def _get(self, key: str) -> Optional[Any]:
+        row = self._connection.execute(
+            "SELECT value, stored_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, stored_at = row
+        now = time.time()
+        if self.ttl is not None and now - stored_at > self.ttl:
+            self._connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._connection.commit()
+            return None
+
+        self._connection.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._connection.commit()
+        return json.loads(value)
+
+    def _set(self, key: str, value: str) -> None:
+        now = time.time()
+        self._connection.execute(
+            "INSERT OR REPLACE INTO cache (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now, now)
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._evict(now)
+        self._connection.commit()
+
+    def _items(self) -> List[Tuple[str, Any]]:
+        rows = self._connection.execute(
+            "SELECT key, value, stored_at FROM cache ORDER BY accessed_at DESC"
+        ).fetchall()
+        now = time.time()
+        return [
+            (key, json.loads(value)) for key, value, stored_at in rows
+            if self.ttl is None or now - stored_at <= self.ttl
+        ]
+
+    def _evict(self, now: float) -> None:
+        if self.ttl is not None:
+            self._connection.execute("DELETE FROM cache WHERE stored_at < ?", (now - self.ttl,))
+        self._connection.execute(
+            "DELETE FROM cache WHERE key NOT IN "
+            "(SELECT key FROM cache ORDER BY accessed_at DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+
+class SingleFlight:
+    """Regroupe les appels concurrents portant sur la même clé en une seule exécution."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, List[Any]] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Nombre d'exécutions partagées en cours."""
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Exécute factory() pour la clé, ou attend l'exécution déjà en cours pour cette clé.
+
+        L'exécution partagée n'est annulée que si tous les appelants sont annulés.
+
+        Args:
+            key: Clé identifiant l'exécution
+            factory: Fonction créant la coroutine à exécuter
+
+        Returns:
+            Tuple (résultat, partagé) où partagé indique qu'une exécution existante a été réutilisée
+        """
+        entry = self._calls.get(key)
+        shared = entry is not None
+        if entry is None:
+            task = asyncio.ensure_future(factory())
+            entry = [task, 0]
+            self._calls[key] = entry
+            task.add_done_callback(lambda _: self._forget(key, entry))
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0]), shared
+        except asyncio.CancelledError:
+            if entry[1] == 1 and not entry[0].done():
+                entry[0].cancel()
+            raise
+        finally:
+            entry[1] -= 1
+
+    def _forget(self, key: Hashable, entry: List[Any]) -> None:
+        if self._calls.get(key) is entry:
+            del self._calls[key]
@@ -0,0 +1,16 @@
+import re
+from typing import List
+
+OCAML_BLOCK = re.compile(r"```(?:ocaml|ml)[ \t]*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+
+def extract_ocaml_blocks(text: str) -> List[str]:
+    """
+    Extrait le code des blocs Markdown ```ocaml (ou ```ml) d'un message.
+    
+    Args:
+        text: Contenu du message
+        
+    Returns:
+        Code de chaque bloc non vide, dans l'ordre du message
+    """
+    return [block.strip("\n") for block in OCAML_BLOCK.findall(text) if block.strip()]
@@ -0,0 +1,283 @@
+import asyncio
+import io
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, List, NamedTuple, Optional, TypeVar
+import nextcord
+from src.config.messages import Messages
+from src.utils.metrics import STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+FENCE = "```"
+CLOSING_FENCE = "\n" + FENCE
+
+class _Segment(NamedTuple):
+    """Morceau de texte (une ligne ou une partie de ligne trop longue) avec l'état des blocs de code."""
+    text: str
+    fence_before: Optional[str]
+    fence_after: Optional[str]
+    breakable: bool
+
+def open_fence(text: str) -> Optional[str]:
+    """
+    Retourne la ligne d'ouverture du bloc de code resté ouvert à la fin du texte.
+
+    Args:
+        text: Texte Markdown
+
+    Returns:
+        Ligne d'ouverture (ex: "```ocaml") ou None si tous les blocs sont fermés
+    """
+    fence = None
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if stripped.startswith(FENCE):
+            fence = None if fence else stripped
+    return fence
+
+def split_point(text: str, max_length: int) -> int:
+    """
+    Choisit où couper un texte trop long : fin de paragraphe, sinon fin de ligne, sinon espace, sinon coupure nette.
+
+    Args:
+        text: Texte à couper
+        max_length: Position maximale de la coupure
+
+    Returns:
+        Indice de coupure
+    """
+    for separator in ("\n\n", "\n", " "):
+        cut = text.rfind(separator, max_length // 2, max_length)
+        if cut != -1:
+            return cut + len(separator)
+    return max_length
+
+def split_markdown(text: str, max_length: int = 2000) -> List[str]:
+    """
+    Découpe un texte Markdown en morceaux respectant la taille maximale.
+
+    Les coupures se font de préférence entre paragraphes ou autour des blocs de code ;
+    un bloc coupé est refermé à la fin d'un morceau et rouvert au début du suivant.
+
+    Args:
+        text: Texte à découper
+        max_length: Taille maximale d'un morceau
+
+    Returns:
+        Liste des morceaux non vides
+    """
+    if len(text) <= max_length:
+        return [text] if text.strip() else []
+
+    segments = _segments(text, max_length // 2)
+    chunks = []
+    start = 0
+    while start < len(segments):
+        opening = segments[start].fence_before
+        length = len(opening) + 1 if opening else 0
+        end = start
+        best_break = None
+        while end < len(segments):
+            segment = segments[end]
+            closing = len(CLOSING_FENCE) if segment.fence_after else 0
+            if end > start and length + len(segment.text) + closing > max_length:
+                break
+            length += len(segment.text)
+            end += 1
+            if segment.breakable and length >= max_length // 2:
+                best_break = end
+
+        if end < len(segments) and best_break is not None:
+            end = best_break
+
+        body = "".join(segment.text for segment in segments[start:end]).rstrip("\n")
+        if opening:
+            body = f"{opening}\n{body}"
+        else:
+            body = body.lstrip("\n")
+        if segments[end - 1].fence_after:
+            body += CLOSING_FENCE
+        if body.strip():
+            chunks.append(body)
+        start = end
+    return chunks
+
+def _segments(text: str, max_piece: int) -> List[_Segment]:
+    """Découpe le texte en lignes (les lignes trop longues en plusieurs morceaux) annotées de l'état des blocs de code."""
+    segments = []
+    fence = None
+    lines = text.split("\n")
+    for index, line in enumerate(lines):
+        before = fence
+        stripped = line.strip()
+        is_fence = stripped.startswith(FENCE)
+        if is_fence:
+            fence = None if fence else stripped
+        newline = "\n" if index < len(lines) - 1 else ""
+        breakable = fence is None and (not stripped or is_fence)
+
+        pieces = _wrap(line, max_piece)
+        for position, piece in enumerate(pieces):
+            last = position == len(pieces) - 1
+            segments.append(_Segment(
+                piece + (newline if last else ""),
+                before if position == 0 else fence,
+                fence if last else before,
+                breakable and last
+            ))
+    return segments
+
+def _wrap(line: str, max_piece: int) -> List[str]:
+    """Coupe une ligne trop longue en morceaux, de préférence sur des espaces."""
+    pieces = []
+    while len(line) > max_piece:
+        cut = split_point(line, max_piece)
+        pieces.append(line[:cut])
+        line = line[cut:]
+    pieces.append(line)
+    return pieces
+
+class OutboundQueue:
+    """
+    File d'envoi d'un salon Discord : les appels sont exécutés un par un, dans l'ordre,
+    sans dépasser un nombre d'appels par fenêtre de temps.
+
+    Les réponses 429 éventuelles restent gérées par nextcord ; la file évite surtout de les provoquer.
+    """
+
+    def __init__(self, rate: int = 5, per: float = 5.0):
+        """
+        Initialise la file.
+
+        Args:
+            rate: Nombre maximal d'appels par fenêtre
+            per: Durée de la fenêtre en secondes
+        """
+        self.rate = rate
+        self.per = per
+        self.pending = 0
+        self._lock = asyncio.Lock()
+        self._sent: Deque[float] = deque()
+
+    @property
+    def idle(self) -> bool:
+        """Indique si aucun appel n'est en attente."""
+        return self.pending == 0
+
+    async def submit(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Exécute un appel à l'API Discord à son tour.
+
+        Args:
+            call: Fonction lançant l'appel (envoi, édition...)
+
+        Returns:
+            Résultat de l'appel
+        """
+        self.pending += 1
+        try:
+            async with self._lock:
+                await self._throttle()
+                try:
+                    with STAGE_DURATION.time(stage="discord_send"):
+                        return await call()
+                finally:
+                    self._sent.append(time.monotonic())
+        finally:
+            self.pending -= 1
+
+    async def _throttle(self) -> None:
+        """Attend qu'un appel soit autorisé dans la fenêtre courante."""
+        now = time.monotonic()
+        while self._sent and now - self._sent[0] >= self.per:
+            self._sent.popleft()
+        if len(self._sent) >= self.rate:
+            delay = self.per - (now - self._sent[0])
+            logger.debug("File d'envoi saturée, attente de %.2fs", delay)
+            await asyncio.sleep(delay)
+            self._sent.popleft()
+
+class MessageDelivery:
+    """Envoie des textes dans Discord en un minimum d'appels, via une file d'envoi par salon."""
+
+    MESSAGE_LIMIT = 2000
+    EMBED_LIMIT = 4096
+    ATTACHMENT_NAME = "reponse.md"
+
+    def __init__(self, rate: int = 5, per: float = 5.0, max_queues: int = 1000, color: int = 0xDF6799):
+        """
+        Initialise le service d'envoi.
+
+        Args:
+            rate: Nombre maximal d'appels par salon et par fenêtre
+            per: Durée de la fenêtre en secondes
+            max_queues: Nombre de files inactives conservées avant nettoyage
+            color: Couleur des embeds envoyés
+        """
+        self.rate = rate
+        self.per = per
+        self.max_queues = max_queues
+        self.color = color
+        self._queues: "OrderedDict[int, OutboundQueue]" = OrderedDict()
+
+    def queue(self, channel_id: int) -> OutboundQueue:
+        """
+        Retourne la file d'envoi d'un salon.
+
+        Args:
+            channel_id: Identifiant du salon
+
+        Returns:
+            File d'envoi du salon
+        """
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            if len(self._queues) >= self.max_queues:
+                for key in [key for key, value in self._queues.items() if value.idle]:
+                    del self._queues[key]
+            queue = self._queues[channel_id] = OutboundQueue(self.rate, self.per)
+        self._queues.move_to_end(channel_id)
+        return queue
+
+    async def send(self, channel: Any, text: str, reply_to: Optional[nextcord.Message] = None) -> nextcord.Message:
+        """
+        Envoie un texte en un seul message : texte brut, embed au-delà de 2000 caractères,
+        embed tronqué accompagné du texte complet en pièce jointe au-delà de 4096.
+
+        Args:
+            channel: Salon ou thread de destination
+            text: Texte à envoyer
+            reply_to: Message auquel répondre (optionnel)
+
+        Returns:
+            Message envoyé
+        """
+        send = reply_to.reply if reply_to is not None else channel.send
+        payload = self.payload(text)
+        return await self.queue(channel.id).submit(lambda: send(**payload))
+
+    def payload(self, text: str) -> dict:
+        """
+        Construit les arguments d'envoi d'un texte.
+
+        Args:
+            text: Texte à envoyer
+
+        Returns:
+            Arguments nommés pour send() ou reply()
+        """
+        if len(text) <= self.MESSAGE_LIMIT:
+            return {"content": text}
+        if len(text) <= self.EMBED_LIMIT:
+            return {"embed": nextcord.Embed(description=text, color=self.color)}
+
+        notice = Messages.DELIVERY_ATTACHED
+        preview = split_markdown(text, self.EMBED_LIMIT - len(notice))[0]
+        return {
+            "embed": nextcord.Embed(description=preview + notice, color=self.color),
+            "file": nextcord.File(io.BytesIO(text.encode("utf-8")), filename=self.ATTACHMENT_NAME),
+        }
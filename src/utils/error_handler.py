@@ -18,7 +18,7 @@ class ErrorHandler:
             error: Exception survenue
             custom_message: Message personnalisé (optionnel)
         """
-        logger.error(f"Erreur d'interaction: {str(error)}", exc_info=True)
+        logger.error("Erreur d'interaction: %s", error, exc_info=True)
         
         message = custom_message or Messages.ERROR_GENERAL
         
@@ -28,7 +28,7 @@ class ErrorHandler:
             else:
                 await interaction.response.send_message(message, ephemeral=True)
         except Exception as e:
-            logger.error(f"Impossible d'envoyer le message d'erreur: {str(e)}")
+            logger.error("Impossible d'envoyer le message d'erreur: %s", e)
     
     @staticmethod
     async def handle_message_error(message: nextcord.Message, error: Exception, custom_message: Optional[str] = None) -> None:
@@ -40,14 +40,14 @@ class ErrorHandler:
             error: Exception survenue
             custom_message: Message personnalisé (optionnel)
         """
-        logger.error(f"Erreur de message: {str(error)}", exc_info=True)
+        logger.error("Erreur de message: %s", error, exc_info=True)
         
         error_message = custom_message or Messages.ERROR_GENERAL
         
         try:
             await message.reply(error_message)
         except Exception as e:
-            logger.error(f"Impossible d'envoyer la réponse d'erreur: {str(e)}")
+            logger.error("Impossible d'envoyer la réponse d'erreur: %s", e)
     
     @staticmethod
     def log_service_error(service_name: str, error: Exception, context: Optional[str] = None) -> None:
@@ -60,4 +60,4 @@ class ErrorHandler:
             context: Contexte additionnel (optionnel)
         """
         context_info = f" - Contexte: {context}" if context else ""
-        logger.error(f"Erreur dans {service_name}: {str(error)}{context_info}", exc_info=True)
\ No newline at end of file
+        logger.error("Erreur dans %s: %s%s", service_name, error, context_info, exc_info=True)
\ No newline at end of file
@@ -0,0 +1,122 @@
+import json
+from typing import List, Optional, Tuple
+
+class JsonStringFieldsParser:
+    """
+    Décode au fil de l'eau un objet JSON plat dont les valeurs sont des chaînes.
+
+    Permet d'exploiter une réponse JSON générée en streaming avant qu'elle soit complète.
+    """
+
+    _ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+    def __init__(self):
+        self._raw = ""
+        self._pos = 0
+        self._state = "key"
+        self._key: Optional[str] = None
+
+    @property
+    def raw(self) -> str:
+        """Texte JSON brut reçu jusqu'ici."""
+        return self._raw
+
+    def feed(self, text: str) -> List[Tuple[str, str, bool]]:
+        """
+        Ajoute un fragment de JSON et retourne le texte décodé disponible.
+
+        Args:
+            text: Fragment de texte JSON
+
+        Returns:
+            Liste de triplets (clé, fragment de valeur, valeur terminée)
+
+        Raises:
+            ValueError: Si le texte n'est pas un objet JSON plat de chaînes
+        """
+        self._raw += text
+        events: List[Tuple[str, str, bool]] = []
+
+        while self._pos < len(self._raw):
+            char = self._raw[self._pos]
+
+            if self._state == "key":
+                if char in " \t\r\n{,":
+                    self._pos += 1
+                elif char == "}":
+                    self._state = "end"
+                    self._pos += 1
+                elif char == '"':
+                    end = self._raw.find('"', self._pos + 1)
+                    if end == -1:
+                        break
+                    self._key = json.loads(self._raw[self._pos:end + 1])
+                    self._pos = end + 1
+                    self._state = "colon"
+                else:
+                    raise ValueError(f"Caractère inattendu dans l'objet JSON: {char!r}")
+
+            elif self._state == "colon":
+                if char in " \t\r\n:":
+                    self._pos += 1
+                elif char == '"':
+                    self._pos += 1
+                    self._state = "value"
+                else:
+                    raise ValueError(f"Valeur non textuelle pour la clé {self._key!r}")
+
+            elif self._state == "value":
+                decoded, done = self._decode_value()
+                if decoded or done:
+                    events.append((self._key, decoded, done))
+                if done:
+                    self._state = "key"
+                else:
+                    break
+
+            else:
+                if char not in " \t\r\n":
+                    raise ValueError("Texte inattendu après la fin de l'objet JSON")
+                self._pos += 1
+
+        return events
+
+    def _decode_value(self) -> Tuple[str, bool]:
+        """Décode la valeur en cours jusqu'au guillemet fermant ou à la fin du texte disponible."""
+        parts = []
+        raw = self._raw
+
+        while self._pos < len(raw):
+            char = raw[self._pos]
+            if char == '"':
+                self._pos += 1
+                return "".join(parts), True
+            if char != "\\":
+                parts.append(char)
+                self._pos += 1
+                continue
+
+            if self._pos + 1 >= len(raw):
+                break
+            escape = raw[self._pos + 1]
+            if escape in self._ESCAPES:
+                parts.append(self._ESCAPES[escape])
+                self._pos += 2
+                continue
+            if escape != "u":
+                raise ValueError(f"Séquence d'échappement invalide: \\{escape}")
+
+            if self._pos + 6 > len(raw):
+                break
+            code = int(raw[self._pos + 2:self._pos + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                if self._pos + 12 > len(raw):
+                    break
+                low = int(raw[self._pos + 8:self._pos + 12], 16)
+                parts.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                self._pos += 12
+            else:
+                parts.append(chr(code))
+                self._pos += 6
+
+        return "".join(parts), False
@@ -1,16 +1,111 @@
+import atexit
+import contextvars
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import uuid
+import zlib
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Iterator, Optional
 
-def setup_logger(log_level: str = "INFO") -> None:
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_listener: Optional[QueueListener] = None
+
+class RequestContextFilter(logging.Filter):
+    """Ajoute l'identifiant de la requête en cours aux enregistrements (exécuté dans le thread appelant)."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = request_id_var.get()
+        record.request_id = request_id
+        record.request_tag = f"[{request_id}] " if request_id else ""
+        return True
+
+class SamplingFilter(logging.Filter):
+    """
+    Ne conserve qu'une partie des enregistrements INFO et DEBUG liés à une requête.
+    
+    La décision dépend de l'identifiant de la requête : une requête échantillonnée garde toutes ses lignes.
+    Les avertissements, les erreurs et les messages hors requête sont toujours conservés.
+    """
+    
+    def __init__(self, rate: float):
+        super().__init__()
+        self.threshold = int(max(0.0, min(1.0, rate)) * 0xFFFFFFFF)
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = getattr(record, "request_id", None)
+        if record.levelno >= logging.WARNING or request_id is None:
+            return True
+        return zlib.crc32(request_id.encode("utf-8")) <= self.threshold
+
+class JsonFormatter(logging.Formatter):
+    """Formate chaque enregistrement en un objet JSON sur une ligne."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def new_request_id(prefix: str = "req") -> str:
+    """
+    Génère un identifiant de requête court.
+    
+    Args:
+        prefix: Préfixe indiquant l'origine de la requête (eval, mention...)
+    
+    Returns:
+        Identifiant de la forme "prefix-1a2b3c4d"
+    """
+    return f"{prefix}-{uuid.uuid4().hex[:8]}"
+
+@contextmanager
+def request_context(prefix: str = "req") -> Iterator[str]:
+    """
+    Associe un nouvel identifiant de requête aux logs émis dans le bloc.
+    
+    Les tâches créées dans le bloc héritent de l'identifiant.
+    
+    Args:
+        prefix: Préfixe de l'identifiant
+    
+    Yields:
+        Identifiant de la requête
+    """
+    request_id = new_request_id(prefix)
+    token = request_id_var.set(request_id)
+    try:
+        yield request_id
+    finally:
+        request_id_var.reset(token)
+
+def setup_logger(log_level: str = "INFO", log_format: str = "text", sample_rate: float = 1.0) -> None:
     """
     Configure le système de logging pour l'application.
     
+    Les enregistrements passent par une file : l'écriture dans la console et les fichiers
+    (et leur rotation) est faite par un thread dédié, hors de la boucle asyncio.
+    
     Args:
         log_level: Niveau de log (DEBUG, INFO, WARNING, ERROR)
+        log_format: "text" ou "json" (un objet JSON par ligne)
+        sample_rate: Proportion des requêtes dont les logs INFO et DEBUG sont conservés
     """
+    global _listener
+    
     log_dir = "logs"
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
@@ -18,10 +113,13 @@ def setup_logger(log_level: str = "INFO") -> None:
     logger = logging.getLogger()
     logger.setLevel(getattr(logging, log_level.upper()))
     
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(request_tag)s%(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
@@ -43,25 +141,46 @@ def setup_logger(log_level: str = "INFO") -> None:
     error_handler.setLevel(logging.ERROR)
     error_handler.setFormatter(formatter)
     
+    shutdown_logger()
+    
+    queue_handler = QueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestContextFilter())
+    if sample_rate < 1.0:
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+    
     logger.handlers.clear()
+    logger.addHandler(queue_handler)
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
+    _listener = QueueListener(
+        queue_handler.queue, console_handler, file_handler, error_handler,
+        respect_handler_level=True
+    )
+    _listener.start()
     
     logging.getLogger('nextcord').setLevel(logging.WARNING)
     logging.getLogger('httpx').setLevel(logging.WARNING)
     
     logger.info("Système de logging initialisé")
 
+def shutdown_logger() -> None:
+    """Écrit les enregistrements encore en file et arrête le thread d'écriture des logs."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+atexit.register(shutdown_logger)
+
 def get_logger(name: str) -> logging.Logger:
     """
     Obtient un logger avec le nom spécifié.
     
     Args:
         name: Nom du logger
-        
+    
     Returns:
         Instance du logger
     """
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
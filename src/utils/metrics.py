@@ -0,0 +1,325 @@
+import asyncio
+import bisect
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+class _Metric:
+    """Métrique nommée, déclinée par valeurs d'étiquettes."""
+
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Étiquettes attendues pour {self.name}: {', '.join(self.labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labels, values))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+        return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+    def render(self) -> List[str]:
+        """Retourne les lignes de la métrique au format texte de Prometheus."""
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Compteur monotone."""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {} if self.labels else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        Incrémente le compteur.
+
+        Args:
+            amount: Valeur ajoutée
+            **labels: Valeurs des étiquettes
+        """
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Retourne la valeur courante du compteur."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {value:g}" for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    """Valeur instantanée, pouvant monter ou descendre."""
+
+    TYPE = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {} if self.labels else {(): 0.0}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Fixe la valeur de la jauge."""
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Augmente la valeur de la jauge."""
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Diminue la valeur de la jauge."""
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        """Retourne la valeur courante de la jauge."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{self._format_labels(key)} {value:g}" for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    """Distribution de durées (en secondes) répartie en intervalles cumulés."""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        Enregistre une mesure.
+
+        Args:
+            value: Valeur mesurée
+            **labels: Valeurs des étiquettes
+        """
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+            self._sums[key] = 0.0
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Mesure la durée du bloc, y compris s'il lève une exception."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        """Retourne le nombre de mesures enregistrées."""
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._format_labels(key)} {self._sums[key]:g}")
+            lines.append(f"{self.name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    """Ensemble des métriques exposées par le bot."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        """Retourne le compteur du nom donné, en le créant au premier appel."""
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        """Retourne la jauge du nom donné, en la créant au premier appel."""
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Retourne l'histogramme du nom donné, en le créant au premier appel."""
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """
+        Produit l'exposition de toutes les métriques.
+
+        Returns:
+            Texte au format d'exposition de Prometheus (version 0.0.4)
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labels != metric.labels:
+                raise ValueError(f"Métrique {metric.name} déjà déclarée avec un autre type ou d'autres étiquettes")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+class MetricsServer:
+    """Serveur HTTP local exposant les métriques sur /metrics."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        """
+        Initialise le serveur sans le démarrer.
+
+        Args:
+            registry: Métriques à exposer
+            host: Adresse d'écoute
+            port: Port d'écoute (0 pour un port libre choisi par le système)
+        """
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        """Démarre le serveur."""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info("Métriques exposées sur http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self) -> None:
+        """Arrête le serveur."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        response = web.Response(text=self.registry.render())
+        response.headers["Content-Type"] = self.CONTENT_TYPE
+        return response
+
+class EventLoopLagMonitor:
+    """Mesure en continu le retard de la boucle asyncio sur un réveil périodique."""
+
+    def __init__(self, interval: float = 0.5):
+        """
+        Initialise le moniteur sans le démarrer.
+
+        Args:
+            interval: Intervalle entre deux mesures en secondes
+        """
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Démarre les mesures (à appeler depuis la boucle asyncio)."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        """Arrête les mesures."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG.set(lag)
+            EVENT_LOOP_LAG_SECONDS.observe(lag)
+
+metrics = MetricsRegistry()
+
+STAGE_DURATION = metrics.histogram(
+    "ocabot_stage_duration_seconds",
+    "Durée des étapes du traitement d'une requête",
+    ["stage"]
+)
+LLM_DURATION = metrics.histogram(
+    "ocabot_llm_request_duration_seconds",
+    "Durée des appels Mistral, tentatives comprises, par méthode",
+    ["method", "outcome"]
+)
+TIMEOUTS = metrics.counter(
+    "ocabot_timeouts_total",
+    "Délais dépassés par composant",
+    ["component"]
+)
+SANDBOX_FAILURES = metrics.counter(
+    "ocabot_sandbox_failures_total",
+    "Échecs internes de la sandbox (firejail absent, toplevel arrêté au démarrage, erreur inattendue)",
+    ["backend"]
+)
+CACHE_REQUESTS = metrics.counter(
+    "ocabot_cache_requests_total",
+    "Consultations des caches, par cache et par résultat",
+    ["cache", "result"]
+)
+LLM_MODEL_DURATION = metrics.histogram(
+    "ocabot_llm_model_duration_seconds",
+    "Durée des requêtes Mistral réussies par modèle (premier fragment en streaming)",
+    ["model", "mode"]
+)
+LLM_HEDGES = metrics.counter(
+    "ocabot_llm_hedged_requests_total",
+    "Requêtes de couverture et de relais vers un second modèle, par modèle gagnant",
+    ["kind", "winner"]
+)
+PROMPT_TOKENS_SAVED = metrics.counter(
+    "ocabot_prompt_tokens_saved_total",
+    "Tokens (estimés) retirés des prompts par la compaction, par section",
+    ["section"]
+)
+MISTRAL_RATE_LIMITED = metrics.counter(
+    "ocabot_mistral_rate_limited_total",
+    "Réponses 429 de l'API Mistral"
+)
+EVALUATIONS_IN_FLIGHT = metrics.gauge(
+    "ocabot_evaluations_in_flight",
+    "Évaluations en cours d'exécution dans une sandbox"
+)
+EVENT_LOOP_LAG = metrics.gauge(
+    "ocabot_event_loop_lag_seconds",
+    "Dernier retard mesuré de la boucle asyncio"
+)
+EVENT_LOOP_LAG_SECONDS = metrics.histogram(
+    "ocabot_event_loop_lag_distribution_seconds",
+    "Distribution du retard de la boucle asyncio",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
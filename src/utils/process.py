@@ -0,0 +1,94 @@
+import asyncio
+import math
+import os
+import signal
+import logging
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def firejail_timeout(seconds: float, grace: float = 5) -> str:
+    """
+    Construit l'option --timeout de firejail, filet de sécurité déclenché un peu après le délai géré par asyncio.
+    
+    Args:
+        seconds: Délai de l'exécution en secondes
+        grace: Marge ajoutée pour laisser le délai asyncio expirer en premier
+    
+    Returns:
+        Option au format --timeout=hh:mm:ss
+    """
+    total = int(math.ceil(seconds + grace))
+    return f"--timeout={total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+async def kill_process_tree(process: asyncio.subprocess.Process, wait_timeout: float = 5) -> None:
+    """
+    Tue un processus lancé dans sa propre session ainsi que tous ses enfants.
+    
+    Args:
+        process: Processus à tuer (lancé avec start_new_session=True)
+        wait_timeout: Durée maximale d'attente de la fin du processus
+    """
+    if process.returncode is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    try:
+        await asyncio.wait_for(process.wait(), timeout=wait_timeout)
+    except asyncio.TimeoutError:
+        logger.error("Le processus %s ne s'est pas arrêté après SIGKILL", process.pid)
+
+async def communicate_capped(
+    process: asyncio.subprocess.Process,
+    max_bytes: int,
+    input: Optional[bytes] = None
+) -> Tuple[bytes, bytes, bool]:
+    """
+    Lit stdout et stderr au fil de l'eau en bornant la quantité conservée.
+    
+    Dès qu'un des flux dépasse la limite, le processus et ses enfants sont tués.
+    
+    Args:
+        process: Processus lancé avec stdout et stderr redirigés (et stdin si input est fourni)
+        max_bytes: Nombre maximal d'octets conservés par flux
+        input: Données à écrire sur l'entrée standard avant de la fermer (optionnel)
+        
+    Returns:
+        Tuple (stdout, stderr, tronqué)
+    """
+    truncated = False
+    
+    async def read(stream: asyncio.StreamReader) -> bytes:
+        nonlocal truncated
+        data = bytearray()
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                return bytes(data)
+            room = max_bytes - len(data)
+            data.extend(chunk[:room])
+            if len(chunk) > room:
+                truncated = True
+                await kill_process_tree(process)
+                return bytes(data)
+    
+    async def write() -> None:
+        try:
+            process.stdin.write(input)
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            process.stdin.close()
+    
+    readers = [read(process.stdout), read(process.stderr)]
+    if input is not None:
+        readers.append(write())
+    stdout, stderr = (await asyncio.gather(*readers))[:2]
+    await process.wait()
+    return stdout, stderr, truncated
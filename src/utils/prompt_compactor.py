@@ -0,0 +1,247 @@
+import re
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from src.utils.metrics import PROMPT_TOKENS_SAVED
+from src.utils.tokens import CHARS_PER_TOKEN, estimate_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CompactionResult:
+    """Texte compacté et tokens économisés."""
+
+    text: str
+    original_tokens: int
+    tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        """Nombre de tokens économisés par la compaction."""
+        return self.original_tokens - self.tokens
+
+class PromptCompactor:
+    """
+    Réduit le code et les sorties d'évaluation avant leur envoi au modèle, section par section.
+
+    Les répétitions de lignes ou de groupes de lignes sont toujours fusionnées. Si la section dépasse
+    encore son budget, les lignes trop longues (grandes listes, longues chaînes) sont raccourcies en
+    gardant leur début et leur fin, puis seules sont conservées les lignes d'erreur et de signature
+    ainsi que le début et la fin du texte.
+    """
+
+    DEFAULT_BUDGETS = {
+        "code": 1500,
+        "output": 1500,
+    }
+    IMPORTANT_LINE = re.compile(
+        r"^\s*(Error|Exception|Warning|Alert|Fatal error|Erreur|File \"|Line \d+|Characters \d+|\^+\s*$)"
+        r"|^(val |- : |type |module |exception |class )"
+    )
+    VALUE_SEPARATOR = " = "
+
+    def __init__(
+        self,
+        budgets: Optional[Dict[str, int]] = None,
+        max_line_chars: int = 300,
+        min_repeats: int = 3,
+        max_block_lines: int = 4
+    ):
+        """
+        Initialise le compacteur.
+
+        Args:
+            budgets: Budget en tokens par section (0 : section non compactée)
+            max_line_chars: Longueur au-delà de laquelle une ligne est raccourcie quand la section dépasse son budget
+            min_repeats: Nombre de répétitions consécutives à partir duquel une ligne ou un groupe est fusionné
+            max_block_lines: Taille maximale des groupes de lignes répétés recherchés
+        """
+        self.budgets = {**self.DEFAULT_BUDGETS, **(budgets or {})}
+        self.max_line_chars = max_line_chars
+        self.min_repeats = min_repeats
+        self.max_block_lines = max_block_lines
+        self.compactions = 0
+        self.saved_tokens = 0
+
+    def compact(self, section: str, text: str, budget: Optional[int] = None) -> CompactionResult:
+        """
+        Compacte une section du prompt.
+
+        Args:
+            section: Nom de la section ("code", "output"...), qui détermine le budget
+            text: Texte de la section
+            budget: Budget en tokens remplaçant celui de la section
+
+        Returns:
+            Texte compacté et nombre de tokens avant et après
+        """
+        budget = self.budgets.get(section, 0) if budget is None else budget
+        original_tokens = estimate_tokens(text)
+        if budget <= 0 or not text:
+            return CompactionResult(text, original_tokens, original_tokens)
+
+        lines = self._collapse_repeats(text.split("\n"))
+        compacted = "\n".join(lines)
+        if estimate_tokens(compacted) > budget:
+            lines = [self._shorten_line(line) for line in lines]
+            compacted = "\n".join(lines)
+        if estimate_tokens(compacted) > budget:
+            compacted = self._sample_lines(lines, budget)
+        if estimate_tokens(compacted) > budget:
+            compacted = truncate_to_tokens(compacted, budget)
+
+        result = CompactionResult(compacted, original_tokens, estimate_tokens(compacted))
+        if result.saved_tokens > 0:
+            self.compactions += 1
+            self.saved_tokens += result.saved_tokens
+            PROMPT_TOKENS_SAVED.inc(result.saved_tokens, section=section)
+        return result
+
+    def compact_evaluation(self, code: str, output: str) -> Tuple[str, str]:
+        """
+        Compacte le code et la sortie d'une évaluation.
+
+        Args:
+            code: Code OCaml source
+            output: Sortie de l'évaluation
+
+        Returns:
+            Code et sortie compactés
+        """
+        code_result = self.compact("code", code)
+        output_result = self.compact("output", output)
+        saved = code_result.saved_tokens + output_result.saved_tokens
+        if saved > 0:
+            logger.info(
+                "Prompt compacté: %s tokens économisés (code %s -> %s, sortie %s -> %s)",
+                saved, code_result.original_tokens, code_result.tokens,
+                output_result.original_tokens, output_result.tokens
+            )
+        return code_result.text, output_result.text
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retourne les statistiques de compaction.
+
+        Returns:
+            Dictionnaire du nombre de sections compactées et des tokens économisés
+        """
+        return {
+            "compactions": self.compactions,
+            "saved_tokens": self.saved_tokens,
+        }
+
+    def _collapse_repeats(self, lines: List[str]) -> List[str]:
+        """Fusionne les lignes ou groupes de lignes répétés consécutivement."""
+        result: List[str] = []
+        i = 0
+        while i < len(lines):
+            collapsed = False
+            for size in range(1, self.max_block_lines + 1):
+                block = lines[i:i + size]
+                if len(block) < size:
+                    break
+                if not any(line.strip() for line in block):
+                    continue
+                repeats = 1
+                while lines[i + repeats * size:i + (repeats + 1) * size] == block:
+                    repeats += 1
+                if repeats < self.min_repeats:
+                    continue
+                if size == 1:
+                    marker = f"[... ligne répétée {repeats - 1} fois de plus ...]"
+                else:
+                    marker = f"[... {size} lignes répétées {repeats - 1} fois de plus ...]"
+                if sum(len(line) + 1 for line in block) * (repeats - 1) > len(marker) + 1:
+                    result.extend(block)
+                    result.append(marker)
+                    i += repeats * size
+                    collapsed = True
+                    break
+            if not collapsed:
+                result.append(lines[i])
+                i += 1
+        return result
+
+    def _shorten_line(self, line: str) -> str:
+        """
+        Raccourcit une ligne trop longue en gardant son début et sa fin.
+
+        La partie précédant la valeur (par exemple "val l : int list") est conservée entière.
+        """
+        if len(line) <= self.max_line_chars:
+            return line
+
+        prefix = ""
+        if self.IMPORTANT_LINE.match(line) and self.VALUE_SEPARATOR in line:
+            prefix, value = line.split(self.VALUE_SEPARATOR, 1)
+            prefix += self.VALUE_SEPARATOR
+        else:
+            value = line
+
+        keep = max(self.max_line_chars - len(prefix), 40)
+        if len(value) <= keep:
+            return line
+        head = keep * 2 // 3
+        tail = keep - head
+        return f"{prefix}{value[:head]} [... {len(value) - keep} caractères omis ...] {value[-tail:]}"
+
+    def _sample_lines(self, lines: List[str], budget: int) -> str:
+        """
+        Conserve les lignes d'erreur et de signature puis le début et la fin du texte dans le budget.
+
+        Args:
+            lines: Lignes de la section
+            budget: Budget en tokens
+
+        Returns:
+            Texte dont les lignes omises sont remplacées par un marqueur
+        """
+        marker_chars = len("[... 00000 lignes omises ...]\n")
+        available = budget * CHARS_PER_TOKEN - 2 * marker_chars
+        important_available = available // 2
+
+        kept = set()
+        for i, line in enumerate(lines):
+            if not self.IMPORTANT_LINE.match(line):
+                continue
+            cost = len(line) + 1 + marker_chars
+            if cost > important_available:
+                break
+            kept.add(i)
+            important_available -= cost
+            available -= cost
+
+        head, tail = 0, len(lines) - 1
+        head_available = available * 2 // 3
+        while head <= tail:
+            cost = len(lines[head]) + 1
+            if head not in kept:
+                if cost > head_available:
+                    break
+                kept.add(head)
+                head_available -= cost
+                available -= cost
+            head += 1
+        while tail >= head:
+            cost = len(lines[tail]) + 1
+            if tail not in kept:
+                if cost > available:
+                    break
+                kept.add(tail)
+                available -= cost
+            tail -= 1
+
+        result: List[str] = []
+        omitted = 0
+        for i, line in enumerate(lines):
+            if i in kept:
+                if omitted:
+                    result.append(f"[... {omitted} lignes omises ...]")
+                    omitted = 0
+                result.append(line)
+            else:
+                omitted += 1
+        if omitted:
+            result.append(f"[... {omitted} lignes omises ...]")
+        return "\n".join(result)
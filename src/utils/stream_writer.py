@@ -0,0 +1,132 @@
+import time
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+import nextcord
+from src.utils.delivery import CLOSING_FENCE, OutboundQueue, open_fence, split_point
+
+logger = logging.getLogger(__name__)
+
+class StreamingMessageWriter:
+    """Publie un texte généré en streaming dans Discord en envoyant puis éditant des messages."""
+
+    EDIT_INTERVAL = 1.0
+    MAX_LENGTH = 2000
+
+    def __init__(
+        self,
+        send_first: Callable[[str], Awaitable[nextcord.Message]],
+        send_next: Optional[Callable[[str], Awaitable[nextcord.Message]]] = None,
+        edit_interval: float = EDIT_INTERVAL,
+        max_length: int = MAX_LENGTH,
+        queue: Optional[OutboundQueue] = None
+    ):
+        """
+        Initialise le writer.
+
+        Args:
+            send_first: Fonction envoyant le premier message (ex: thread.send, message.reply)
+            send_next: Fonction envoyant les messages suivants (par défaut send_first)
+            edit_interval: Délai minimal entre deux éditions, pour respecter les limites de débit
+            max_length: Taille maximale d'un message Discord
+            queue: File d'envoi du salon par laquelle passent les envois et éditions (optionnelle)
+        """
+        self.send_first = send_first
+        self.send_next = send_next or send_first
+        self.edit_interval = edit_interval
+        self.max_length = max_length
+        self.queue = queue
+        self.messages: List[nextcord.Message] = []
+        self.first_visible_at: Optional[float] = None
+        self._started_at = time.monotonic()
+        self._text = ""
+        self._current = ""
+        self._published = ""
+        self._message: Optional[nextcord.Message] = None
+        self._last_flush = 0.0
+
+    @property
+    def text(self) -> str:
+        """Texte complet reçu jusqu'ici."""
+        return self._text
+
+    async def consume(self, stream: AsyncIterator[str]) -> str:
+        """
+        Publie tous les fragments d'un flux, puis la version finale du dernier message.
+
+        Une erreur en cours de flux est journalisée et le texte déjà reçu est conservé ;
+        elle n'est propagée que si aucun texte n'a été reçu.
+
+        Args:
+            stream: Flux de fragments de texte
+
+        Returns:
+            Texte complet publié
+        """
+        try:
+            async for delta in stream:
+                await self.feed(delta)
+        except Exception as e:
+            if not self._text.strip():
+                raise
+            logger.error("Flux interrompu après %s caractères: %s", len(self._text), e)
+        await self.finish()
+        return self._text
+
+    async def feed(self, delta: str) -> None:
+        """
+        Ajoute un fragment et publie si le délai entre éditions est écoulé.
+
+        Le premier fragment non vide est publié immédiatement.
+
+        Args:
+            delta: Fragment de texte
+        """
+        self._text += delta
+        self._current += delta
+        if not self.messages or time.monotonic() - self._last_flush >= self.edit_interval:
+            await self._flush()
+
+    async def finish(self) -> None:
+        """Publie le texte restant."""
+        await self._flush()
+
+    async def _flush(self) -> None:
+        limit = self.max_length - len(CLOSING_FENCE)
+        while len(self._current) > limit:
+            cut = split_point(self._current, limit)
+            head, self._current = self._current[:cut], self._current[cut:]
+            fence = open_fence(head)
+            if fence:
+                self._current = f"{fence}\n{self._current}"
+            await self._publish(self._displayed(head, fence))
+            self._message = None
+            self._published = ""
+
+        content = self._displayed(self._current, open_fence(self._current))
+        if content.strip() and content != self._published:
+            await self._publish(content)
+
+    @staticmethod
+    def _displayed(text: str, fence: Optional[str]) -> str:
+        """Referme le bloc de code resté ouvert pour que le message s'affiche correctement."""
+        return text.rstrip("\n") + CLOSING_FENCE if fence else text
+
+    async def _publish(self, content: str) -> None:
+        if self._message is None:
+            send = self.send_first if not self.messages else self.send_next
+            self._message = await self._call(lambda: send(content))
+            self.messages.append(self._message)
+            if self.first_visible_at is None:
+                self.first_visible_at = time.monotonic() - self._started_at
+                logger.info("Premier texte visible après %.2fs", self.first_visible_at)
+        else:
+            message = self._message
+            await self._call(lambda: message.edit(content=content))
+        self._published = content
+        self._last_flush = time.monotonic()
+
+    async def _call(self, call: Callable[[], Awaitable[Any]]) -> Any:
+        """Exécute un appel Discord, via la file d'envoi du salon si elle est fournie."""
+        if self.queue is None:
+            return await call()
+        return await self.queue.submit(call)
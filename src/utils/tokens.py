@@ -0,0 +1,33 @@
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estime le nombre de tokens d'un texte (environ 4 caractères par token).
+    
+    Args:
+        text: Texte à mesurer
+        
+    Returns:
+        Nombre de tokens estimé
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "\n[...]\n") -> str:
+    """
+    Tronque un texte au budget de tokens en conservant son début et sa fin.
+    
+    Args:
+        text: Texte à tronquer
+        max_tokens: Budget maximal en tokens
+        marker: Texte inséré à la place de la partie supprimée
+        
+    Returns:
+        Texte tronqué, ou le texte d'origine s'il respecte le budget
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - len(marker))
+    head = max_chars * 2 // 3
+    tail = max_chars - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
@@ -0,0 +1,255 @@
+"""Micro-benchmarks de la chaîne d'évaluation et des appels LLM, comparés à des mesures de référence."""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import shutil
+import sys
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.mistral_service import MistralService
+from src.services.ocaml_service import OCamlService
+from src.utils.delivery import split_markdown
+from tools.fake_mistral import FakeMistralServer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baselines.json")
+SUITES = ("sandbox", "parsing", "chunking", "llm")
+SAMPLE_CODE = "let rec fact n = if n = 0 then 1 else n * fact (n - 1);;\nfact 10;;\n"
+
+def percentile(samples: List[float], q: float) -> float:
+    """
+    Calcule un percentile par la méthode du rang le plus proche.
+
+    Args:
+        samples: Mesures (non vide)
+        q: Percentile entre 0 et 100
+
+    Returns:
+        Valeur du percentile
+    """
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Résume des durées (en secondes) en millisecondes."""
+    return {
+        "p50": percentile(samples, 50) * 1000,
+        "p95": percentile(samples, 95) * 1000,
+        "p99": percentile(samples, 99) * 1000,
+        "n": len(samples),
+    }
+
+class BenchmarkRunner:
+    """Exécute les benchmarks et collecte leurs statistiques."""
+
+    def __init__(self, iterations: int = 50, warmup: int = 3):
+        """
+        Initialise le runner.
+
+        Args:
+            iterations: Nombre de mesures par benchmark
+            warmup: Nombre d'exécutions ignorées avant les mesures
+        """
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results: Dict[str, Dict[str, float]] = {}
+        self.skipped: Dict[str, str] = {}
+
+    async def measure(self, name: str, func: Callable[[], Any], iterations: Optional[int] = None) -> Dict[str, float]:
+        """
+        Mesure une fonction (synchrone ou coroutine) et enregistre ses percentiles.
+
+        Args:
+            name: Nom du benchmark
+            func: Fonction à mesurer
+            iterations: Nombre de mesures (par défaut celui du runner)
+
+        Returns:
+            Statistiques du benchmark en millisecondes
+        """
+        samples = []
+        for index in range(self.warmup + (iterations or self.iterations)):
+            start = time.perf_counter()
+            result = func()
+            if asyncio.iscoroutine(result):
+                await result
+            elapsed = time.perf_counter() - start
+            if index >= self.warmup:
+                samples.append(elapsed)
+
+        self.results[name] = summarize(samples)
+        return self.results[name]
+
+    def record(self, name: str, samples: List[float]) -> None:
+        """Enregistre des durées mesurées par l'appelant."""
+        self.results[name] = summarize(samples)
+
+    def skip(self, name: str, reason: str) -> None:
+        """Indique qu'un benchmark n'a pas pu être exécuté."""
+        self.skipped[name] = reason
+
+async def bench_sandbox(runner: BenchmarkRunner, use_firejail: bool) -> None:
+    """Coût d'un lancement à froid, décomposé en firejail, démarrage du toplevel et exécution."""
+    if shutil.which("ocaml") is None:
+        runner.skip("sandbox", "ocaml introuvable")
+        return
+    if use_firejail and shutil.which("firejail") is None:
+        runner.skip("sandbox", "firejail introuvable (utiliser --no-firejail)")
+        return
+
+    service = OCamlService(max_concurrent=1, timeout=30)
+    if not use_firejail:
+        service._sandbox_command = lambda extra_args, command: command
+    iterations = max(5, runner.iterations // 5)
+
+    async def run(command: List[str], stdin: bytes) -> None:
+        process = await asyncio.create_subprocess_exec(
+            *service._sandbox_command([], command),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        await process.communicate(stdin)
+
+    if use_firejail:
+        await runner.measure("sandbox.firejail", lambda: run(["true"], b""), iterations)
+    await runner.measure("sandbox.toplevel", lambda: run(["ocaml"], b""), iterations)
+    await runner.measure("sandbox.evaluate", lambda: service._run_sandbox(SAMPLE_CODE), iterations)
+
+    evaluate = runner.results["sandbox.evaluate"]
+    toplevel = runner.results["sandbox.toplevel"]
+    runner.results["sandbox.execution"] = {
+        key: max(0.0, evaluate[key] - toplevel[key]) for key in ("p50", "p95", "p99")
+    }
+    runner.results["sandbox.execution"]["n"] = evaluate["n"]
+    await service.close()
+
+async def bench_parsing(runner: BenchmarkRunner) -> None:
+    """Extraction des résultats d'une sortie de toplevel volumineuse."""
+    phrases = "".join(f"# val x{i} : int = {i}\n" for i in range(20000))
+    stdout = f"        OCaml version 5.1.0\n\n{phrases}# "
+    await runner.measure("parsing.toplevel_20k_phrases", lambda: OCamlService._parse_toplevel_output(stdout))
+
+async def bench_chunking(runner: BenchmarkRunner) -> None:
+    """Découpage Markdown d'une longue réponse mêlant texte et blocs de code."""
+    paragraph = "Cette fonction parcourt la liste et accumule les résultats intermédiaires. " * 6
+    code = "```ocaml\n" + "\n".join(f"let f{i} x = x + {i}" for i in range(80)) + "\n```"
+    text = "\n\n".join([paragraph, code] * 40)
+    stats = await runner.measure("chunking.split_markdown_%dkB" % (len(text) // 1000), lambda: split_markdown(text))
+    stats["throughput_mb_s"] = len(text) / 1e6 / (stats["p50"] / 1000) if stats["p50"] else 0.0
+
+async def bench_llm(runner: BenchmarkRunner) -> None:
+    """Surcoût d'un aller-retour LLM (client, pool HTTP, retries) contre un faux serveur sans latence."""
+    server = FakeMistralServer(latency=0.0, token_delay=0.0)
+    await server.start()
+    service = MistralService(api_key="benchmark", server_url=server.url)
+    try:
+        await runner.measure(
+            "llm.complete_round_trip",
+            lambda: service.generate_response("Contexte de test", "Question de test")
+        )
+
+        first_token: List[float] = []
+
+        async def stream() -> None:
+            start = time.perf_counter()
+            first = None
+            async for _ in service.stream_response("Contexte de test", "Question de test"):
+                if first is None:
+                    first = time.perf_counter() - start
+            first_token.append(first or 0.0)
+
+        await runner.measure("llm.stream_round_trip", stream)
+        runner.record("llm.stream_first_token", first_token[runner.warmup:])
+    finally:
+        await service.close()
+        await server.stop()
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """
+    Compare les résultats aux mesures de référence.
+
+    Args:
+        results: Statistiques de l'exécution courante
+        baselines: Statistiques de référence
+        threshold: Rapport p50 courant / référence au-delà duquel une régression est signalée
+
+    Returns:
+        Noms des benchmarks en régression
+    """
+    regressions = []
+    for name, stats in results.items():
+        baseline = baselines.get(name)
+        if not baseline or not baseline.get("p50"):
+            continue
+        if stats["p50"] / baseline["p50"] > threshold:
+            regressions.append(name)
+    return regressions
+
+def print_report(runner: BenchmarkRunner, baselines: Dict[str, Dict[str, float]], regressions: List[str]) -> None:
+    """Affiche les résultats sous forme de tableau."""
+    print(f"{'benchmark':<38} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'vs réf.':>9}")
+    for name, stats in runner.results.items():
+        baseline = baselines.get(name, {}).get("p50")
+        ratio = f"{stats['p50'] / baseline:>8.2f}x" if baseline else f"{'-':>9}"
+        flag = "  RÉGRESSION" if name in regressions else ""
+        print(f"{name:<38} {stats['p50']:>10.3f} {stats['p95']:>10.3f} {stats['p99']:>10.3f} {ratio}{flag}")
+        if "throughput_mb_s" in stats:
+            print(f"{'':<38} {stats['throughput_mb_s']:>10.1f} Mo/s")
+    for name, reason in runner.skipped.items():
+        print(f"{name:<38} ignoré : {reason}")
+
+async def _run(args: argparse.Namespace) -> int:
+    runner = BenchmarkRunner(iterations=args.iterations, warmup=args.warmup)
+    suites = args.only.split(",") if args.only else SUITES
+
+    if "sandbox" in suites:
+        await bench_sandbox(runner, use_firejail=not args.no_firejail)
+    if "parsing" in suites:
+        await bench_parsing(runner)
+    if "chunking" in suites:
+        await bench_chunking(runner)
+    if "llm" in suites:
+        await bench_llm(runner)
+
+    baselines: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baselines = json.load(file)
+
+    regressions = compare(runner.results, baselines, args.threshold)
+    print_report(runner, baselines, regressions)
+
+    if args.save_baseline:
+        baselines.update(runner.results)
+        with open(args.baseline, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+        print(f"Mesures de référence enregistrées dans {args.baseline}")
+        return 0
+    return 1 if regressions else 0
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks d'OCaBot")
+    parser.add_argument("--iterations", type=int, default=50, help="Nombre de mesures par benchmark")
+    parser.add_argument("--warmup", type=int, default=3, help="Exécutions ignorées avant les mesures")
+    parser.add_argument("--only", help=f"Suites à exécuter, séparées par des virgules ({', '.join(SUITES)})")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_PATH, help="Fichier JSON des mesures de référence")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistre les mesures comme nouvelle référence")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Rapport p50 au-delà duquel signaler une régression")
+    parser.add_argument("--no-firejail", action="store_true", help="Mesure le toplevel sans sandbox")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(asyncio.run(_run(args)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Serveur HTTP local imitant l'API de complétion Mistral, pour les tests et les mesures hors ligne."""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import logging
+from typing import Any, Dict, Optional
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+class FakeMistralServer:
+    """Faux serveur Mistral avec latence et taux d'erreur configurables."""
+    
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        response_text: Optional[str] = None,
+        token_delay: float = 0.02
+    ):
+        """
+        Initialise le serveur sans le démarrer.
+        
+        Args:
+            host: Adresse d'écoute
+            port: Port d'écoute (0 pour un port libre choisi par le système)
+            latency: Latence ajoutée à chaque réponse en secondes
+            jitter: Variation aléatoire maximale de la latence en secondes
+            error_rate: Proportion des requêtes répondues par une erreur
+            error_status: Code HTTP des erreurs simulées
+            response_text: Texte renvoyé (par défaut un écho du dernier message)
+            token_delay: Délai entre deux fragments d'une réponse en streaming
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.response_text = response_text
+        self.token_delay = token_delay
+        self.requests = 0
+        self.errors = 0
+        self._runner: Optional[web.AppRunner] = None
+    
+    @property
+    def url(self) -> str:
+        """URL à passer comme server_url au client Mistral."""
+        return f"http://{self.host}:{self.port}"
+    
+    async def start(self) -> None:
+        """Démarre le serveur."""
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._handle_completion)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Faux serveur Mistral démarré sur {self.url}")
+    
+    async def stop(self) -> None:
+        """Arrête le serveur."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle_completion(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        
+        await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+        
+        if random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response(
+                {"object": "error", "message": "Erreur simulée", "type": "fake_error"},
+                status=self.error_status,
+                headers={"Retry-After": "0"}
+            )
+        
+        content = self._response_content(body)
+        if body.get("stream"):
+            return await self._stream_completion(request, body, content)
+        return web.json_response(self._completion(body, content))
+    
+    async def _stream_completion(self, request: web.Request, body: Dict[str, Any], content: str) -> web.StreamResponse:
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        
+        tokens = [content[i:i + 8] for i in range(0, len(content), 8)]
+        for index, token in enumerate(tokens):
+            chunk = {
+                "id": "fake-stream",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": token},
+                    "finish_reason": "stop" if index == len(tokens) - 1 else None,
+                }],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            await asyncio.sleep(self.token_delay)
+        
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+    
+    def _response_content(self, body: Dict[str, Any]) -> str:
+        if self.response_text is not None:
+            return self.response_text
+        if body.get("response_format", {}).get("type") == "json_object":
+            return json.dumps({
+                "title": "Discussion OCaml simulée",
+                "explanation": "Explication simulée de la sortie du code OCaml.",
+            }, ensure_ascii=False)
+        messages = body.get("messages", [])
+        last = messages[-1]["content"] if messages else ""
+        return f"Réponse simulée : {last[:200]}"
+    
+    @staticmethod
+    def _completion(body: Dict[str, Any], content: str) -> Dict[str, Any]:
+        return {
+            "id": f"fake-{random.getrandbits(32):08x}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+async def _serve(args: argparse.Namespace) -> None:
+    server = FakeMistralServer(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        token_delay=args.token_delay
+    )
+    await server.start()
+    print(f"Faux serveur Mistral en écoute : {server.url} (MISTRAL_SERVER_URL)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Faux serveur Mistral local")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latence par réponse (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variation de latence (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion d'erreurs simulées")
+    parser.add_argument("--error-status", type=int, default=429, help="Code HTTP des erreurs simulées")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Délai entre fragments en streaming (s)")
+    args = parser.parse_args()
+    
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Faux toplevel OCaml (bannière, invites "# ", sentinelle, une réponse par phrase) pour les tests de charge sans OCaml ni firejail."""
+
+import os
+import re
+import sys
+import time
+
+SENTINEL_DEFINITION = re.compile(r'let (\w+) \(\) = Stdlib\.print_endline "([^"]*)"$')
+
+def main() -> None:
+    delay = float(os.getenv("FAKE_TOPLEVEL_DELAY", "0.05"))
+    out = sys.stdout
+    out.write("        OCaml version 5.1.0 (faux toplevel)\n\n# ")
+    out.flush()
+
+    sentinels = {}
+    buffer = ""
+    for line in sys.stdin:
+        buffer += line
+        while ";;" in buffer:
+            phrase, buffer = buffer.split(";;", 1)
+            phrase = phrase.strip()
+            definition = SENTINEL_DEFINITION.match(phrase)
+            called = [name for name in sentinels if phrase.endswith(f"{name} ()")]
+            if definition:
+                sentinels[definition.group(1)] = definition.group(2)
+                out.write(f"val {definition.group(1)} : unit -> unit = <fun>\n")
+            elif called:
+                out.write(sentinels[called[0]] + "\n")
+            elif phrase.startswith("#"):
+                pass
+            elif phrase:
+                time.sleep(delay)
+                out.write("- : int = 42\n")
+            out.write("# ")
+            out.flush()
+
+if __name__ == "__main__":
+    main()
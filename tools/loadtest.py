@@ -0,0 +1,481 @@
+"""
+Test de charge de bout en bout : pilote OCaBot, EvaluateModal.callback et OCamlCog.on_message
+avec de faux objets Discord en mémoire et le faux serveur Mistral.
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import nextcord
+from tools.benchmark import percentile
+from tools.fake_mistral import FakeMistralServer
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOPLEVEL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_toplevel.py")
+_ids = itertools.count(10 ** 17)
+
+class FakeDiscord:
+    """Simule la latence des appels à l'API Discord et les compte."""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = 0
+
+    async def call(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+class FakeUser:
+    """Utilisateur Discord minimal."""
+
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.avatar = None
+        self.bot = bot
+
+    def __eq__(self, other: Any) -> bool:
+        return getattr(other, "id", None) == self.id
+
+    def __hash__(self) -> int:
+        return hash(self.id)
+
+    def __str__(self) -> str:
+        return self.name
+
+class FakeMessage:
+    """Message Discord minimal."""
+
+    def __init__(self, channel: "FakeChannel", author: FakeUser, content: Optional[str] = None,
+                 embed: Optional[nextcord.Embed] = None, mentions: Optional[List[FakeUser]] = None):
+        self.id = next(_ids)
+        self.channel = channel
+        self.author = author
+        self.content = content or ""
+        self.embeds = [embed] if embed is not None else []
+        self.mentions = mentions or []
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+
+    async def reply(self, content: Optional[str] = None, **kwargs: Any) -> "FakeMessage":
+        return await self.channel.send(content, **kwargs)
+
+    async def edit(self, content: Optional[str] = None, embed: Optional[nextcord.Embed] = None, **kwargs: Any) -> None:
+        await self.channel.discord.call()
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embeds = [embed]
+
+    async def create_thread(self, name: str) -> "FakeThread":
+        await self.channel.discord.call()
+        return FakeThread(self.channel, self.id, name)
+
+class FakeChannel:
+    """Salon textuel minimal conservant ses messages en mémoire."""
+
+    def __init__(self, discord: FakeDiscord, bot_user: FakeUser, channel_id: Optional[int] = None):
+        self.discord = discord
+        self.bot_user = bot_user
+        self.id = channel_id or next(_ids)
+        self.messages: List[FakeMessage] = []
+        self.waiting: List[Dict[str, float]] = []
+
+    async def send(self, content: Optional[str] = None, embed: Optional[nextcord.Embed] = None, **kwargs: Any) -> FakeMessage:
+        await self.discord.call()
+        message = FakeMessage(self, self.bot_user, content, embed)
+        self.messages.append(message)
+        if self.waiting:
+            self.waiting.pop(0)["first_reply"] = time.monotonic()
+        return message
+
+    def post(self, author: FakeUser, content: str, mentions: Optional[List[FakeUser]] = None) -> FakeMessage:
+        """Ajoute un message d'un utilisateur, sans appel à l'API."""
+        message = FakeMessage(self, author, content, mentions=mentions)
+        self.messages.append(message)
+        return message
+
+    async def history(self, limit: int = 100) -> AsyncIterator[FakeMessage]:
+        await self.discord.call()
+        for message in reversed(self.messages[-limit:]):
+            yield message
+
+    async def fetch_message(self, message_id: int) -> FakeMessage:
+        await self.discord.call()
+        for message in self.messages:
+            if message.id == message_id:
+                return message
+        raise nextcord.NotFound(_FakeResponse(404), "Message inconnu")
+
+    async def trigger_typing(self) -> None:
+        await self.discord.call()
+
+class FakeThread(FakeChannel):
+    """Thread créé par le bot à partir d'un message."""
+
+    def __init__(self, parent: FakeChannel, thread_id: int, name: str):
+        super().__init__(parent.discord, parent.bot_user, thread_id)
+        self.parent = parent
+        self.owner = parent.bot_user
+        self.name = name
+
+    async def edit(self, name: Optional[str] = None, **kwargs: Any) -> None:
+        await self.discord.call()
+        if name is not None:
+            self.name = name
+
+class _FakeResponse:
+    """Réponse HTTP minimale pour construire les exceptions nextcord."""
+
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Fake"
+
+class FakeInteractionResponse:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def defer(self, *args: Any, **kwargs: Any) -> None:
+        await self.interaction.channel.discord.call()
+
+    async def send_message(self, content: Optional[str] = None, ephemeral: bool = False, **kwargs: Any) -> None:
+        await self.interaction.channel.discord.call()
+        self.interaction.ephemeral.append(content)
+
+class FakeFollowup:
+    def __init__(self, interaction: "FakeInteraction"):
+        self.interaction = interaction
+
+    async def send(self, content: Optional[str] = None, embed: Optional[nextcord.Embed] = None,
+                   ephemeral: bool = False, **kwargs: Any) -> FakeMessage:
+        interaction = self.interaction
+        if ephemeral:
+            await interaction.channel.discord.call()
+            interaction.ephemeral.append(content)
+            return FakeMessage(interaction.channel, interaction.client.user, content)
+        message = await interaction.channel.send(content, embed=embed)
+        interaction.original = interaction.original or message
+        interaction.delivered(embed)
+        return message
+
+class FakeInteraction:
+    """Interaction de modal minimale."""
+
+    def __init__(self, client: Any, channel: FakeChannel, user: FakeUser, guild_id: int):
+        self.client = client
+        self.channel = channel
+        self.user = user
+        self.guild_id = guild_id
+        self.guild = object()
+        self.created_at = datetime.datetime.now(datetime.timezone.utc)
+        self.response = FakeInteractionResponse(self)
+        self.followup = FakeFollowup(self)
+        self.original: Optional[FakeMessage] = None
+        self.ephemeral: List[Optional[str]] = []
+        self.started_at = time.monotonic()
+        self.result_latency: Optional[float] = None
+
+    async def edit_original_message(self, content: Optional[str] = None, embed: Optional[nextcord.Embed] = None, **kwargs: Any) -> FakeMessage:
+        if self.original is None:
+            self.original = await self.channel.send(content, embed=embed)
+        else:
+            await self.original.edit(content=content, embed=embed)
+        self.delivered(embed)
+        return self.original
+
+    def delivered(self, embed: Optional[nextcord.Embed]) -> None:
+        if embed is not None and self.result_latency is None:
+            self.result_latency = time.monotonic() - self.started_at
+
+class LoopLagMonitor:
+    """Mesure le retard de la boucle asyncio par rapport à un réveil périodique."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def reset(self) -> List[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+
+class LoadTest:
+    """Génère un trafic de /evaluate et de mentions avec des arrivées poissonniennes."""
+
+    def __init__(self, bot: Any, cog: Any, args: argparse.Namespace):
+        self.bot = bot
+        self.cog = cog
+        self.args = args
+        self.discord = FakeDiscord(args.discord_latency)
+        self.channels = [FakeChannel(self.discord, bot.user) for _ in range(args.guilds)]
+        self.users = [FakeUser(next(_ids), f"utilisateur{i}") for i in range(args.users)]
+        self.threads: List[FakeThread] = []
+        self.monitor = LoopLagMonitor()
+        self.latencies: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+
+    def count(self, name: str) -> None:
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+    def observe(self, name: str, value: float) -> None:
+        self.latencies.setdefault(name, []).append(value)
+
+    async def seed_threads(self, count: int) -> None:
+        """Crée des threads existants, inconnus du stockage des conversations (rattrapage au premier appel)."""
+        for index in range(count):
+            channel = random.choice(self.channels)
+            starter = FakeMessage(channel, self.bot.user, embed=nextcord.Embed(description="```ocaml\n- : int = 42\n```"))
+            channel.messages.append(starter)
+            thread = FakeThread(channel, starter.id, f"Thread {index}")
+            for turn in range(6):
+                thread.post(random.choice(self.users), f"Question {turn} sur le code ?")
+                thread.post(self.bot.user, f"Réponse {turn} : explication du résultat.")
+            self.threads.append(thread)
+
+    async def evaluate(self) -> None:
+        from src.cogs.ocaml import EvaluateModal
+
+        channel = random.choice(self.channels)
+        user = random.choice(self.users)
+        interaction = FakeInteraction(self.bot, channel, user, guild_id=channel.id)
+        modal = EvaluateModal(
+            self.cog.mistral_service,
+            self.cog.ocaml_service,
+            self.cog.scheduler,
+            self.cog.explanation_cache,
+            self.cog.conversations,
+            self.cog.delivery,
+            self.args.backend
+        )
+        suffix = "" if self.args.repeat_code else f" (* {next(_ids)} *)"
+        modal.code_input._inputed_value = f"let x = 21 * 2;;{suffix}\nx;;"
+
+        await modal.callback(interaction)
+        total = time.monotonic() - interaction.started_at
+
+        if interaction.ephemeral:
+            self.count("evaluate_rejected")
+            return
+        if interaction.result_latency is None:
+            self.count("evaluate_errors")
+            return
+        self.count("evaluate_completed")
+        self.observe("evaluate_result", interaction.result_latency)
+        self.observe("evaluate_total", total)
+
+    async def mention(self) -> None:
+        if not self.threads:
+            self.count("mention_skipped")
+            return
+        thread = random.choice(self.threads)
+        user = random.choice(self.users)
+        message = thread.post(user, f"{self.bot.user.mention} pourquoi ce résultat ?", mentions=[self.bot.user])
+
+        # Les premières réponses du bot dans le thread sont attribuées aux mentions dans leur ordre d'arrivée
+        started_at = time.monotonic()
+        pending: Dict[str, float] = {}
+        thread.waiting.append(pending)
+        await self.cog.on_message(message)
+        total = time.monotonic() - started_at
+
+        if pending in thread.waiting:
+            thread.waiting.remove(pending)
+        if "first_reply" not in pending:
+            self.count("mention_errors")
+            return
+        self.count("mention_completed")
+        self.observe("mention_first_reply", pending["first_reply"] - started_at)
+        self.observe("mention_total", total)
+
+    async def run_stage(self, rate: float, duration: float, mix: Dict[str, float]) -> Dict[str, Any]:
+        """Génère des arrivées au débit donné pendant la durée donnée, puis attend la fin des requêtes."""
+        self.latencies.clear()
+        self.counters.clear()
+        self.monitor.reset()
+        api_calls = self.discord.calls
+
+        kinds, weights = zip(*mix.items())
+        operations = {"evaluate": self.evaluate, "mention": self.mention}
+        tasks = []
+        started_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + duration
+
+        while True:
+            await asyncio.sleep(random.expovariate(rate))
+            if loop.time() >= deadline:
+                break
+            kind = random.choices(kinds, weights)[0]
+            self.count(f"{kind}_arrivals")
+            tasks.append(asyncio.ensure_future(self._guarded(kind, operations[kind])))
+
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started_at
+        completed = self.counters.get("evaluate_completed", 0) + self.counters.get("mention_completed", 0)
+
+        return {
+            "rate": rate,
+            "elapsed": elapsed,
+            "throughput": completed / elapsed if elapsed else 0.0,
+            "counters": dict(self.counters),
+            "discord_calls": self.discord.calls - api_calls,
+            "latency_ms": {
+                name: self._percentiles(samples) for name, samples in self.latencies.items()
+            },
+            "loop_lag_ms": self._percentiles(self.monitor.reset()),
+            "stats": {
+                "ocaml": self.cog.ocaml_service.get_stats(),
+                "scheduler": self.cog.scheduler.get_stats(),
+                "conversations": self.cog.conversations.get_stats(),
+                "models": self.cog.mistral_service.router.get_stats(),
+                "prompts": self.cog.mistral_service.compactor.get_stats(),
+            },
+        }
+
+    async def _guarded(self, kind: str, operation: Any) -> None:
+        try:
+            await operation()
+        except Exception as e:
+            self.count(f"{kind}_errors")
+            logger.warning(f"Requête {kind} en échec: {str(e)}")
+
+    @staticmethod
+    def _percentiles(samples: List[float]) -> Dict[str, float]:
+        if not samples:
+            return {}
+        return {
+            "p50": percentile(samples, 50) * 1000,
+            "p95": percentile(samples, 95) * 1000,
+            "p99": percentile(samples, 99) * 1000,
+            "max": max(samples) * 1000,
+        }
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Analyse une répartition de trafic de la forme "evaluate=0.7,mention=0.3"."""
+    mix = {}
+    for item in value.split(","):
+        kind, weight = item.split("=")
+        if kind not in ("evaluate", "mention"):
+            raise argparse.ArgumentTypeError(f"Type de requête inconnu: {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+def print_stage(report: Dict[str, Any]) -> None:
+    """Affiche le rapport d'un palier de charge."""
+    counters = report["counters"]
+    print(f"\n=== {report['rate']:.1f} req/s pendant {report['elapsed']:.1f} s ===")
+    print(f"Débit : {report['throughput']:.2f} req/s terminées • appels Discord : {report['discord_calls']}")
+    print("Compteurs : " + ", ".join(f"{key}={value}" for key, value in sorted(counters.items())))
+    print(f"{'mesure':<24} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}")
+    rows = dict(report["latency_ms"], loop_lag=report["loop_lag_ms"])
+    for name, stats in rows.items():
+        if stats:
+            print(f"{name:<24} {stats['p50']:>10.1f} {stats['p95']:>10.1f} {stats['p99']:>10.1f} {stats['max']:>10.1f}")
+
+async def _run(args: argparse.Namespace) -> None:
+    server = FakeMistralServer(latency=args.llm_latency, jitter=args.llm_jitter, token_delay=args.token_delay)
+    await server.start()
+
+    os.environ.setdefault("BOT_TOKEN", "loadtest")
+    os.environ.setdefault("MISTRAL_API_KEY", "loadtest")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("EXPLANATION_CACHE_PATH", "")
+    os.environ.setdefault("CONVERSATION_ORIGINS_PATH", "")
+    os.environ["MISTRAL_SERVER_URL"] = server.url
+    os.environ["FAKE_TOPLEVEL_DELAY"] = str(args.toplevel_delay)
+    if args.sandbox == "fake":
+        os.environ.setdefault("OCAML_TYPECHECK", "false")
+        os.environ.setdefault("OCAML_ARTIFACT_DIR", "")
+
+    from main import OCaBot
+
+    bot = OCaBot()
+    if args.sandbox == "fake":
+        fake_command = [sys.executable, FAKE_TOPLEVEL]
+        service = bot.ocaml_service
+        service._sandbox_command = lambda extra_args, command: fake_command if command == ["ocaml"] else command
+        if service._pool is not None:
+            service._pool.command = fake_command
+        if service._sessions is not None:
+            service._sessions.command = fake_command
+
+    bot._connection.user = FakeUser(next(_ids), "OCaBot", bot=True)
+    await bot.load_cogs()
+    await bot.mistral_service.warm_up()
+    cog = bot.get_cog("OCamlCog")
+
+    test = LoadTest(bot, cog, args)
+    await test.seed_threads(args.threads)
+    test.monitor.start()
+    await asyncio.sleep(1)
+
+    reports = []
+    try:
+        for rate in args.rates:
+            report = await test.run_stage(rate, args.duration, args.mix)
+            print_stage(report)
+            reports.append(report)
+    finally:
+        test.monitor.stop()
+        await bot.ocaml_service.close()
+        await bot.mistral_service.close()
+        await server.stop()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(reports, file, indent=2, default=str)
+        print(f"\nRapport enregistré dans {args.json}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge d'OCaBot (faux Discord, faux Mistral)")
+    parser.add_argument("--rates", type=lambda value: [float(rate) for rate in value.split(",")], default=[1.0, 2.0, 5.0],
+                        help="Paliers de débit d'arrivée en requêtes par seconde, séparés par des virgules")
+    parser.add_argument("--duration", type=float, default=20, help="Durée de chaque palier (s)")
+    parser.add_argument("--mix", type=parse_mix, default={"evaluate": 0.7, "mention": 0.3},
+                        help="Répartition du trafic, ex: evaluate=0.7,mention=0.3")
+    parser.add_argument("--backend", default="toplevel", choices=["toplevel", "bytecode", "native"])
+    parser.add_argument("--sandbox", default="fake", choices=["fake", "real"],
+                        help="fake : faux toplevel sans firejail ; real : firejail et OCaml installés")
+    parser.add_argument("--toplevel-delay", type=float, default=0.05, help="Durée d'une phrase du faux toplevel (s)")
+    parser.add_argument("--repeat-code", action="store_true", help="Soumet toujours le même code (teste le cache)")
+    parser.add_argument("--users", type=int, default=200, help="Nombre d'utilisateurs simulés")
+    parser.add_argument("--guilds", type=int, default=5, help="Nombre de serveurs (et salons) simulés")
+    parser.add_argument("--threads", type=int, default=20, help="Threads existants créés avant le test")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Latence moyenne d'un appel Discord (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Latence du faux serveur Mistral (s)")
+    parser.add_argument("--llm-jitter", type=float, default=0.1, help="Variation de latence du faux serveur (s)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Délai entre fragments en streaming (s)")
+    parser.add_argument("--json", help="Fichier où enregistrer les rapports")
+    args = parser.parse_args()
+
+    asyncio.run(_run(args))
+
+if __name__ == "__main__":
+    main()